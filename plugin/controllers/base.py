@@ -9,16 +9,18 @@
 #                                                                            #
 ##############################################################################
 import os
-import imp
 import logging
 
 from twisted.web import server, http, resource
-from Cheetah.Template import Template
 
-from defaults import VIEWS_PATH
 from utilities import mangle_host_header_port
-
-OWIF_PREFIX = 'P_'
+from execution import DeferredRendering
+from response_cache import get_response_cache, cache_key
+from response_cache import response_headers, replay_headers
+from dispatch import dispatch_table, OWIF_PREFIX
+from template_cache import get_template_cache
+from streaming import ChunkProducer, iter_chunks
+from e2_xml import XML_GENERATORS
 
 #: HTTP 404 Not Found response content
 FOUR_O_FOUR = """
@@ -106,6 +108,29 @@ def error404(request):
     request.finish()
 
 
+class PageResource(resource.Resource):
+    """
+    Resource rendering the request handler for endpoint *path* of
+    *controller*. Instances are reused for all requests of an endpoint.
+    """
+
+    def __init__(self, controller, path):
+        """
+        Args:
+            controller (BaseController): controller instance
+            path (basestring): (mangled) endpoint name
+        """
+        resource.Resource.__init__(self)
+        self.controller = controller
+        self.path = path
+
+    def getChildWithDefault(self, path, request):
+        return self.controller.getChildWithDefault(path, request)
+
+    def render(self, request):
+        return self.controller.render_page(request, self.path)
+
+
 class BaseController(resource.Resource):
     """
     Basic HTTP requests controller.
@@ -126,11 +151,18 @@ class BaseController(resource.Resource):
         self.log = logging.getLogger(__name__)
         self.content_type = None
         self.verbose = 0
+        self.response_cache = get_response_cache()
+        self.templates = get_template_cache()
+        #: endpoint name => request handler and metadata
+        self.dispatch_table = dispatch_table(self, OWIF_PREFIX)
+        #: endpoint name => :py:class:`PageResource`
+        self._pages = dict()
 
     def loadTemplate(self, template_trunk_relpath, module, args):
         """
-        Try to generate template contents by trying to load optimised bytecode,
-        python sourcefile and `.tmpl` file (in that order).
+        Generate template contents using the (cached) template loaded from
+        optimised bytecode, python sourcefile or `.tmpl` file (in that
+        order, see :py:mod:`controllers.template_cache`).
 
         Args:
             template_trunk_relpath (basestring): template filename trunk
@@ -146,37 +178,32 @@ class BaseController(resource.Resource):
                 "template_trunk_relpath={!r} module={!r} args={!r}".format(
                     template_trunk_relpath, module, args))
 
-        trunk = '/'.join((VIEWS_PATH, template_trunk_relpath))
-        template_file = None
+        return self.templates.render(template_trunk_relpath, module, args)
 
-        for ext in ('pyo', 'py', 'tmpl'):
-            candy = '.'.join((trunk, ext))
-            if os.path.isfile(candy):
-                template_file = candy
-                break
+    def getChild(self, path, request):
+        name = (path or "index").replace(".", "")
+        page = self._pages.get(name)
 
-        if template_file is None:
-            return None
+        if page is None:
+            page = PageResource(self, name)
+            if name in self.dispatch_table:
+                self._pages[name] = page
 
-        # self.log.debug(">> {!r}".format(template_file))
-        if template_file[-1] in ('o', 'y'):
-            if template_file.endswith("o"):
-                template = imp.load_compiled(module, template_file)
-            else:
-                template = imp.load_source(module, template_file)
+        return page
 
-            mod = getattr(template, module, None)
-            if callable(mod):
-                return str(mod(searchList=args))
-        else:
-            return str(Template(file=template_file, searchList=[args]))
-
-        return None
+    def render(self, request):
+        return self.render_page(request, self.path)
 
-    def getChild(self, path, request):
-        return self.__class__(self.session, path)
+    def render_page(self, request, path):
+        """
+        Render the response of the request handler for endpoint *path*.
 
-    def render(self, request):
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            path (basestring): endpoint name
+        Returns:
+            :py:data:`twisted.web.server.NOT_DONE_YET`
+        """
         if self.verbose:
             fmt = "{scheme}://{netloc}{path} " \
                   "accessed by {client}{via} {r_args}"
@@ -198,73 +225,160 @@ class BaseController(resource.Resource):
             if self.verbose > 4:
                 self.log.debug(request.getAllHeaders())
 
-        # cache data
-        path = self.path
-
-        if self.path == "":
-            self.path = "index"
+        if path == "":
+            path = "index"
 
-        self.path = self.path.replace(".", "")
-        owif_callback_name = OWIF_PREFIX + self.path
-        func = getattr(self, owif_callback_name, None)
+        path = path.replace(".", "")
+        owif_callback_name = OWIF_PREFIX + path
+        entry = self.dispatch_table.get(path)
 
         if self.verbose > 10:
-            self.log.info('{!r} {!r}'.format(owif_callback_name, func))
+            self.log.info('{!r} {!r}'.format(owif_callback_name, entry))
 
-        if callable(func):
-            data = func(request)
-            if data is None:
-                self.log.warning('{!r} {!r} returned None'.format(
-                    owif_callback_name, func))
-                error404(request)
+        if entry is None:
+            self.log.error("Callback {!r} for page {!r} not found".format(
+                owif_callback_name, request.uri))
+            error404(request)
+            return server.NOT_DONE_YET
+
+        ttl = entry.ttl
+        content_type = entry.content_type or self.content_type
+        key = None
+
+        if ttl:
+            key = cache_key(self.__class__.__name__, path, request.args)
+            hit = self.response_cache.get(key)
+            if hit is not None:
+                replay_headers(request, hit[0])
+                self.write_response(request, hit[1])
                 return server.NOT_DONE_YET
 
-            if self.content_type:
-                request.setHeader("content-type", self.content_type)
+        def render_result(request, data):
+            self.response_cache.invalidate(*entry.invalidates)
+            self.render_data(request, data, owif_callback_name, path,
+                             key=key, ttl=ttl, content_type=content_type)
 
-            if self.content_type == CONTENT_TYPE_X_MPEGURL:
-                request.write(data)
-                request.finish()
-            elif isinstance(data, str):
-                request.setHeader("content-type", CONTENT_TYPE_TEXT)
-                request.write(data)
-                request.finish()
-            else:
-                tmpl_trunk = request.path
-                template_module_name = self.path
-
-                if tmpl_trunk[-1] == "/":
-                    tmpl_trunk += "index"
-                elif tmpl_trunk[-5:] != "index" and self.path == "index":
-                    tmpl_trunk += "/index"
-
-                tmpl_trunk = tmpl_trunk.strip("/")
-                tmpl_trunk = tmpl_trunk.replace(".", "")
-
-                if tmpl_trunk in TEMPLATE_ALIASES:
-                    the_alias = TEMPLATE_ALIASES[tmpl_trunk]
-                    template_module_name = os.path.basename(the_alias)
-                    if self.verbose > 10:
-                        self.log.warning("Template alias {!r} -> {!r}".format(
-                            tmpl_trunk, the_alias))
-                    tmpl_trunk = the_alias
-
-                # out => content
-                out = self.loadTemplate(tmpl_trunk, template_module_name, data)
-                if out is None:
-                    self.log.error(
-                        "Template not loadable for {!r} (page {!r})".format(
-                            owif_callback_name, request.uri))
-                    error404(request)
-                else:
-                    request.write(out)
-                    request.finish()
+        if entry.worker_thread:
+            DeferredRendering(request).run(entry.func, render_result)
         else:
-            self.log.error("Callback {!r} for page {!r} not found".format(
-                owif_callback_name, request.uri))
+            render_result(request, entry.func(request))
+
+        return server.NOT_DONE_YET
+
+    def write_response(self, request, body, content_type=None, key=None,
+                       ttl=0):
+        """
+        Write *body* and finish request. Successful responses are added to
+        the response cache if *key* is given.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            body (str): response content
+            content_type (basestring): content type or *None*
+            key (tuple): response cache key or *None*
+            ttl (int): time to live of cached response
+        """
+        if content_type:
+            request.setHeader("content-type", content_type)
+
+        if key is not None and request.code == http.OK:
+            self.response_cache.put(key, response_headers(request), body,
+                                    ttl)
+
+        request.write(body)
+        request.finish()
+
+    def stream_response(self, request, portions, key=None, ttl=0):
+        """
+        Write *portions* in chunks (see :py:mod:`controllers.streaming`)
+        and finish request. Successful responses are added to the response
+        cache if *key* is given.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            portions: iterable of strings
+            key (tuple): response cache key or *None*
+            ttl (int): time to live of cached response
+        """
+        if key is not None:
+            portions = self._caching_portions(request, portions, key, ttl)
+
+        ChunkProducer(request, iter_chunks(portions)).start()
+
+    def _caching_portions(self, request, portions, key, ttl):
+        body = []
+        for portion in portions:
+            body.append(portion)
+            yield portion
+
+        if request.code == http.OK:
+            self.response_cache.put(key, response_headers(request),
+                                    ''.join(body), ttl)
+
+    def render_data(self, request, data, owif_callback_name, path, key=None,
+                    ttl=0, content_type=None):
+        """
+        Write response for data returned by a request handler.
+        Has to be called in the main thread.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            data: request handler's result
+            owif_callback_name (basestring): request handler's name
+            path (basestring): (mangled) path portion of request handler
+            key (tuple): response cache key or *None*
+            ttl (int): time to live of cached response
+            content_type (basestring): content type or *None* for the
+                controller's default
+        """
+        if content_type is None:
+            content_type = self.content_type
+
+        if data is None:
+            self.log.warning('{!r} returned None'.format(owif_callback_name))
             error404(request)
+            return
 
-        # restore cached data
-        self.path = path
+        if content_type:
+            request.setHeader("content-type", content_type)
 
-        return server.NOT_DONE_YET
+        if content_type == CONTENT_TYPE_X_MPEGURL:
+            self.write_response(request, data, key=key, ttl=ttl)
+        elif isinstance(data, str):
+            self.write_response(request, data, content_type=CONTENT_TYPE_TEXT,
+                                key=key, ttl=ttl)
+        else:
+            tmpl_trunk = request.path
+            template_module_name = path
+
+            if tmpl_trunk[-1] == "/":
+                tmpl_trunk += "index"
+            elif tmpl_trunk[-5:] != "index" and path == "index":
+                tmpl_trunk += "/index"
+
+            tmpl_trunk = tmpl_trunk.strip("/")
+            tmpl_trunk = tmpl_trunk.replace(".", "")
+
+            if tmpl_trunk in TEMPLATE_ALIASES:
+                the_alias = TEMPLATE_ALIASES[tmpl_trunk]
+                template_module_name = os.path.basename(the_alias)
+                if self.verbose > 10:
+                    self.log.warning("Template alias {!r} -> {!r}".format(
+                        tmpl_trunk, the_alias))
+                tmpl_trunk = the_alias
+
+            if tmpl_trunk in XML_GENERATORS:
+                self.stream_response(
+                    request, XML_GENERATORS[tmpl_trunk](data), key=key,
+                    ttl=ttl)
+                return
+
+            # out => content
+            out = self.loadTemplate(tmpl_trunk, template_module_name, data)
+            if out is None:
+                self.log.error(
+                    "Template not loadable for {!r} (page {!r})".format(
+                        owif_callback_name, request.uri))
+                error404(request)
+            else:
+                self.write_response(request, out, key=key, ttl=ttl)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cuts Cache
+----------
+
+Cut lists (``.cuts`` files) of recordings are read and decoded in one go
+(see :py:func:`utilities.decode_cuts`). Decoded cut lists are kept in
+memory keyed by path, modification time and size, so that listing
+recordings only decodes cut lists which changed since the last listing.
+
+:py:meth:`CutsCache.folder` retrieves the cut lists of all recordings
+located in a folder in one pass.
+"""
+import os
+import stat
+import logging
+import threading
+import collections
+
+from utilities import decode_cuts, cuts_marks
+
+#: cut list file suffix
+CUTS_SUFFIX = '.cuts'
+
+#: maximum number of cut lists kept
+CUTS_CACHE_SIZE = 4096
+
+#: shared cache instance
+_CUTS_CACHE = None
+
+#: lock for :py:data:`_CUTS_CACHE`
+_CUTS_CACHE_LOCK = threading.Lock()
+
+
+class CutsCache(object):
+    """
+    Cache of decoded cut lists.
+
+    >>> from utilities import CONTRIB
+    >>> data_path = os.path.join(CONTRIB, '../testsuite/data')
+    >>> cache = CutsCache()
+    >>> cut_lists = cache.folder(data_path)
+    >>> [os.path.basename(path)[-13:] for path in cut_lists]
+    ['nbock.ts.cuts']
+    >>> path = list(cut_lists)[0]
+    >>> cache.entries(path) is cut_lists[path]
+    True
+    >>> sorted(cache.marks(path).items())
+    [('marks', [[338, 2], [3488, 2], [3518, 2]]), ('maximum', 3518), \
+('watched', 0)]
+    >>> cache.folder('/no/such/folder')
+    {}
+    """
+
+    def __init__(self, size=CUTS_CACHE_SIZE):
+        """
+        Args:
+            size (int): maximum number of cut lists kept
+        """
+        self.log = logging.getLogger(__name__)
+        self.size = size
+        self.lock = threading.Lock()
+        #: path => (modification time, size, decoded entries)
+        self.cut_lists = collections.OrderedDict()
+
+    def entries(self, path, path_stat=None):
+        """
+        Retrieve the entries of cut list *path*.
+
+        Args:
+            path (basestring): ``.cuts`` file path
+            path_stat: result of :py:func:`os.stat` for *path* if known
+        Returns:
+            tuple: (PTS value, cue kind) tuples
+        Raises:
+            OSError: if *path* is not accessible
+            IOError: if *path* is not readable
+            struct.error: if *path* contains an incomplete entry
+        """
+        if path_stat is None:
+            path_stat = os.stat(path)
+        signature = (path_stat.st_mtime, path_stat.st_size)
+
+        with self.lock:
+            try:
+                cached = self.cut_lists.pop(path)
+            except KeyError:
+                cached = None
+            if cached is not None and cached[:2] == signature:
+                self.cut_lists[path] = cached
+                return cached[2]
+
+        with open(path, "rb") as source:
+            entries = tuple(decode_cuts(source.read()))
+
+        with self.lock:
+            if len(self.cut_lists) >= self.size:
+                self.cut_lists.popitem(last=False)
+            self.cut_lists[path] = signature + (entries,)
+        return entries
+
+    def marks(self, path):
+        """
+        Retrieve the marks of cut list *path*.
+
+        Args:
+            path (basestring): ``.cuts`` file path
+        Returns:
+            dict: see :py:func:`utilities.cuts_marks`
+        """
+        return cuts_marks(self.entries(path))
+
+    def folder(self, folder_path):
+        """
+        Retrieve the entries of all cut lists located in *folder_path*.
+        Unreadable or corrupt cut lists are skipped.
+
+        Args:
+            folder_path (basestring): folder
+        Returns:
+            dict: ``.cuts`` file path => (PTS value, cue kind) tuples
+        """
+        result = dict()
+
+        try:
+            names = os.listdir(folder_path)
+        except OSError as exc:
+            self.log.debug("Cannot list {!r}: {!s}".format(folder_path, exc))
+            return result
+
+        for name in names:
+            if not name.endswith(CUTS_SUFFIX):
+                continue
+            path = os.path.join(folder_path, name)
+            try:
+                path_stat = os.stat(path)
+                if stat.S_ISREG(path_stat.st_mode):
+                    result[path] = self.entries(path, path_stat)
+            except Exception as exc:
+                self.log.debug("Skipping {!r}: {!r}".format(path, exc))
+
+        return result
+
+
+def get_cuts_cache():
+    """
+    Retrieve the shared :py:class:`CutsCache` instance.
+
+    Returns:
+        CutsCache: cache instance
+    """
+    global _CUTS_CACHE
+
+    with _CUTS_CACHE_LOCK:
+        if _CUTS_CACHE is None:
+            _CUTS_CACHE = CutsCache()
+        return _CUTS_CACHE
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
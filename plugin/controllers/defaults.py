@@ -35,7 +35,24 @@ PICON_FOLDERS = ('picon', 'owipicon',)
 PICON_EXT = ".png"
 
 
+#: file caching the detected picon folder (see
+# :py:func:`controllers.picon_index.get_picon_path`)
+PICON_PATH_STATE_FILE = '/etc/enigma2/.pert_belly_hack.picon_path.json'
+
+
 def detect_picon_path():
+    """
+    Find the first folder containing picons.
+
+    .. warning::
+
+        This may wake up (USB) disks and list large folders. Use
+        :py:func:`controllers.picon_index.get_picon_path` instead of
+        calling it directly.
+
+    Returns:
+        basestring: picon folder (with trailing slash) or *None*
+    """
     for prefix in PICON_PREFIXES:
         if not os.path.isdir(prefix):
             continue
@@ -52,8 +69,6 @@ def detect_picon_path():
     return None
 
 
-PICON_PATH = detect_picon_path()
-
 THEMES = [
     'original-small-screen',
     'original-small-screen',
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Request Handler Dispatch
+------------------------
+
+Request handlers of :py:class:`controllers.base.BaseController` based
+controllers are methods named ``P_<endpoint>``. Instead of looking up the
+handler (and its metadata: cache TTL, invalidated endpoints, execution
+context, content type) for each request, each controller instance builds a
+dispatch table once using :py:func:`dispatch_table`.
+
+Handlers generating content of a type differing from the controller's
+default declare it using :py:func:`produces`.
+"""
+from execution import runs_in_worker_thread
+from response_cache import cache_ttl, invalidated_endpoints
+
+#: prefix of request handler method names
+OWIF_PREFIX = 'P_'
+
+#: handler attribute holding the content type of generated content
+CONTENT_TYPE_ATTRIBUTE = '_content_type'
+
+
+def produces(content_type):
+    """
+    Decorator marking a request handler as generating content of type
+    *content_type*.
+
+    >>> @produces('text/html')
+    ... def P_getpid(request):
+    ...     pass
+    >>> handler_content_type(P_getpid)
+    'text/html'
+    >>> handler_content_type(len) is None
+    True
+    """
+    def decorate(func):
+        setattr(func, CONTENT_TYPE_ATTRIBUTE, content_type)
+        return func
+
+    return decorate
+
+
+def handler_content_type(func):
+    """
+    Determine the content type of content generated by *func*.
+
+    Args:
+        func: (bound) function or method
+    Returns:
+        basestring: content type or *None* if not declared
+    """
+    return getattr(func, CONTENT_TYPE_ATTRIBUTE, None)
+
+
+class DispatchEntry(object):
+    """
+    Request handler and its metadata.
+
+    >>> from response_cache import cached
+    >>> @cached(30)
+    ... def P_movielist(request):
+    ...     pass
+    >>> entry = DispatchEntry('movielist', P_movielist)
+    >>> entry.ttl, entry.invalidates, entry.worker_thread
+    (30, (), False)
+    """
+    __slots__ = ('name', 'func', 'ttl', 'invalidates', 'worker_thread',
+                 'content_type')
+
+    def __init__(self, name, func):
+        """
+        Args:
+            name (basestring): endpoint name (without prefix)
+            func: (bound) request handler
+        """
+        self.name = name
+        self.func = func
+        #: time to live of cached responses, 0 if not cacheable
+        self.ttl = cache_ttl(func)
+        #: names of endpoints whose cached responses are invalidated
+        self.invalidates = invalidated_endpoints(func)
+        #: True if the handler is safe to run in a worker thread
+        self.worker_thread = runs_in_worker_thread(func)
+        #: content type of generated content or *None*
+        self.content_type = handler_content_type(func)
+
+    def __repr__(self):
+        return '<DispatchEntry {!r}>'.format(self.name)
+
+
+def dispatch_table(instance, prefix=OWIF_PREFIX):
+    """
+    Create the dispatch table for the request handlers of *instance*.
+
+    Args:
+        instance: controller instance
+        prefix (basestring): prefix of request handler method names
+    Returns:
+        dict: endpoint name => :py:class:`DispatchEntry`
+
+    >>> class Controller(object):
+    ...     P_index = 'not callable'
+    ...     def P_about(self, request):
+    ...         return {'about': True}
+    ...     def about(self, request):
+    ...         pass
+    >>> table = dispatch_table(Controller())
+    >>> table
+    {'about': <DispatchEntry 'about'>}
+    >>> table['about'].func(None)
+    {'about': True}
+    """
+    table = dict()
+    offset = len(prefix)
+
+    for attribute in dir(instance):
+        if not attribute.startswith(prefix):
+            continue
+        func = getattr(instance, attribute, None)
+        if callable(func):
+            table[attribute[offset:]] = DispatchEntry(attribute[offset:], func)
+
+    return table
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Enigma2 WebInterface XML
+------------------------
+
+Generate potentially large *Enigma2 WebInterface API* XML documents item
+by item instead of rendering them using a template so that they can be
+written to the client in chunks (see :py:mod:`controllers.streaming`).
+
+The generated content is identical to the content rendered using the
+replaced templates (see :py:data:`XML_GENERATORS`), i.e. values are
+looked up and escaped as done by *Cheetah* placeholders and the
+``WebSafe`` filter.
+"""
+import types
+
+#: XML declaration
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+#: e2eventlist item
+E2_EVENT = ''.join((
+    ' <e2event>\n',
+    '  <e2eventid>{:s}</e2eventid>\n',
+    '  <e2eventstart>{:s}</e2eventstart>\n',
+    '  <e2eventduration>{:s}</e2eventduration>\n',
+    '  <e2eventcurrenttime>{:s}</e2eventcurrenttime>\n',
+    '  <e2eventtitle>{:s}</e2eventtitle>\n',
+    '  <e2eventdescription>{:s}</e2eventdescription>\n',
+    '  <e2eventdescriptionextended>{:s}</e2eventdescriptionextended>\n',
+    '  <e2eventservicereference>{:s}</e2eventservicereference>\n',
+    '  <e2eventservicename>{:s}</e2eventservicename>\n',
+    ' </e2event>\n',
+))
+
+#: e2servicelist item
+E2_SERVICE = ''.join((
+    ' <e2service>\n',
+    '  <e2servicereference>{:s}</e2servicereference>\n',
+    '  <e2servicename>{:s}</e2servicename>\n',
+    ' </e2service>\n',
+))
+
+#: e2movielist item
+E2_MOVIE = ''.join((
+    '    <e2movie>\n',
+    '        <e2servicereference>{:s}</e2servicereference>\n',
+    '        <e2title>{:s}</e2title>\n',
+    '        <e2description>{:s}</e2description>\n',
+    '        <e2descriptionextended>{:s}</e2descriptionextended>\n',
+    '        <e2servicename>{:s}</e2servicename>\n',
+    '        <e2time>{:s}</e2time>\n',
+    '        <e2length>{:s}</e2length>\n',
+    '        <e2tags>{:s}</e2tags>\n',
+    '        <e2filename>{:s}</e2filename>\n',
+    '        <e2filesize>{:s}</e2filesize>\n',
+    '    </e2movie>\n',
+))
+
+#: e2servicelistrecursive bouquet header
+E2_RECURSIVE_BOUQUET = ''.join((
+    '\t\t<e2bouquet>\n',
+    '\t\t\t<e2servicereference>{:s}</e2servicereference>\n',
+    '\t\t\t<e2servicename>{:s}</e2servicename>\n',
+    '\t\t\t<e2servicelist>\n',
+))
+
+#: e2servicelistrecursive bouquet footer
+E2_RECURSIVE_BOUQUET_END = '\t\t\t</e2servicelist>\n\t\t</e2bouquet>\n'
+
+#: e2servicelistrecursive service contained in a bouquet
+E2_RECURSIVE_SUBSERVICE = ''.join((
+    '\t\t\t<e2service>\n',
+    '\t\t\t\t<e2servicereference>{:s}</e2servicereference>\n',
+    '\t\t\t\t<e2servicename>{:s}</e2servicename>\n',
+    '\t\t\t</e2service>\n',
+))
+
+#: e2servicelistrecursive service
+E2_RECURSIVE_SERVICE = ''.join((
+    '\t\t<e2service>\n',
+    '\t\t\t<e2servicereference>{:s}</e2servicereference>\n',
+    '\t\t\t<e2servicename>{:s}</e2servicename>\n',
+    '\t\t</e2service>\n',
+))
+
+
+def lookup(obj, key):
+    """
+    Look up *key* of *obj* like a *Cheetah* placeholder (``$obj.key``):
+    mapping items are preferred over attributes, callables are called.
+
+    Args:
+        obj: mapping or object
+        key (basestring): key or attribute name
+    Returns:
+        value
+    Raises:
+        AttributeError: if *obj* has neither item nor attribute *key*
+
+    >>> lookup({'id': 3}, 'id')
+    3
+    >>> lookup({'keys': 1}, 'keys')
+    1
+    >>> lookup(u'x', 'upper')
+    u'X'
+    """
+    if hasattr(obj, 'has_key') and key in obj:
+        value = obj[key]
+    else:
+        value = getattr(obj, key)
+
+    if callable(value) and not isinstance(value, (type, types.ClassType)):
+        value = value()
+    return value
+
+
+def websafe(value):
+    """
+    Convert *value* to an UTF-8 encoded string with HTML entities escaped
+    (as done by the ``WebSafe`` filter).
+
+    Args:
+        value: value
+    Returns:
+        str: escaped value
+
+    >>> websafe(None)
+    ''
+    >>> websafe(u'R\\xfcbe & <Co>')
+    'R\\xc3\\xbcbe &amp; &lt;Co&gt;'
+    >>> websafe(True)
+    'True'
+    """
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = str(value)
+    return value.replace("&", "&amp;").replace(
+        "<", "&lt;").replace(">", "&gt;")
+
+
+def websafe_str(value):
+    """
+    Like :py:func:`websafe` for ``$str(value)`` placeholders.
+
+    >>> websafe_str(None)
+    'None'
+    """
+    if value is None:
+        return 'None'
+    return websafe(value)
+
+
+def iter_e2eventlist(data):
+    """
+    Generate an ``e2eventlist`` document (``web/e2eventlist``).
+
+    Args:
+        data (dict): search list containing ``events``
+    Returns:
+        generator: document portions
+
+    >>> event = dict(id=1, begin_timestamp=10, duration_sec=5,
+    ...     now_timestamp=12, title='A&B', shortdesc=None, longdesc='',
+    ...     sref='1:0:1', sname=u'Das Erste')
+    >>> print(''.join(iter_e2eventlist({'events': [event]})))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <e2eventlist>
+     <e2event>
+      <e2eventid>1</e2eventid>
+      <e2eventstart>10</e2eventstart>
+      <e2eventduration>5</e2eventduration>
+      <e2eventcurrenttime>12</e2eventcurrenttime>
+      <e2eventtitle>A&amp;B</e2eventtitle>
+      <e2eventdescription>None</e2eventdescription>
+      <e2eventdescriptionextended></e2eventdescriptionextended>
+      <e2eventservicereference>1:0:1</e2eventservicereference>
+      <e2eventservicename>Das Erste</e2eventservicename>
+     </e2event>
+    </e2eventlist>
+    <BLANKLINE>
+    """
+    yield XML_DECLARATION + '<e2eventlist>\n'
+
+    for event in lookup(data, 'events'):
+        yield E2_EVENT.format(
+            websafe_str(lookup(event, 'id')),
+            websafe_str(lookup(event, 'begin_timestamp')),
+            websafe_str(lookup(event, 'duration_sec')),
+            websafe_str(lookup(event, 'now_timestamp')),
+            websafe_str(lookup(event, 'title')),
+            websafe_str(lookup(event, 'shortdesc')),
+            websafe_str(lookup(event, 'longdesc')),
+            websafe(lookup(event, 'sref')),
+            websafe(lookup(event, 'sname')))
+
+    yield '</e2eventlist>\n'
+
+
+def iter_e2servicelist(data):
+    """
+    Generate an ``e2servicelist`` document (``web/e2servicelist``).
+
+    Args:
+        data (dict): search list containing ``services``
+    Returns:
+        generator: document portions
+
+    >>> services = [dict(servicereference='1:0:1', servicename='<X>')]
+    >>> print(''.join(iter_e2servicelist({'services': services})))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <e2servicelist>
+     <e2service>
+      <e2servicereference>1:0:1</e2servicereference>
+      <e2servicename>&lt;X&gt;</e2servicename>
+     </e2service>
+    </e2servicelist>
+    <BLANKLINE>
+    """
+    yield XML_DECLARATION + '<e2servicelist>\n'
+
+    for service in lookup(data, 'services'):
+        yield E2_SERVICE.format(
+            websafe(lookup(service, 'servicereference')),
+            websafe(lookup(service, 'servicename')))
+
+    yield '</e2servicelist>\n'
+
+
+def iter_e2simplexmlresult(data):
+    """
+    Generate an ``e2simplexmlresult`` document (``web/e2simplexmlresult``).
+
+    Args:
+        data (dict): search list containing ``result`` and ``message``
+    Returns:
+        generator: document portions
+
+    >>> print(''.join(iter_e2simplexmlresult({'result': False,
+    ...                                       'message': 'x'})))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <e2simplexmlresult>
+     <e2state>False</e2state>
+     <e2statetext>x</e2statetext>
+    </e2simplexmlresult>
+    <BLANKLINE>
+    """
+    yield ''.join((
+        XML_DECLARATION,
+        '<e2simplexmlresult>\n <e2state>',
+        websafe(lookup(data, 'result')),
+        '</e2state>\n <e2statetext>',
+        websafe(lookup(data, 'message')),
+        '</e2statetext>\n</e2simplexmlresult>\n',
+    ))
+
+
+def iter_e2movielist(data):
+    """
+    Generate an ``e2movielist`` document (``web/movielist``).
+
+    Args:
+        data (dict): search list containing ``movies``
+    Returns:
+        generator: document portions
+
+    >>> print(''.join(iter_e2movielist({'movies': []})))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <e2movielist>
+    </e2movielist>
+    <BLANKLINE>
+    """
+    yield XML_DECLARATION + '<e2movielist>\n'
+
+    for movie in lookup(data, 'movies'):
+        yield E2_MOVIE.format(
+            websafe(lookup(movie, 'fullname')),
+            websafe(lookup(movie, 'eventname')),
+            websafe(lookup(movie, 'description')),
+            websafe(lookup(movie, 'descriptionExtended')),
+            websafe(lookup(movie, 'servicename')),
+            websafe(lookup(movie, 'recordingtime')),
+            websafe(lookup(movie, 'length')),
+            websafe(lookup(movie, 'tags')),
+            websafe(lookup(movie, 'filename')),
+            websafe(lookup(movie, 'filesize')))
+
+    yield '</e2movielist>\n'
+
+
+def iter_e2servicelistrecursive(data):
+    """
+    Generate an ``e2servicelistrecursive`` document
+    (``web/getallservices``).
+
+    Args:
+        data (dict): search list containing ``services``, bouquets
+            containing ``subservices``
+    Returns:
+        generator: document portions
+    """
+    yield XML_DECLARATION + '<e2servicelistrecursive>\n'
+
+    for service in lookup(data, 'services'):
+        subservices = lookup(service, 'subservices')
+        if len(subservices) > 0:
+            portions = [E2_RECURSIVE_BOUQUET.format(
+                websafe(lookup(service, 'servicereference')),
+                websafe(lookup(service, 'servicename')))]
+            for service2 in subservices:
+                portions.append(E2_RECURSIVE_SUBSERVICE.format(
+                    websafe(lookup(service2, 'servicereference')),
+                    websafe(lookup(service2, 'servicename'))))
+            portions.append(E2_RECURSIVE_BOUQUET_END)
+            yield ''.join(portions)
+        else:
+            yield E2_RECURSIVE_SERVICE.format(
+                websafe(lookup(service, 'servicereference')),
+                websafe(lookup(service, 'servicename')))
+
+    yield '</e2servicelistrecursive>\n'
+
+
+#: template => generator creating the document for the template's data
+XML_GENERATORS = {
+    'web/e2eventlist': iter_e2eventlist,
+    'web/e2servicelist': iter_e2servicelist,
+    'web/e2simplexmlresult': iter_e2simplexmlresult,
+    'web/movielist': iter_e2movielist,
+    'web/getallservices': iter_e2servicelistrecursive,
+}
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EPG Grid
+--------
+
+Precomputed, time bucketed EPG data of bouquets.
+
+Events of each service are stored in compact per-service arrays (begin,
+end and event details, the service's reference and name are stored once per
+service). A slot table maps each time slot (see :py:data:`SLOT_SECONDS`) to
+the first event not having ended before the slot's start. Looking up the
+events of a time window is thus reduced to slicing precomputed arrays.
+
+Grids are built in the background in small steps and refreshed
+incrementally: events which have ended are dropped as the clock advances
+and the events of a few services are re-read on each refresh.
+
+The EPG data source is injected, rows are expected to use the layout of
+:py:data:`controllers.models.events.FLAGS_WEB` (``IBDCTSERN``).
+"""
+import time
+import array
+import logging
+import collections
+
+from twisted.internet import reactor, task
+
+#: length of time slots in seconds
+SLOT_SECONDS = 30 * 60
+
+#: interval in seconds between incremental refreshes
+REFRESH_INTERVAL = 60
+
+#: number of services (re)read per refresh step
+SERVICES_PER_STEP = 25
+
+#: grids not being accessed for this number of seconds are dropped
+GRID_EXPIRY = 60 * 60
+
+#: maximum number of grids
+MAX_GRIDS = 4
+
+#: row indices (:py:data:`controllers.models.events.FLAGS_WEB` layout)
+(ROW_ID, ROW_BEGIN, ROW_DURATION, ROW_CURRENT_TIME, ROW_TITLE,
+ ROW_SHORTINFO, ROW_LONGINFO, ROW_SERVICE_REFERENCE, ROW_SERVICE_NAME) = \
+    range(9)
+
+
+class ServiceEvents(object):
+    """
+    Events of a single service.
+
+    >>> rows = [(1, 1000, 600, 0, 'A', '', '', 'x', 'X'),
+    ...         (2, 1600, 1800, 0, 'B', '', '', 'x', 'X'),
+    ...         (3, 3400, 600, 0, 'C', '', '', 'x', 'X')]
+    >>> se = ServiceEvents('x', 'X', rows, origin=0, slot_seconds=1000)
+    >>> list(se.slots)
+    [0, 0, 1, 1]
+    >>> [row[0] for row in se.window(1500, 1700, now=0)]
+    [1, 2]
+    >>> [row[0] for row in se.window(3500, None, now=0)]
+    [3]
+    >>> [row[0] for row in se.window(3400, 3400, now=0)]
+    []
+    >>> se.advance(1700)
+    >>> [row[0] for row in se.window(0, None, now=0)]
+    [2, 3]
+    """
+    __slots__ = ('service_reference', 'service_name', 'begins', 'ends',
+                 'details', 'origin', 'slot_seconds', 'slots')
+
+    def __init__(self, service_reference, service_name, rows, origin,
+                 slot_seconds=None):
+        """
+        Args:
+            service_reference (basestring): service reference
+            service_name (basestring): service name
+            rows (list): event rows
+            origin (int): timestamp of first slot's start
+            slot_seconds (int): length of time slots
+        """
+        if slot_seconds is None:
+            slot_seconds = SLOT_SECONDS
+
+        self.service_reference = service_reference
+        self.service_name = service_name
+        self.slot_seconds = slot_seconds
+        self.begins = array.array('l')
+        self.ends = array.array('l')
+        self.details = []
+
+        for row in sorted(rows, key=lambda x: x[ROW_BEGIN]):
+            begin = row[ROW_BEGIN]
+            end = begin + row[ROW_DURATION]
+            if end <= origin:
+                continue
+            self.begins.append(begin)
+            self.ends.append(end)
+            self.details.append((row[ROW_ID], row[ROW_TITLE],
+                                 row[ROW_SHORTINFO], row[ROW_LONGINFO]))
+
+        self._index(origin)
+
+    def __len__(self):
+        return len(self.begins)
+
+    def _index(self, origin):
+        self.origin = origin
+        self.slots = array.array('l')
+        if not self.ends:
+            return
+
+        slot_start = origin
+        index = 0
+        count = len(self.ends)
+        last_end = max(self.ends)
+
+        while slot_start < last_end:
+            while index < count and self.ends[index] <= slot_start:
+                index += 1
+            self.slots.append(index)
+            slot_start += self.slot_seconds
+
+    def first_index(self, when):
+        """
+        Determine index of first event not having ended at *when*.
+
+        Args:
+            when (int): timestamp
+        Returns:
+            int: event index
+        """
+        slot = (when - self.origin) // self.slot_seconds
+        if slot < 0:
+            index = 0
+        elif slot >= len(self.slots):
+            return len(self.begins)
+        else:
+            index = self.slots[slot]
+
+        count = len(self.ends)
+        while index < count and self.ends[index] <= when:
+            index += 1
+        return index
+
+    def window(self, begin, end, now):
+        """
+        Generate rows of events running at *begin* or starting before
+        *end*.
+
+        Args:
+            begin (int): window start timestamp
+            end (int): window end timestamp or *None* for open end
+            now (int): current time timestamp used for the rows
+        Returns:
+            generator: event rows
+        """
+        index = self.first_index(begin)
+        count = len(self.begins)
+
+        while index < count:
+            if end is not None and self.begins[index] >= end:
+                break
+            (event_id, title, shortinfo, longinfo) = self.details[index]
+            yield (event_id, self.begins[index],
+                   self.ends[index] - self.begins[index], now, title,
+                   shortinfo, longinfo, self.service_reference,
+                   self.service_name)
+            index += 1
+
+    def advance(self, origin):
+        """
+        Drop events having ended before *origin* and rebuild slot table.
+
+        Args:
+            origin (int): timestamp of first slot's start
+        """
+        index = self.first_index(origin)
+        if index:
+            del self.begins[:index]
+            del self.ends[:index]
+            del self.details[:index]
+        self._index(origin)
+
+
+def slot_origin(when, slot_seconds=None):
+    """
+    Determine start of the time slot containing *when*.
+
+    Args:
+        when (int): timestamp
+        slot_seconds (int): length of time slots
+    Returns:
+        int: timestamp
+
+    >>> slot_origin(1506020440)
+    1506020400
+    """
+    if slot_seconds is None:
+        slot_seconds = SLOT_SECONDS
+    return int(when) - int(when) % slot_seconds
+
+
+class EpgGrid(object):
+    """
+    EPG grid of a bouquet.
+
+    >>> rows = [(1, 1000, 600, 0, 'A', '', '', 'x', 'X'),
+    ...         (2, 1000, 900, 0, 'B', '', '', 'y', 'Y')]
+    >>> grid = EpgGrid('b', ['x', 'y', 'z'], origin=0)
+    >>> grid.update(rows)
+    >>> [(row[0], row[3]) for row in grid.window(1500, -1, now=7)]
+    [(1, 7), (2, 7)]
+    >>> [row[0] for row in grid.window(1700, 1, now=7)]
+    [2]
+    """
+
+    def __init__(self, bouquet_reference, service_references, origin,
+                 slot_seconds=None):
+        """
+        Args:
+            bouquet_reference (basestring): bouquet reference
+            service_references (list): references of bouquet's services
+            origin (int): timestamp of first slot's start
+            slot_seconds (int): length of time slots
+        """
+        self.bouquet_reference = bouquet_reference
+        self.service_references = list(service_references)
+        self.origin = origin
+        self.slot_seconds = slot_seconds
+        self.services = dict()
+        #: True if all services' events have been read
+        self.complete = False
+        #: index of next service to be (re)read
+        self.cursor = 0
+        self.accessed = time.time()
+
+    def update(self, rows):
+        """
+        Replace the events of the services contained in *rows*.
+
+        Args:
+            rows (list): event rows
+        """
+        grouped = collections.OrderedDict()
+        for row in rows:
+            service_reference = row[ROW_SERVICE_REFERENCE]
+            if None in (service_reference, row[ROW_BEGIN],
+                        row[ROW_DURATION]):
+                continue
+            grouped.setdefault(service_reference, []).append(row)
+
+        for service_reference, service_rows in grouped.iteritems():
+            self.services[service_reference] = ServiceEvents(
+                service_reference, service_rows[0][ROW_SERVICE_NAME],
+                service_rows, self.origin, self.slot_seconds)
+
+    def drop(self, service_references):
+        """
+        Remove events of *service_references*.
+
+        Args:
+            service_references (list): service references
+        """
+        for service_reference in service_references:
+            self.services.pop(service_reference, None)
+
+    def advance(self, origin):
+        """
+        Drop events having ended before *origin*.
+
+        Args:
+            origin (int): timestamp of first slot's start
+        """
+        if origin <= self.origin:
+            return
+        self.origin = origin
+        for service_events in self.services.itervalues():
+            service_events.advance(origin)
+
+    def window(self, begin, minutes, now):
+        """
+        Generate rows of events running at *begin* or starting within
+        *minutes* after *begin*, ordered by service and begin.
+
+        Args:
+            begin (int): window start timestamp
+            minutes (int): window length or -1 for open end
+            now (int): current time timestamp used for the rows
+        Returns:
+            generator: event rows
+        """
+        end = None
+        if minutes is not None and minutes >= 0:
+            end = begin + minutes * 60
+
+        for service_reference in self.service_references:
+            try:
+                service_events = self.services[service_reference]
+            except KeyError:
+                continue
+            for row in service_events.window(begin, end, now):
+                yield row
+
+
+class EpgGridManager(object):
+    """
+    Build and refresh :py:class:`EpgGrid` instances of requested bouquets.
+    Has to be used in the main thread as the EPG data source is accessed.
+    """
+
+    def __init__(self, fetch_services, fetch_rows, clock=None):
+        """
+        Args:
+            fetch_services: callable returning the service references of a
+                bouquet
+            fetch_rows: callable returning event rows of a list of service
+                references beginning at a timestamp
+            clock: callable returning current time
+        """
+        if clock is None:
+            clock = time.time
+
+        self.log = logging.getLogger(__name__)
+        self.fetch_services = fetch_services
+        self.fetch_rows = fetch_rows
+        self.clock = clock
+        self.grids = collections.OrderedDict()
+        self.refresher = None
+
+    def start(self):
+        """
+        Start periodic refreshes.
+        """
+        if self.refresher is None:
+            self.refresher = task.LoopingCall(self.refresh)
+            self.refresher.start(REFRESH_INTERVAL, now=False)
+
+    def stop(self):
+        """
+        Stop periodic refreshes.
+        """
+        if self.refresher is not None and self.refresher.running:
+            self.refresher.stop()
+        self.refresher = None
+
+    def window(self, bouquet_reference, begin=-1, minutes=-1):
+        """
+        Retrieve event rows of *bouquet_reference* for the time window
+        described by *begin* and *minutes*. Unknown bouquets are scheduled
+        for being built.
+
+        Args:
+            bouquet_reference (basestring): bouquet reference
+            begin (int): window start timestamp or -1 for now
+            minutes (int): window length or -1 for open end
+        Returns:
+            list: event rows or *None* if the grid is not (yet) complete
+        """
+        now = int(self.clock())
+        if begin is None or begin < 0:
+            begin = now
+
+        grid = self.grids.get(bouquet_reference)
+        if grid is None:
+            self._add(bouquet_reference)
+            return None
+
+        grid.accessed = now
+        self.grids[bouquet_reference] = self.grids.pop(bouquet_reference)
+
+        if not grid.complete or begin < grid.origin:
+            return None
+
+        return list(grid.window(begin, minutes, now))
+
+    def _add(self, bouquet_reference):
+        while len(self.grids) >= MAX_GRIDS:
+            (dropped, _) = self.grids.popitem(last=False)
+            self.log.debug("Dropping EPG grid {!r}".format(dropped))
+
+        grid = EpgGrid(bouquet_reference,
+                       self.fetch_services(bouquet_reference),
+                       slot_origin(self.clock()))
+        grid.accessed = self.clock()
+        self.grids[bouquet_reference] = grid
+        reactor.callLater(0, self._build, grid)
+
+    def _build(self, grid):
+        if self.grids.get(grid.bouquet_reference) is not grid:
+            return
+
+        try:
+            self.step(grid)
+        except Exception as exc:
+            self.log.error("EPG grid {!r}: {!r}".format(
+                grid.bouquet_reference, exc))
+            self.grids.pop(grid.bouquet_reference, None)
+            return
+
+        if not grid.complete:
+            reactor.callLater(0, self._build, grid)
+
+    def step(self, grid):
+        """
+        (Re)read the events of the next :py:data:`SERVICES_PER_STEP`
+        services of *grid*. After the last service the bouquet's services
+        are re-read.
+
+        Args:
+            grid (EpgGrid): grid
+        """
+        chunk = grid.service_references[
+            grid.cursor:grid.cursor + SERVICES_PER_STEP]
+
+        if chunk:
+            grid.drop(chunk)
+            grid.update(self.fetch_rows(chunk, grid.origin))
+            grid.cursor += len(chunk)
+
+        if grid.cursor >= len(grid.service_references):
+            grid.complete = True
+            grid.cursor = 0
+            service_references = self.fetch_services(grid.bouquet_reference)
+            removed = set(grid.service_references) - set(service_references)
+            grid.drop(removed)
+            grid.service_references = list(service_references)
+
+    def refresh(self):
+        """
+        Drop expired grids, advance remaining grids to the current time slot
+        and (re)read some of their services.
+        """
+        now = self.clock()
+        origin = slot_origin(now)
+
+        for bouquet_reference, grid in self.grids.items():
+            if grid.accessed + GRID_EXPIRY < now:
+                self.log.debug("EPG grid {!r} expired".format(
+                    bouquet_reference))
+                del self.grids[bouquet_reference]
+                continue
+
+            try:
+                grid.advance(origin)
+                if grid.complete:
+                    self.step(grid)
+            except Exception as exc:
+                self.log.error("EPG grid {!r}: {!r}".format(
+                    bouquet_reference, exc))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
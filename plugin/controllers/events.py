@@ -190,10 +190,12 @@ Examples (https://mslowik.blogspot.de)::
 
 """
 import logging
+import collections
 
 from enigma import eEPGCache
 
-from models.events import EventDict, FLAGS_ALL
+from models.events import EventDict, FLAGS_ALL, FLAG_SERVICE_REFERENCE
+from execution import main_thread
 
 CASE_SENSITIVE = 0
 CASE_INSENSITIVE = 1
@@ -216,6 +218,24 @@ QUERY_TIMESTAMP_CURRENT_TIME = -1
 QUERY_MINUTES_ANY = -1
 
 
+def service_reference_key(service_reference):
+    """
+    Create a key for grouping events by service reference, ignoring
+    letter case and trailing colons.
+
+    Args:
+        service_reference (basestring): service reference
+    Returns:
+        basestring: key
+
+    >>> service_reference_key('1:0:19:7c:6:85:ffff0000:0:0:0:')
+    '1:0:19:7C:6:85:FFFF0000:0:0:0'
+    >>> service_reference_key('1:0:19:7C:6:85:FFFF0000:0:0:0')
+    '1:0:19:7C:6:85:FFFF0000:0:0:0'
+    """
+    return service_reference.upper().rstrip(':')
+
+
 class EventsController(object):
     """
     Events controller.
@@ -227,6 +247,7 @@ class EventsController(object):
         self.raise_exceptions = kwargs.get("may_raise", False)
         self.fallback_flags = kwargs.get("fallback_flags", FLAGS_ALL)
 
+    @main_thread
     def search(self, what, querytype=None, case_sensitive=False, flags=None,
                max_rows=None):
         """
@@ -272,6 +293,7 @@ class EventsController(object):
 
         return mangled
 
+    @main_thread
     def lookup(self, service_reference, querytype=None, begin=None,
                minutes=None, flags=None, max_rows=None):
         """
@@ -323,6 +345,87 @@ class EventsController(object):
 
         return mangled
 
+    @main_thread
+    def lookup_many(self, queries, flags=None, max_rows=None):
+        """
+        Lookup EPG events of several services using a single
+        :py:meth:`eEPGCache.lookupEvent` call.
+
+        Each query is a dict containing a *service_reference* and
+        optionally *querytype* (defaults to
+        :py:data:`QUERYTYPE_LOOKUP__WHILE`), *begin* and *minutes* as
+        described for :py:meth:`lookup`. The service reference flag (``R``)
+        is added to *flags* if missing as it is needed for grouping the
+        results.
+
+        Args:
+            queries (list): query dicts
+            flags(basestring): query flags
+            max_rows (int): maximum number of results per service
+
+        Returns:
+            collections.OrderedDict: service reference => list of matching
+            items, ordered like *queries*
+        """
+        grouped = collections.OrderedDict()
+        keys = dict()
+        arglist = []
+
+        if flags is None:
+            flags = self.fallback_flags
+
+        if FLAG_SERVICE_REFERENCE not in flags:
+            flags += FLAG_SERVICE_REFERENCE
+
+        for query in queries:
+            service_reference = query["service_reference"]
+            querytype = query.get("querytype")
+            begin = query.get("begin")
+            minutes = query.get("minutes")
+
+            if querytype is None:
+                querytype = QUERYTYPE_LOOKUP__WHILE
+
+            if begin is None:
+                begin = QUERY_TIMESTAMP_CURRENT_TIME
+
+            if querytype == QUERYTYPE_LOOKUP__ID or minutes is None:
+                arglist.append((service_reference, querytype, begin))
+            else:
+                arglist.append((service_reference, querytype, begin, minutes))
+
+            keys[service_reference_key(service_reference)] = service_reference
+            grouped[service_reference] = []
+
+        if not arglist:
+            return grouped
+
+        # flag 'X' does not add a column to result rows
+        sref_index = flags.replace("X", '').index(FLAG_SERVICE_REFERENCE)
+
+        try:
+            results = self.epgcache_instance.lookupEvent([flags] + arglist)
+
+            if not results:
+                results = []
+            for data in results:
+                row_reference = data[sref_index]
+                if row_reference is None:
+                    continue
+                service_reference = keys.get(
+                    service_reference_key(row_reference), row_reference)
+                events = grouped.setdefault(service_reference, [])
+                if max_rows and len(events) >= max_rows:
+                    continue
+                events.append(EventDict(data, flag_string=flags))
+        except Exception as exc:
+            self.log.error(exc)
+            if self.raise_exceptions:
+                raise
+
+        return grouped
+
+    @main_thread
     def lookup_event(self, service_reference, event_id, flags=None):
         """
         Lookup EPG event by ID
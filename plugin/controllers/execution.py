@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Execution Context
+-----------------
+
+Request handlers are either executed in the reactor (main) thread or in a
+thread of the reactor's thread pool.
+
+Handlers accessing *enigma2* objects (service center, EPG cache, session,
+configuration, ...) **have to** run in the main thread. Handlers only doing
+file I/O or pure data shaping may be marked using :py:func:`worker_thread`
+so that they do not block the reactor (and thus all other clients) while
+running.
+
+Unmarked handlers are run in the main thread.
+
+.. note::
+
+    Handlers running in a worker thread must not write to the request,
+    finish it or register producers. Their return value is passed to the
+    main thread which is generating the actual response.
+"""
+import logging
+
+from twisted.internet import defer, threads
+from twisted.web import http
+
+#: handler attribute holding the execution context
+EXECUTION_CONTEXT_ATTRIBUTE = '_execution_context'
+
+#: execution context: reactor thread
+CONTEXT_MAIN_THREAD = 'main'
+
+#: execution context: thread pool
+CONTEXT_WORKER_THREAD = 'worker'
+
+
+def main_thread(func):
+    """
+    Decorator marking *func* as having to run in the reactor thread.
+
+    >>> @main_thread
+    ... def handler(request):
+    ...     pass
+    >>> execution_context(handler)
+    'main'
+    """
+    setattr(func, EXECUTION_CONTEXT_ATTRIBUTE, CONTEXT_MAIN_THREAD)
+    return func
+
+
+def worker_thread(func):
+    """
+    Decorator marking *func* as being safe to run in a worker thread.
+
+    >>> @worker_thread
+    ... def handler(request):
+    ...     pass
+    >>> execution_context(handler)
+    'worker'
+    >>> runs_in_worker_thread(handler)
+    True
+    """
+    setattr(func, EXECUTION_CONTEXT_ATTRIBUTE, CONTEXT_WORKER_THREAD)
+    return func
+
+
+def execution_context(func):
+    """
+    Determine the execution context of *func*.
+
+    Args:
+        func: (bound) function or method
+    Returns:
+        basestring: execution context
+
+    >>> execution_context(len)
+    'main'
+    """
+    return getattr(func, EXECUTION_CONTEXT_ATTRIBUTE, CONTEXT_MAIN_THREAD)
+
+
+def runs_in_worker_thread(func):
+    """
+    Check if *func* has been marked as being safe to run in a worker
+    thread.
+
+    Args:
+        func: (bound) function or method
+    Returns:
+        bool: True if *func* runs in a worker thread
+    """
+    return execution_context(func) == CONTEXT_WORKER_THREAD
+
+
+def call_in_context(func, *args, **kwargs):
+    """
+    Call *func* in its execution context.
+
+    Args:
+        func: (bound) function or method
+        *args: positional arguments
+        **kwargs: keyword arguments
+    Returns:
+        twisted.internet.defer.Deferred: *func*'s result
+    """
+    if runs_in_worker_thread(func):
+        return threads.deferToThread(func, *args, **kwargs)
+    return defer.maybeDeferred(func, *args, **kwargs)
+
+
+class DeferredRendering(object):
+    """
+    Deliver results of a handler called via :py:func:`call_in_context`
+    to a callback running in the main thread unless the client has gone
+    away in the meantime.
+    """
+
+    def __init__(self, request):
+        """
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+        """
+        self.log = logging.getLogger(__name__)
+        self.request = request
+        self.gone = False
+        request.notifyFinish().addErrback(self._connection_lost)
+
+    def _connection_lost(self, failure):
+        self.log.debug("connection lost: {!r}".format(failure))
+        self.gone = True
+
+    def run(self, func, callback, errback=None, args=None):
+        """
+        Call *func* with the request (or *args* if given) in its execution
+        context and pass the result to *callback(request, result)*.
+        If *func* fails the failure is passed to *errback(request, failure)*
+        (if given) or an *Internal Server Error* response is generated.
+        Strings returned by *callback* or *errback* are written to the
+        request which is finished afterwards.
+
+        Args:
+            func: request handler
+            callback: result handler, running in main thread
+            errback: failure handler, running in main thread
+            args (tuple): positional arguments for *func*
+        Returns:
+            twisted.internet.defer.Deferred: rendering result
+        """
+        if args is None:
+            args = (self.request,)
+
+        deferred = call_in_context(func, *args)
+        deferred.addCallbacks(self._deliver, self._handle_failure,
+                              callbackArgs=(callback,),
+                              errbackArgs=(func, errback))
+        deferred.addErrback(self._fail, func)
+        return deferred
+
+    def _write(self, output):
+        if isinstance(output, str):
+            self.request.write(output)
+            self.request.finish()
+        return output
+
+    def _deliver(self, result, callback):
+        if self.gone:
+            return None
+        return self._write(callback(self.request, result))
+
+    def _handle_failure(self, failure, func, errback):
+        if errback is None or self.gone:
+            return failure
+        self.log.error("{!r} failed: {!s}".format(
+            func, failure.getTraceback()))
+        return self._write(errback(self.request, failure))
+
+    def _fail(self, failure, func):
+        self.log.error("{!r} failed: {!s}".format(
+            func, failure.getTraceback()))
+        if self.gone or self.request.finished:
+            return None
+
+        try:
+            self.request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+            self.request.finish()
+        except Exception as exc:
+            self.log.error(exc)
+        return None
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
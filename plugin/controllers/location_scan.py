@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Location Scan
+-------------
+
+Recordings may be spread over several locations (internal disk, USB
+devices, CIFS/NFS mounts). Instead of scanning them one after the other
+(and thus waiting for the slowest mount each time) each location is
+scanned in a dedicated daemon thread and the results are handed out as
+they arrive (see :py:func:`iter_location_scans`).
+
+Each location has to be scanned within :py:data:`LOCATION_TIMEOUT`
+seconds, results of slower locations are dropped. As threads blocked on
+an unresponsive mount cannot be interrupted, a location is not scanned
+again while its previous scan is still running so that a hung mount
+occupies at most one thread (which does not keep the process alive).
+
+Only file system operations may be run this way, *enigma2* objects have to
+be accessed in the main thread.
+"""
+import time
+import Queue
+import logging
+import threading
+
+#: maximum number of seconds to wait for a location's scan result
+LOCATION_TIMEOUT = 20
+
+#: locations currently being scanned
+_BUSY = set()
+
+#: lock for :py:data:`_BUSY`
+_LOCK = threading.Lock()
+
+
+def _scan_location(location, scan, results):
+    try:
+        results.put((location, scan(location), None))
+    except Exception as exc:
+        results.put((location, None, exc))
+    finally:
+        with _LOCK:
+            _BUSY.discard(location)
+
+
+def iter_location_scans(locations, scan, timeout=LOCATION_TIMEOUT,
+                        skipped=None):
+    """
+    Call *scan(location)* for each of *locations* concurrently and
+    generate the results in order of completion. Locations which are
+    still being scanned, which failed or which did not finish in time
+    are skipped.
+
+    Waits for up to *timeout* seconds, thus it must not be used in the
+    main thread.
+
+    Args:
+        locations (list): locations (e.g. folder paths)
+        scan: callable doing file system operations only
+        timeout (int): maximum number of seconds to wait for a location
+        skipped (list): list the skipped locations are appended to
+    Returns:
+        generator: (location, result) tuples
+
+    >>> sorted(iter_location_scans(['hdd', 'usb', 'hdd'], str.upper))
+    [('hdd', 'HDD'), ('usb', 'USB')]
+    >>> skipped = []
+    >>> list(iter_location_scans(['hdd', 'no'], lambda x: x[2], 20, skipped))
+    [('hdd', 'd')]
+    >>> skipped
+    ['no']
+    """
+    log = logging.getLogger(__name__)
+    results = Queue.Queue()
+    pending = set()
+    if skipped is None:
+        skipped = []
+
+    for location in locations:
+        if location in pending:
+            continue
+        with _LOCK:
+            if location in _BUSY:
+                log.warning("Still scanning {!r}, skipped".format(location))
+                skipped.append(location)
+                continue
+            _BUSY.add(location)
+        pending.add(location)
+        thread = threading.Thread(target=_scan_location,
+                                  args=(location, scan, results),
+                                  name='scan {!r}'.format(location))
+        thread.daemon = True
+        thread.start()
+
+    deadline = time.time() + timeout
+    while pending:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            (location, result, exc) = results.get(timeout=remaining)
+        except Queue.Empty:
+            break
+
+        pending.discard(location)
+        if exc is not None:
+            log.error("Scanning {!r} failed: {!r}".format(location, exc))
+            skipped.append(location)
+            continue
+        yield (location, result)
+
+    for location in pending:
+        log.warning("Scanning {!r} timed out after {!s}s".format(
+            location, timeout))
+        skipped.append(location)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
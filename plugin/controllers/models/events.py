@@ -8,6 +8,8 @@ Events
 
     :ref:`event_format-label`
 """
+import operator
+
 from model_utilities import mangle_epg_text
 
 
@@ -113,7 +115,277 @@ def mangle_event(event_obj, encoding="utf-8", with_component_data=True):
     return data
 
 
-class EventDict(dict):
+class CompactRecord(object):
+    """
+    Memory efficient mapping with a fixed set of keys (:py:attr:`FIELDS`)
+    stored in slots. Values of :py:attr:`TEXT_FIELDS` are passed through
+    :py:func:`mangle_epg_text` on first access.
+    Keys not contained in :py:attr:`FIELDS` may be set, they are kept in a
+    separate dictionary.
+
+    Supports the API of :py:class:`dict`, instances are JSON serialisable
+    using :py:func:`controllers.streaming.iter_json` (directly from their
+    slots) or :py:func:`controllers.streaming.json_default`.
+    """
+    __slots__ = ('_extra', '_unmangled', '_layout')
+
+    #: keys
+    FIELDS = ()
+
+    #: keys of values to be passed through :py:func:`mangle_epg_text`
+    TEXT_FIELDS = ()
+
+    #: key => slot name
+    _SLOTS = {}
+
+    #: key => bit of :py:attr:`_unmangled`
+    _TEXT_BITS = {}
+
+    #: (key, slot name) in order of :py:attr:`FIELDS`
+    _SLOT_ITEMS = ()
+
+    #: (slot name, bit of :py:attr:`_unmangled`) of :py:attr:`TEXT_FIELDS`
+    _TEXT_ITEMS = ()
+
+    @classmethod
+    def _make_layout(cls, keys):
+        """
+        Create a layout for records having values for *keys* only.
+        Records with a known layout are copied without looking up their
+        slots one by one.
+
+        Args:
+            keys (tuple): keys
+        Returns:
+            tuple: keys, slot names, getter of values, text bits and
+            (index, slot name) of text values
+        """
+        slots = tuple(cls._SLOTS[key] for key in keys)
+        unmangled = 0
+        for key in keys:
+            unmangled |= cls._TEXT_BITS.get(key, 0)
+
+        if len(slots) > 1:
+            getter = operator.attrgetter(*slots)
+        elif slots:
+            single = operator.attrgetter(slots[0])
+            getter = lambda record: (single(record),)
+        else:
+            getter = lambda record: ()
+
+        texts = tuple((index, cls._SLOTS[key])
+                      for index, key in enumerate(keys)
+                      if key in cls._TEXT_BITS)
+
+        return (keys, slots, getter, unmangled, texts)
+
+    def __getitem__(self, key):
+        try:
+            slot = self._SLOTS[key]
+        except KeyError:
+            extra = self._extra
+            if extra is None:
+                raise KeyError(key)
+            return extra[key]
+
+        try:
+            value = getattr(self, slot)
+        except AttributeError:
+            raise KeyError(key)
+
+        bit = self._TEXT_BITS.get(key, 0)
+        if self._unmangled & bit:
+            value = mangle_epg_text(value)
+            setattr(self, slot, value)
+            self._unmangled &= ~bit
+
+        return value
+
+    def __setitem__(self, key, value):
+        try:
+            slot = self._SLOTS[key]
+        except KeyError:
+            if self._extra is None:
+                self._extra = dict()
+            self._extra[key] = value
+            return
+
+        if self._layout is not None and not hasattr(self, slot):
+            self._layout = None
+        setattr(self, slot, value)
+        self._unmangled &= ~self._TEXT_BITS.get(key, 0)
+
+    def __delitem__(self, key):
+        try:
+            slot = self._SLOTS[key]
+        except KeyError:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+            return
+
+        try:
+            delattr(self, slot)
+        except AttributeError:
+            raise KeyError(key)
+        self._layout = None
+
+    def __contains__(self, key):
+        try:
+            slot = self._SLOTS[key]
+        except KeyError:
+            return self._extra is not None and key in self._extra
+        return hasattr(self, slot)
+
+    has_key = __contains__
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def iterkeys(self):
+        for key, slot in self._SLOT_ITEMS:
+            if hasattr(self, slot):
+                yield key
+        if self._extra is not None:
+            for key in self._extra:
+                yield key
+
+    __iter__ = iterkeys
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def iteritems(self):
+        for key in self.iterkeys():
+            yield key, self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def itervalues(self):
+        for key in self.iterkeys():
+            yield self[key]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).iteritems():
+            self[key] = value
+
+    def __len__(self):
+        return len(self.keys())
+
+    def _mangle(self):
+        """
+        Pass all pending text values through :py:func:`mangle_epg_text`.
+        """
+        unmangled = self._unmangled
+        for slot, bit in self._TEXT_ITEMS:
+            if unmangled & bit:
+                try:
+                    setattr(self, slot, mangle_epg_text(getattr(self, slot)))
+                except AttributeError:
+                    pass
+        self._unmangled = 0
+
+    def fields(self):
+        """
+        Keys and values in matching order, allows serialising the record
+        without copying it into a :py:class:`dict`.
+
+        Returns:
+            tuple: keys (tuple) and values (sequence)
+        """
+        layout = self._layout
+        if layout is not None:
+            keys = layout[0]
+            values = layout[2](self)
+            if self._unmangled:
+                values = list(values)
+                for index, slot in layout[4]:
+                    value = values[index]
+                    if isinstance(value, str) and '\xc2' not in value:
+                        continue
+                    value = mangle_epg_text(value)
+                    values[index] = value
+                    setattr(self, slot, value)
+                self._unmangled = 0
+        else:
+            if self._unmangled:
+                self._mangle()
+            keys = []
+            values = []
+            for key, slot in self._SLOT_ITEMS:
+                try:
+                    values.append(getattr(self, slot))
+                except AttributeError:
+                    continue
+                keys.append(key)
+            keys = tuple(keys)
+
+        if self._extra:
+            keys += tuple(self._extra.iterkeys())
+            values = list(values)
+            values.extend(self._extra.itervalues())
+        return (keys, values)
+
+    def copy(self):
+        """
+        Returns:
+            dict: (shallow) copy
+        """
+        (keys, values) = self.fields()
+        return dict(zip(keys, values))
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, CompactRecord)):
+            return self.copy() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+def compact_record(cls):
+    """
+    Class decorator deriving the slot lookup tables of
+    :py:class:`CompactRecord` subclasses from their
+    :py:attr:`CompactRecord.FIELDS` and :py:attr:`CompactRecord.TEXT_FIELDS`.
+    """
+    cls._SLOTS = dict((key, '_' + key) for key in cls.FIELDS)
+    cls._TEXT_BITS = dict(
+        (key, 1 << index) for index, key in enumerate(cls.TEXT_FIELDS))
+    cls._SLOT_ITEMS = tuple((key, cls._SLOTS[key]) for key in cls.FIELDS)
+    cls._TEXT_ITEMS = tuple(
+        (cls._SLOTS[key], cls._TEXT_BITS[key]) for key in cls.TEXT_FIELDS)
+    return cls
+
+
+#: keys of :py:class:`EventDict`
+EVENT_FIELDS = (
+    KEY_ID, KEY_START_TIME, KEY_DURATION, "current_time", KEY_TITLE,
+    KEY_SHORTINFO, KEY_LONGINFO, KEY_SERVICE_REFERENCE, KEY_SERVICE_NAME,
+    "shortservice_name")
+
+#: text keys of :py:class:`EventDict`
+EVENT_TEXT_FIELDS = (KEY_SHORTINFO, KEY_LONGINFO, KEY_TITLE,
+                     KEY_SERVICE_NAME, "shortservice_name")
+
+
+@compact_record
+class EventDict(CompactRecord):
     """
     Event data container object
 
@@ -125,33 +397,54 @@ class EventDict(dict):
     1506020400
     >>> sed['duration']
     7200
+    >>> sed = EventDict((1, 'A\\xc2\\x8aB'), flag_string='IT')
+    >>> sorted(sed.items())
+    [('id', 1), ('title', 'A\\nB')]
+    >>> 'longinfo' in sed
+    False
     """
+    __slots__ = tuple('_' + key for key in EVENT_FIELDS)
+    FIELDS = EVENT_FIELDS
+    TEXT_FIELDS = EVENT_TEXT_FIELDS
+
+    #: flag string => layout
+    _LAYOUTS = {}
 
     def __init__(self, raw_data, flag_string=None):
-        dict.__init__(self)
         if flag_string is None:
             flag_string = FLAGS_WEB
-        flags = list(flag_string.replace("X", ''))
-        for flag_key, value in zip(flags, raw_data):
-            key = EVENT_FIELD_MAP[flag_key]
-            self[key] = value
-        self._mangle()
-
-    def _mangle(self):
-        text_keys = ("shortinfo", "longinfo", "title",
-                     KEY_SERVICE_NAME, "shortservice_name")
-        for tkey in text_keys:
-            if tkey in self:
-                self[tkey] = mangle_epg_text(self[tkey])
-
-
-class NoneEventDict(dict):
+        try:
+            layout = self._LAYOUTS[flag_string]
+        except KeyError:
+            layout = self._make_layout(tuple(
+                EVENT_FIELD_MAP[flag_key]
+                for flag_key in flag_string.replace("X", '')))
+            self._LAYOUTS[flag_string] = layout
+
+        self._extra = None
+        self._unmangled = layout[3]
+        self._layout = layout
+        if len(raw_data) < len(layout[1]):
+            self._layout = None
+        for slot, value in zip(layout[1], raw_data):
+            setattr(self, slot, value)
+
+
+@compact_record
+class NoneEventDict(CompactRecord):
     """
     Dummy event data container object.
+
+    >>> NoneEventDict("x")[KEY_TITLE]
+    'x'
     """
+    __slots__ = tuple('_' + key for key in EVENT_FIELDS)
+    FIELDS = EVENT_FIELDS
 
     def __init__(self, title=""):
-        dict.__init__(self)
+        self._extra = None
+        self._unmangled = 0
+        self._layout = None
         self[KEY_SERVICE_REFERENCE] = "-1:0:0:0:0:0:0:0:0:0:"
         self[KEY_SERVICE_NAME] = "NONAME"
         self[KEY_START_TIME] = 0
@@ -162,7 +455,14 @@ class NoneEventDict(dict):
         self[KEY_LONGINFO] = ""
 
 
-class ServicesEventDict(dict):
+#: keys of :py:class:`ServicesEventDict`
+SERVICES_EVENT_FIELDS = (
+    'id', 'begin_timestamp', 'duration_sec', 'now_timestamp', 'title',
+    'shortdesc', 'longdesc', 'sref', 'sname', 'remaining')
+
+
+@compact_record
+class ServicesEventDict(CompactRecord):
     """
     Event data container object as used by EPG lookups in services.py
 
@@ -176,16 +476,35 @@ class ServicesEventDict(dict):
     1506020400
     >>> sed['duration_sec']
     7200
+    >>> sed = ServicesEventDict(dd_in, now_next_mode=True)
+    >>> sed['remaining']
+    7160
+    >>> sed['asrefs'] = ['x']
+    >>> sed.get('asrefs')
+    ['x']
     """
+    __slots__ = tuple('_' + key for key in SERVICES_EVENT_FIELDS)
+    FIELDS = SERVICES_EVENT_FIELDS
+    TEXT_FIELDS = ('sname',)
+
+    #: layout of records created from EPG lookups using :py:data:`FLAGS_WEB`
+    _LAYOUT = None
 
     def __init__(self, raw_data, now_next_mode=False, mangle_html=True):
-        dict.__init__(self)
-        for key in SERVICES_KEY_MAP:
-            idx = SERVICES_KEY_MAP[key]
-            self[key] = raw_data[idx]
+        layout = self._LAYOUT
+        if layout is None:
+            layout = self._make_layout(tuple(
+                SERVICES_EVENT_FIELDS[:len(SERVICES_KEY_MAP)]))
+            ServicesEventDict._LAYOUT = layout
+
+        self._extra = None
+        self._unmangled = 0
+        self._layout = layout
+        for key, slot in zip(layout[0], layout[1]):
+            setattr(self, slot, raw_data[SERVICES_KEY_MAP[key]])
 
         if mangle_html:
-            self['sname'] = mangle_epg_text(self['sname'])
+            self._unmangled = layout[3]
 
         if now_next_mode:
             if self['begin_timestamp'] == 0:
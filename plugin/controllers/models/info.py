@@ -15,7 +15,7 @@ import json
 from socket import has_ipv6, AF_INET6, AF_INET, inet_ntop, inet_pton, \
     getaddrinfo
 
-from twisted.web import version
+from twisted import version
 
 from ..i18n import _
 from ..defaults import PUBLIC_PATH
@@ -825,6 +825,53 @@ def getStatusInfo(self):
     return statusinfo
 
 
+def getStatusSnapshot(session):
+    """
+    Collect a compact status of the device (current service and its
+    now/next events, volume, standby and recording state) as pushed to
+    clients by :py:class:`controllers.status_push.StatusBroadcaster`.
+
+    Args:
+        session: enigma2 session
+    Returns:
+        dict: status
+    """
+    vcontrol = eDVBVolumecontrol.getInstance()
+    from Screens.Standby import inStandby
+
+    status = {
+        'volume': vcontrol.getVolume(),
+        'muted': bool(vcontrol.isMuted()),
+        'standby': inStandby is not None,
+        'recording': len(session.nav.getRecordings()) > 0,
+        KEY_SERVICE_REFERENCE: None,
+        'service_name': None,
+    }
+
+    serviceref = session.nav.getCurrentlyPlayingServiceReference()
+    if serviceref is None:
+        return status
+
+    status[KEY_SERVICE_REFERENCE] = serviceref.toString()
+    info = eServiceCenter.getInstance().info(serviceref)
+    if info is not None:
+        status['service_name'] = mangle_epg_text(info.getName(serviceref))
+
+    service = session.nav.getCurrentService()
+    serviceinfo = service and service.info()
+    for prefix, index in (('event', 0), ('next_event', 1)):
+        event = serviceinfo and serviceinfo.getEvent(index)
+        if not event:
+            continue
+        begin = event.getBeginTime()
+        status[prefix + '_id'] = event.getEventId()
+        status[prefix + '_title'] = mangle_epg_text(event.getEventName())
+        status[prefix + '_begin'] = begin
+        status[prefix + '_end'] = begin + event.getDuration()
+
+    return status
+
+
 def getAlternativeChannels(service):
     alternativeServices = eServiceCenter.getInstance().list(
         eServiceReference(service))
@@ -11,9 +11,18 @@ def mangle_epg_text(value):
         request (:obj:`basestring`): EPG text
     Returns:
         (:obj:`basestring`): mangled EPG text
+
+    >>> mangle_epg_text('\\xc2\\x86Tatort\\xc2\\x87\\xc2\\x8aKrimi')
+    'Tatort\\nKrimi'
+    >>> mangle_epg_text('Tatort')
+    'Tatort'
+    >>> mangle_epg_text(None) is None
+    True
     """
     if value is None:
         return value
+    if isinstance(value, str) and '\xc2' not in value:
+        return value
     return value.replace(
         '\xc2\x86', '').replace('\xc2\x87', '').replace('\xc2\x8a', '\n')
 
@@ -20,6 +20,8 @@ from Screens import MovieSelection
 from ..i18n import _
 
 from model_utilities import mangle_epg_text
+from ..utilities import CUTS_WATCHMARK
+from ..cuts_cache import get_cuts_cache
 
 MOVIETAGFILE = "/etc/enigma2/movietags"
 TRASHDIRNAME = "movie_trash"
@@ -33,7 +35,7 @@ MOVIE_LIST_ROOT_FALLBACK = '/media'
 MLOG = logging.getLogger("movies")
 
 
-def getPosition(cutfile, movie_len):
+def getPosition(cutfile, movie_len, cut_list=None):
     """
     Retrieve 'last watched' position.
 
@@ -42,28 +44,23 @@ def getPosition(cutfile, movie_len):
     Args:
         cutfile (basestring): movie's cutfile path
         movie_len(int): movie length in minutes
+        cut_list (tuple): decoded entries of *cutfile* if already known
     Returns:
         dict: movie items
     """
-    cut_list = []
-    if movie_len is not None and os.path.isfile(cutfile):
+    if movie_len is None:
+        return 0
+
+    if cut_list is None:
         try:
-            import struct
-            with open(cutfile) as f:
-                data = f.read()
-            while len(data) > 0:
-                packedCue = data[:12]
-                data = data[12:]
-                cue = struct.unpack('>QI', packedCue)
-                cut_list.append(cue)
+            cut_list = get_cuts_cache().entries(cutfile)
         except Exception:
             return 0
-    else:
-        return 0
+
     last_end_point = None
     if len(cut_list):
         for (pts, what) in cut_list:
-            if what == 3:
+            if what == CUTS_WATCHMARK:
                 last_end_point = pts / 90000  # in seconds
     else:
         return 0
@@ -157,6 +154,9 @@ def getMovieList(rargs=None, locations=None):
             ff = eServiceReference(MOVIE_LIST_SREF_ROOT + f)
             folders.append(ff)
 
+    #: folder => cut lists of recordings in folder
+    folder_cut_lists = dict()
+
     for root in folders:
         movielist = MovieList(None)
         movielist.load(root, None)
@@ -210,8 +210,14 @@ def getMovieList(rargs=None, locations=None):
                 movie['length'] = "%d:%02d" % (
                     length_minutes / 60, length_minutes % 60)
                 if fields is None or 'pos' in fields:
+                    folder = os.path.dirname(filename)
+                    if folder not in folder_cut_lists:
+                        folder_cut_lists[folder] = get_cuts_cache().folder(
+                            folder)
+                    cutfile = filename + '.cuts'
                     movie['lastseen'] = getPosition(
-                        filename + '.cuts', length_minutes)
+                        cutfile, length_minutes,
+                        folder_cut_lists[folder].get(cutfile, ()))
 
             if fields is None or 'desc' in fields:
                 txtfile = name + '.txt'
@@ -8,15 +8,13 @@
 #               published by the Free Software Foundation.                   #
 #                                                                            #
 ##############################################################################
-import os
 import re
-import unicodedata
 import logging
 from time import localtime, strftime
 from urllib import quote, unquote
 
 from ..i18n import _, tstrings
-from ..defaults import PICON_EXT, PICON_PATH
+from ..defaults import PICON_EXT
 from Components.Sources.ServiceList import ServiceList
 from Components.ParentalControl import parentalControl
 from Components.config import config
@@ -31,9 +29,14 @@ from info import FALLBACK_PICON_LOCATION, PICON_ENDPOINT_PATH
 
 from model_utilities import mangle_epg_text
 from events import FLAGS_WEB, ServicesEventDict
+from ..epg_grid import EpgGridManager
+from ..picon_index import get_picon_index, get_picon_path
 
 SLOG = logging.getLogger("services")
 
+#: shared EPG grid manager instance
+EPG_GRID_MANAGER = None
+
 
 def getServiceInfoString(info, what):
     v = info.getInfo(what)
@@ -428,6 +431,49 @@ def getBouquetEpg(ref, begintime=-1, endtime=None, mangle_html=True):
     return {"events": ret, "result": True}
 
 
+def getBouquetServiceReferences(ref):
+    services = eServiceCenter.getInstance().list(eServiceReference(ref))
+    if not services:
+        return []
+    return services.getContent('S')
+
+
+def getServicesEpgRows(service_references, begintime=-1):
+    search = [FLAGS_WEB]
+    for service in service_references:
+        search.append((service, 0, begintime, -1))
+
+    return eEPGCache.getInstance().lookupEvent(search) or []
+
+
+def getEpgGridManager():
+    global EPG_GRID_MANAGER
+
+    if EPG_GRID_MANAGER is None:
+        EPG_GRID_MANAGER = EpgGridManager(
+            getBouquetServiceReferences, getServicesEpgRows)
+        EPG_GRID_MANAGER.start()
+    return EPG_GRID_MANAGER
+
+
+def getBouquetEpgGrid(ref, begintime=-1, endtime=None, mangle_html=True):
+    """
+    Like :py:func:`getBouquetEpg` for a range of events but served from
+    the bouquet's precomputed EPG grid (see :py:mod:`controllers.epg_grid`)
+    once it has been built. An *endtime* of *None* or 0 denotes an open
+    end.
+    """
+    minutes = endtime or -1
+
+    rows = getEpgGridManager().window(ref, begintime, minutes)
+    if rows is None:
+        return getBouquetEpg(ref, begintime, minutes, mangle_html=mangle_html)
+
+    ret = [ServicesEventDict(raw_data, now_next_mode=False,
+                             mangle_html=mangle_html) for raw_data in rows]
+    return {"events": ret, "result": True}
+
+
 def getServicesNowNextEpg(sList, mangle_html=True):
     ret = []
     if not sList:
@@ -600,7 +646,8 @@ def getSearchSimilarEpg(ref, eventid):
 
 
 def getPicon(sname):
-    if not PICON_PATH:
+    picon_path = get_picon_path(config.OpenWebif.picon_path.value)
+    if not picon_path:
         return FALLBACK_PICON_LOCATION
 
     # remove URL part
@@ -614,66 +661,18 @@ def getPicon(sname):
     else:
         return FALLBACK_PICON_LOCATION
 
-    cname = None
+    service_name = None
     if pos != -1:
-        cname = ServiceReference(sname[:pos].rstrip(':')).getServiceName()
-        sname = sname[:pos].rstrip(':').replace(':', '_') + PICON_EXT
-    filename = PICON_PATH + sname
-
-    if os.path.isfile(filename):
-        return PICON_ENDPOINT_PATH + sname
-
-    fields = sname.split('_', 8)
-    if len(fields) > 7 and not fields[6].endswith("0000"):
-        # remove "sub-network" from namespace
-        fields[6] = fields[6][:-4] + "0000"
-        sname = '_'.join(fields)
-        filename = PICON_PATH + sname
-        if os.path.isfile(filename):
-            return PICON_ENDPOINT_PATH + sname
-
-    if len(fields) > 1 and fields[0] != '1':
-        # fallback to 1 for other reftypes
-        fields[0] = '1'
-        sname = '_'.join(fields)
-        filename = PICON_PATH + sname
-        if os.path.isfile(filename):
-            return PICON_ENDPOINT_PATH + sname
-
-    if len(fields) > 3 and fields[2] != '1':
-        # fallback to 1 for tv services with nonstandard servicetypes
-        fields[2] = '1'
-        sname = '_'.join(fields)
-        filename = PICON_PATH + sname
-        if os.path.isfile(filename):
-            return PICON_ENDPOINT_PATH + sname
-
-    if cname is not None:  # picon by channel name
-        cname1 = mangle_epg_text(cname).replace(
-            '/', '_').encode('utf-8', 'ignore')
-
-        if os.path.isfile(PICON_PATH + cname1 + PICON_EXT):
-            return PICON_ENDPOINT_PATH + cname1 + PICON_EXT
-
-        cname = unicodedata.normalize(
-            'NFKD', unicode(cname, 'utf_8', errors='ignore')).encode(
-            'ASCII', 'ignore')
-        cname = re.sub(
-            '[^a-z0-9]',
-            '',
-            cname.replace('&', 'and').replace(
-                '+', 'plus').replace(
-                '*', 'star').lower())
-
-        if len(cname) > 0:
-            filename = PICON_PATH + cname + PICON_EXT
-
-        if os.path.isfile(filename):
-            return PICON_ENDPOINT_PATH + cname + PICON_EXT
-
-        if len(cname) > 2 and cname.endswith(
-                'hd') and os.path.isfile(PICON_PATH + cname[:-2] + PICON_EXT):
-            return PICON_ENDPOINT_PATH + cname[:-2] + PICON_EXT
+        sref = sname[:pos].rstrip(':')
+
+        def service_name():
+            return ServiceReference(sref).getServiceName()
+
+        sname = sref.replace(':', '_') + PICON_EXT
+
+    picon = get_picon_index(picon_path).lookup(sname, service_name)
+    if picon is not None:
+        return PICON_ENDPOINT_PATH + picon
 
 
 def getParentalControlList():
@@ -114,18 +114,62 @@ class TimerDict(dict):
         self['state'] = TIMER_STATE_LOOKUP.get(self['state'], self['state'])
 
 
-def getTimers(session):
+def getExtendedDescriptions(timer_items):
+    """
+    Retrieve the extended descriptions of the events of *timer_items*
+    using a single EPG cache lookup.
+
+    Args:
+        timer_items (list): timers
+    Returns:
+        dict: timer's position in *timer_items* => extended description
+    """
+    positions = []
+    query = ['EX']
+    for position, timer in enumerate(timer_items):
+        if timer.eit and timer.service_ref:
+            positions.append(position)
+            query.append((str(timer.service_ref), 2, timer.eit))
+
+    if not positions:
+        return dict()
+
+    epgcache = eEPGCache.getInstance()
+    # flag 'X' yields (at least) one row per query item
+    rows = epgcache.lookupEvent(query) or []
+    if len(rows) != len(positions):
+        rows = []
+        for item in query[1:]:
+            event = epgcache.lookupEvent(['EX', item])
+            rows.append(event[0] if event else (None,))
+
+    return dict(
+        (position, row[0]) for position, row in zip(positions, rows)
+        if row and row[0])
+
+
+def getTimers(session, formatted_dates=True):
+    """
+    Retrieve the list of timers.
+
+    Args:
+        session: enigma2 session
+        formatted_dates (bool): include formatted begin and end times
+            (``realbegin`` and ``realend``)
+    Returns:
+        dict: result and list of timer items
+    """
     rt = session.nav.RecordTimer
+    timer_items = rt.timer_list + rt.processed_timers
+    descriptions = getExtendedDescriptions(timer_items)
+    # service reference => (service name, alternatives)
+    services = dict()
     timers = []
-    for timer in rt.timer_list + rt.processed_timers:
-        descriptionextended = "N/A"
+    for position, timer in enumerate(timer_items):
+        descriptionextended = descriptions.get(position, "N/A")
         filename = None
         nextactivation = None
-        if timer.eit and timer.service_ref:
-            event = eEPGCache.getInstance().lookupEvent(
-                ['EX', (str(timer.service_ref), 2, timer.eit)])
-            if event and event[0][0]:
-                descriptionextended = event[0][0]
+        sref = str(timer.service_ref)
 
         try:
             filename = timer.Filename
@@ -162,10 +206,12 @@ def getTimers(session):
         if timer.disabled:
             toggledisabledimg = "on"
 
-        asrefs = ""
-        achannels = GetWithAlternative(str(timer.service_ref), False)
-        if achannels:
-            asrefs = achannels
+        try:
+            (servicename, asrefs) = services[sref]
+        except KeyError:
+            servicename = mangle_epg_text(timer.service_ref.getServiceName())
+            asrefs = GetWithAlternative(sref, False) or ""
+            services[sref] = (servicename, asrefs)
 
         vpsplugin_enabled = False
         vpsplugin_overwrite = False
@@ -186,57 +232,49 @@ def getTimers(session):
             else:
                 always_zap = 0
 
-        timers.append(
-            {
-                "serviceref": str(
-                    timer.service_ref),
-                "servicename": mangle_epg_text(
-                    timer.service_ref.getServiceName()),
-                "eit": timer.eit,
-                "name": timer.name,
-                "description": timer.description,
-                "descriptionextended": unicode(
-                        descriptionextended,
-                        'utf_8',
-                        errors='ignore').encode(
-                            'utf_8',
-                            'ignore'),
-                "disabled": disabled,
-                "begin": timer.begin,
-                "end": timer.end,
-                "duration": timer.end - timer.begin,
-                "startprepare": timer.start_prepare,
-                "justplay": justplay,
-                "afterevent": timer.afterEvent,
-                "dirname": dirname,
-                "tags": " ".join(
-                    timer.tags),
-                "logentries": timer.log_entries,
-                "backoff": timer.backoff,
-                "firsttryprepare": timer.first_try_prepare,
-                "state": timer.state,
-                "repeated": timer.repeated,
-                "dontsave": dontSave,
-                "cancelled": timer.cancelled,
-                "toggledisabled": toggledisabled,
-                "toggledisabledimg": toggledisabledimg,
-                "filename": filename,
-                "nextactivation": nextactivation,
-                "realbegin": strftime(
-                    "%d.%m.%Y %H:%M",
-                    (localtime(
-                        float(
-                            timer.begin)))),
-                "realend": strftime(
-                    "%d.%m.%Y %H:%M",
-                    (localtime(
-                        float(
-                            timer.end)))),
-                "asrefs": asrefs,
-                "vpsplugin_enabled": vpsplugin_enabled,
-                "vpsplugin_overwrite": vpsplugin_overwrite,
-                "vpsplugin_time": vpsplugin_time,
-                "always_zap": always_zap})
+        item = {
+            "serviceref": sref,
+            "servicename": servicename,
+            "eit": timer.eit,
+            "name": timer.name,
+            "description": timer.description,
+            "descriptionextended": unicode(
+                descriptionextended, 'utf_8', errors='ignore').encode(
+                'utf_8', 'ignore'),
+            "disabled": disabled,
+            "begin": timer.begin,
+            "end": timer.end,
+            "duration": timer.end - timer.begin,
+            "startprepare": timer.start_prepare,
+            "justplay": justplay,
+            "afterevent": timer.afterEvent,
+            "dirname": dirname,
+            "tags": " ".join(timer.tags),
+            "logentries": timer.log_entries,
+            "backoff": timer.backoff,
+            "firsttryprepare": timer.first_try_prepare,
+            "state": timer.state,
+            "repeated": timer.repeated,
+            "dontsave": dontSave,
+            "cancelled": timer.cancelled,
+            "toggledisabled": toggledisabled,
+            "toggledisabledimg": toggledisabledimg,
+            "filename": filename,
+            "nextactivation": nextactivation,
+            "asrefs": asrefs,
+            "vpsplugin_enabled": vpsplugin_enabled,
+            "vpsplugin_overwrite": vpsplugin_overwrite,
+            "vpsplugin_time": vpsplugin_time,
+            "always_zap": always_zap,
+        }
+
+        if formatted_dates:
+            item["realbegin"] = strftime(
+                "%d.%m.%Y %H:%M", localtime(float(timer.begin)))
+            item["realend"] = strftime(
+                "%d.%m.%Y %H:%M", localtime(float(timer.end)))
+
+        timers.append(item)
 
     return {
         "result": True,
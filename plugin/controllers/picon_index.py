@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Picon Index
+-----------
+
+In-memory index of the picon files available in the picon folder.
+
+Picons are looked up by service reference and by (normalised) service
+name, see :py:func:`service_reference_candidates` and
+:py:func:`service_name_candidates`. Instead of probing the file system
+for each candidate the folder is listed once; the listing is refreshed
+when the folder's modification time changes (checked at most every
+:py:data:`CHECK_INTERVAL` seconds). Lookup results are memoised per
+service reference until the listing changes.
+
+The picon folder itself is not detected at import time. The result of the
+last detection is cached in :py:data:`defaults.PICON_PATH_STATE_FILE` and
+revalidated in a worker thread, see :py:func:`get_picon_path`.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+import unicodedata
+
+from twisted.internet import threads
+from twisted.web import resource, static
+
+from defaults import PICON_EXT, PICON_PATH_STATE_FILE, detect_picon_path
+from models.model_utilities import mangle_epg_text
+
+#: minimum number of seconds between checks of the folder's modification
+CHECK_INTERVAL = 30
+
+#: shared index instances (picon folder => :py:class:`PiconIndex`)
+_INDEX_INSTANCES = dict()
+
+#: lock for :py:data:`_INDEX_INSTANCES`
+_INDEX_INSTANCES_LOCK = threading.Lock()
+
+#: shared :py:class:`PiconPathResolver` instance
+_RESOLVER = None
+
+#: lock for :py:data:`_RESOLVER`
+_RESOLVER_LOCK = threading.Lock()
+
+
+def service_reference_candidates(filename):
+    """
+    Generate picon filenames for the service reference based picon
+    filename *filename* in order of preference: as is, without
+    "sub-network" portion of the namespace, with service reference type
+    ``1`` and with service type ``1``.
+
+    Args:
+        filename (basestring): picon filename
+    Returns:
+        list: picon filenames
+
+    >>> service_reference_candidates('1_0_19_7C_6_85_FFFF0000_0_0_0.png')
+    ['1_0_19_7C_6_85_FFFF0000_0_0_0.png', \
+'1_0_1_7C_6_85_FFFF0000_0_0_0.png']
+    >>> service_reference_candidates('4097_0_19_7C_6_85_C00001_0_0_0.png')
+    ['4097_0_19_7C_6_85_C00001_0_0_0.png', \
+'4097_0_19_7C_6_85_C00000_0_0_0.png', '1_0_19_7C_6_85_C00000_0_0_0.png', \
+'1_0_1_7C_6_85_C00000_0_0_0.png']
+    """
+    candidates = [filename]
+    fields = filename.split('_', 8)
+
+    if len(fields) > 7 and not fields[6].endswith("0000"):
+        # remove "sub-network" from namespace
+        fields[6] = fields[6][:-4] + "0000"
+        candidates.append('_'.join(fields))
+
+    if len(fields) > 1 and fields[0] != '1':
+        # fallback to 1 for other reftypes
+        fields[0] = '1'
+        candidates.append('_'.join(fields))
+
+    if len(fields) > 3 and fields[2] != '1':
+        # fallback to 1 for tv services with nonstandard servicetypes
+        fields[2] = '1'
+        candidates.append('_'.join(fields))
+
+    return candidates
+
+
+def service_name_candidates(service_name, extension=PICON_EXT):
+    """
+    Generate picon filenames for *service_name* in order of preference:
+    the service name itself and its normalised variants (lower case ASCII
+    letters and digits, with and without trailing ``hd``).
+
+    Args:
+        service_name (str): UTF-8 encoded service name
+        extension (basestring): picon file extension
+    Returns:
+        list: picon filenames
+
+    >>> service_name_candidates('Das Erste HD')
+    ['Das Erste HD.png', 'daserstehd.png', 'daserste.png']
+    >>> service_name_candidates('AC/DC & Friends+')
+    ['AC_DC & Friends+.png', 'acdcandfriendsplus.png']
+    """
+    candidates = [mangle_epg_text(service_name).replace(
+        '/', '_').encode('utf-8', 'ignore') + extension]
+
+    normalised = unicodedata.normalize(
+        'NFKD', unicode(service_name, 'utf_8', errors='ignore')).encode(
+        'ASCII', 'ignore')
+    normalised = re.sub(
+        '[^a-z0-9]',
+        '',
+        normalised.replace('&', 'and').replace(
+            '+', 'plus').replace(
+            '*', 'star').lower())
+
+    if len(normalised) > 0:
+        candidates.append(normalised + extension)
+
+    if len(normalised) > 2 and normalised.endswith('hd'):
+        candidates.append(normalised[:-2] + extension)
+
+    return candidates
+
+
+class PiconIndex(object):
+    """
+    Index of the picon files contained in a folder.
+
+    >>> import tempfile, shutil
+    >>> root = tempfile.mkdtemp()
+    >>> for name in ('1_0_1_7C_6_85_C00000_0_0_0.png', 'daserste.png'):
+    ...     open(os.path.join(root, name), 'w').close()
+    >>> idx = PiconIndex(root)
+    >>> idx.lookup('4097_0_19_7C_6_85_C00001_0_0_0.png')
+    '1_0_1_7C_6_85_C00000_0_0_0.png'
+    >>> idx.lookup('1_0_1_1_1_1_C00000_0_0_0.png', lambda: 'Das Erste HD')
+    'daserste.png'
+    >>> idx.lookup('1_0_1_2_1_1_C00000_0_0_0.png', lambda: 'ZDF') is None
+    True
+    >>> shutil.rmtree(root)
+    """
+
+    def __init__(self, root_path, extension=PICON_EXT, clock=None):
+        """
+        Args:
+            root_path (basestring): picon folder
+            extension (basestring): picon file extension
+            clock: callable returning current time
+        """
+        if clock is None:
+            clock = time.time
+
+        self.log = logging.getLogger(__name__)
+        self.root_path = root_path
+        self.extension = extension
+        self.clock = clock
+        self.lock = threading.Lock()
+        #: available picon filenames
+        self.filenames = frozenset()
+        #: memoised lookup results
+        self.memo = dict()
+        #: modification time of folder when it has been listed
+        self.mtime = None
+        #: time of last modification check
+        self.checked = None
+
+    def _folder_mtime(self):
+        try:
+            return os.stat(self.root_path).st_mtime
+        except OSError:
+            return None
+
+    def refresh(self, force=False):
+        """
+        List the picon folder again if its modification time changed
+        (checked at most every :py:data:`CHECK_INTERVAL` seconds unless
+        *force* is set).
+
+        Args:
+            force (bool): check modification time now
+        Returns:
+            bool: True if the folder has been listed
+        """
+        now = self.clock()
+        with self.lock:
+            if not force and self.checked is not None and \
+                    now - self.checked < CHECK_INTERVAL:
+                return False
+            self.checked = now
+
+            mtime = self._folder_mtime()
+            if mtime == self.mtime and self.mtime is not None:
+                return False
+
+            try:
+                filenames = frozenset(
+                    name for name in os.listdir(self.root_path)
+                    if name.endswith(self.extension))
+            except OSError as exc:
+                self.log.warning("Cannot list {!r}: {!s}".format(
+                    self.root_path, exc))
+                filenames = frozenset()
+
+            self.log.debug("{:d} picons in {!r}".format(
+                len(filenames), self.root_path))
+            self.filenames = filenames
+            self.memo = dict()
+            self.mtime = mtime
+            return True
+
+    def lookup(self, filename, service_name=None):
+        """
+        Find the picon for service reference based picon filename
+        *filename* (see :py:func:`service_reference_candidates`), falling
+        back to the service's name.
+
+        Args:
+            filename (basestring): picon filename
+            service_name: callable returning the service name (UTF-8) or
+                *None*, only called if no service reference based picon
+                is available
+        Returns:
+            basestring: picon filename or *None*
+        """
+        self.refresh()
+        memo = self.memo
+
+        try:
+            return memo[filename]
+        except KeyError:
+            pass
+
+        filenames = self.filenames
+        result = None
+        for candidate in service_reference_candidates(filename):
+            if candidate in filenames:
+                result = candidate
+                break
+
+        if result is None and service_name is not None:
+            name = service_name()
+            if name is not None:
+                for candidate in service_name_candidates(
+                        name, self.extension):
+                    if candidate in filenames:
+                        result = candidate
+                        break
+
+        memo[filename] = result
+        return result
+
+
+def get_picon_index(root_path):
+    """
+    Retrieve the shared :py:class:`PiconIndex` instance for *root_path*.
+
+    Args:
+        root_path (basestring): picon folder
+    Returns:
+        PiconIndex: index instance
+    """
+    with _INDEX_INSTANCES_LOCK:
+        try:
+            return _INDEX_INSTANCES[root_path]
+        except KeyError:
+            instance = PiconIndex(root_path)
+            _INDEX_INSTANCES[root_path] = instance
+            return instance
+
+
+class PiconPathResolver(object):
+    """
+    Lazily resolve the picon folder.
+
+    The folder found by the last detection is read from *state_path* on
+    first use; detection itself (*detect*) runs in a worker thread and
+    updates the state file if the folder changed.
+
+    >>> import tempfile, shutil
+    >>> root = tempfile.mkdtemp()
+    >>> state_path = os.path.join(root, 'state.json')
+    >>> resolver = PiconPathResolver(state_path, detect=lambda: '/x/picon/')
+    >>> resolver.load()
+    >>> resolver.path is None
+    True
+    >>> resolver.apply('/x/picon/')
+    '/x/picon/'
+    >>> other = PiconPathResolver(state_path, detect=None)
+    >>> other.load()
+    >>> other.path
+    '/x/picon/'
+    >>> other.resolve('/y/picons')
+    '/y/picons/'
+    >>> shutil.rmtree(root)
+    """
+
+    def __init__(self, state_path=PICON_PATH_STATE_FILE,
+                 detect=detect_picon_path):
+        """
+        Args:
+            state_path (basestring): state file path
+            detect: callable returning the picon folder or *None*
+        """
+        self.log = logging.getLogger(__name__)
+        self.state_path = state_path
+        self.detect = detect
+        self.lock = threading.Lock()
+        #: picon folder (with trailing slash) or *None*
+        self.path = None
+        self.loaded = False
+        #: pending revalidation
+        self.pending = None
+
+    def load(self):
+        """
+        Load the picon folder from the state file.
+        """
+        with self.lock:
+            self.loaded = True
+            try:
+                with open(self.state_path, "rb") as src:
+                    path = json.load(src).get("picon_path")
+            except (IOError, ValueError, AttributeError) as exc:
+                self.log.debug("State {!r} not loadable: {!r}".format(
+                    self.state_path, exc))
+                return
+
+            if isinstance(path, unicode):
+                path = path.encode('utf-8')
+            self.path = path
+
+    def save(self):
+        """
+        Write the state file.
+
+        Returns:
+            bool: True if the state file has been written
+        """
+        temporary_path = self.state_path + '.tmp'
+        try:
+            with open(temporary_path, "wb") as tgt:
+                json.dump(dict(picon_path=self.path), tgt)
+            os.rename(temporary_path, self.state_path)
+        except (IOError, OSError) as exc:
+            self.log.error("State {!r} not writable: {!r}".format(
+                self.state_path, exc))
+            return False
+        return True
+
+    def apply(self, path):
+        """
+        Use *path* as picon folder, updating the state file if it changed.
+
+        Args:
+            path (basestring): picon folder or *None*
+        Returns:
+            basestring: picon folder
+        """
+        with self.lock:
+            if path != self.path:
+                self.log.info("Picon folder: {!r} (was {!r})".format(
+                    path, self.path))
+                self.path = path
+                self.save()
+        return path
+
+    def _revalidated(self, result):
+        self.pending = None
+        return result
+
+    def revalidate(self):
+        """
+        Detect the picon folder in a worker thread unless a detection is
+        already running.
+
+        Returns:
+            twisted.internet.defer.Deferred: detected picon folder
+        """
+        if self.pending is None:
+            self.pending = threads.deferToThread(self.detect)
+            self.pending.addCallback(self.apply)
+            self.pending.addErrback(lambda failure: self.log.error(failure))
+            self.pending.addBoth(self._revalidated)
+        return self.pending
+
+    def resolve(self, override=None):
+        """
+        Retrieve the picon folder without waiting for detection.
+
+        Args:
+            override (basestring): configured picon folder
+        Returns:
+            basestring: picon folder (with trailing slash) or *None*
+        """
+        if override:
+            return override.rstrip('/') + '/'
+
+        if not self.loaded:
+            self.load()
+            self.revalidate()
+
+        return self.path
+
+
+def get_picon_path(override=None):
+    """
+    Retrieve the picon folder using the shared
+    :py:class:`PiconPathResolver` instance. Detection is started on first
+    use; until it finishes the folder of the last detection is returned.
+
+    Args:
+        override (basestring): configured picon folder
+    Returns:
+        basestring: picon folder (with trailing slash) or *None*
+    """
+    global _RESOLVER
+
+    with _RESOLVER_LOCK:
+        if _RESOLVER is None:
+            _RESOLVER = PiconPathResolver()
+
+    return _RESOLVER.resolve(override)
+
+
+class PiconFolderResource(resource.Resource):
+    """
+    Serve the files of the picon folder returned by *resolve* (which is
+    called per request).
+    """
+
+    def __init__(self, resolve):
+        """
+        Args:
+            resolve: callable returning the picon folder or *None*
+        """
+        resource.Resource.__init__(self)
+        self.resolve = resolve
+        self._folder = None
+        self._file = None
+
+    def getChild(self, path, request):
+        folder = self.resolve()
+        if not folder:
+            return resource.NoResource()
+
+        if folder != self._folder:
+            self._file = static.File(folder)
+            self._folder = folder
+
+        return self._file.getChild(path, request)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -8,7 +8,11 @@ from enigma import eServiceReference, iServiceInformation
 
 from models.events import mangle_event, KEY_SERVICE_REFERENCE
 from models.model_utilities import mangle_epg_text
-from utilities import parse_cuts
+from cuts_cache import get_cuts_cache
+from recordings_index import get_recordings_index, recording_signature
+from recordings_watcher import scan_recordings
+from recording_meta import read_recording
+from execution import main_thread, worker_thread
 
 #: root path where recordings are stored
 RECORDINGS_ROOT_PATH = '/media/hdd/movie/'
@@ -22,6 +26,12 @@ RECORDING_ENDPOINT_PATH = 'recording'
 #: Endpoint URL: recording
 RECORDING_ENDPOINT_URL = ''.join(('/', RECORDING_ENDPOINT_PATH, '/'))
 
+#: service reference prefix for DVB recordings
+SREF_PREFIX_DVB_RECORDING = '1:0:0:0:0:0:0:0:0:0:'
+
+#: service reference prefix for other media files
+SREF_PREFIX_MEDIA_FILE = '4097:0:0:0:0:0:0:0:0:0:'
+
 SERVICE_INFORMATION_FIELDS = [
     'sAspect',
     'sAudioPID',
@@ -112,6 +122,28 @@ SERVICE_INFORMATION_FIELDS = [
     'sVideoWidth',
 ]
 
+#: service information fields (without ``s`` prefix) retrieved by default
+DEFAULT_META_FIELDS = (
+    'Description',
+    'FileSize',
+    'Serviceref',
+    'Tags',
+    'TimeCreate',
+)
+
+#: ``fields`` argument value selecting all service information fields
+ALL_META_FIELDS = 'all'
+
+#: service information fields available in *.meta* files (field =>
+#: :py:func:`controllers.recording_meta.parse_meta` key)
+FILE_META_FIELDS = {
+    'Description': 'description',
+    'FileSize': 'file_size',
+    'Serviceref': 'service_reference',
+    'Tags': 'tags',
+    'TimeCreate': 'time_create',
+}
+
 SERVICE_REFERENCE_ID = {
     eServiceReference.idDVB: "DVB",
     eServiceReference.idFile: "File",
@@ -145,6 +177,65 @@ def flags_description(flags):
     return flag_list
 
 
+def information_constants(fields):
+    """
+    Determine the :py:class:`enigma.iServiceInformation` constants of
+    service information *fields*.
+
+    Args:
+        fields: field names (without ``s`` prefix) or
+            :py:data:`ALL_META_FIELDS`
+    Returns:
+        tuple: (field name, constant) tuples of available fields
+    """
+    if fields == ALL_META_FIELDS:
+        fkeys = SERVICE_INFORMATION_FIELDS
+    else:
+        fkeys = ['s' + key for key in fields]
+
+    constants = []
+    for fkey in fkeys:
+        try:
+            constants.append((fkey[1:], getattr(iServiceInformation, fkey)))
+        except AttributeError:
+            pass
+    return tuple(constants)
+
+
+def parse_meta_fields(value):
+    """
+    Parse the value of a ``fields`` request argument.
+
+    Args:
+        value (basestring): comma separated field names,
+            :py:data:`ALL_META_FIELDS` or *None*
+    Returns:
+        selected fields: field names (always containing ``Serviceref``),
+        :py:data:`ALL_META_FIELDS` or *None* for the default fields
+
+    >>> parse_meta_fields('FileSize, sTags,Foo')
+    ('FileSize', 'Serviceref', 'Tags')
+    >>> parse_meta_fields('all')
+    'all'
+    >>> parse_meta_fields('') is None
+    True
+    """
+    if not value:
+        return None
+    if value.strip() == ALL_META_FIELDS:
+        return ALL_META_FIELDS
+
+    available = set(fkey[1:] for fkey in SERVICE_INFORMATION_FIELDS)
+    fields = set(['Serviceref'])
+    for name in value.split(','):
+        name = name.strip()
+        if name not in available and name[1:] in available:
+            name = name[1:]
+        if name in available:
+            fields.add(name)
+    return tuple(sorted(fields))
+
+
 def mangle_servicereference(servicereference, encoding=None):
     global SERVICE_REFERENCE_ID
     if encoding is None:
@@ -168,8 +259,42 @@ class RecordingsController(object):
         self.events_with_component_data = kwargs.get("component_data", False)
         self.encoding = kwargs.get("encoding", "utf-8")
         self.service_lookup = dict()
-
-    def mangle_servicereference_information(self, servicereference):
+        self.index = None
+        #: service information fields retrieved by default
+        self.meta_fields = kwargs.get("meta_fields", DEFAULT_META_FIELDS)
+        self._constants = {
+            self.meta_fields: information_constants(self.meta_fields)}
+        #: create items of DVB recordings from their meta data files
+        self.from_files = kwargs.get("from_files", True) and set(
+            self.meta_fields) <= set(FILE_META_FIELDS)
+
+        if kwargs.get("use_index", True):
+            self.index = get_recordings_index(
+                kwargs.get("index_root", RECORDINGS_ROOT_PATH))
+
+    def _information_constants(self, fields):
+        try:
+            return self._constants[fields]
+        except KeyError:
+            constants = information_constants(fields)
+            self._constants[fields] = constants
+            return constants
+
+    def mangle_servicereference_information(self, servicereference,
+                                            fields=None):
+        """
+        Retrieve service information and event of *servicereference*.
+
+        Args:
+            servicereference (eServiceReference): service reference
+            fields: service information fields (see
+                :py:func:`parse_meta_fields`) or *None* for
+                :py:attr:`meta_fields`
+        Returns:
+            dict: ``meta`` data, ``event`` and ``recording_servicename``
+        """
+        if fields is None:
+            fields = self.meta_fields
         data = dict()
         meta = {
             'Serviceref': "-1:0:0:0:0:0:0:0:0:0:"
@@ -189,9 +314,8 @@ class RecordingsController(object):
 
             return data
 
-        for fkey in SERVICE_INFORMATION_FIELDS:
+        for key, const_value in self._information_constants(fields):
             try:
-                const_value = getattr(iServiceInformation, fkey)
                 current_value = cs_info.getInfo(servicereference, const_value)
 
                 if current_value == -2:
@@ -204,7 +328,6 @@ class RecordingsController(object):
                 if current_value == -1:
                     continue
 
-                key = fkey[1:]
                 meta[key] = current_value
 
                 if key == 'FileSize':
@@ -218,15 +341,27 @@ class RecordingsController(object):
             data['event'] = mangle_event(
                 event, with_component_data=self.events_with_component_data)
 
-        try:
-            recording_s = meta['Serviceref']
-            data['recording_servicename'] = self.service_lookup[recording_s]
-        except KeyError:
-            data['recording_servicename'] = self.get_servicename(
-                servicereference)
+        data['recording_servicename'] = self.lookup_servicename(
+            meta['Serviceref'], servicereference)
 
         return data
 
+    def lookup_servicename(self, service_reference, servicereference):
+        """
+        Determine the name of the service a recording has been recorded
+        from.
+
+        Args:
+            service_reference (basestring): recorded service's reference
+            servicereference: recording's service reference
+        Returns:
+            unicode: service name
+        """
+        try:
+            return self.service_lookup[service_reference]
+        except KeyError:
+            return self.get_servicename(servicereference)
+
     def get_servicename(self, servicereference, encoding=None):
         if encoding is None:
             encoding = "utf-8"
@@ -245,40 +380,266 @@ class RecordingsController(object):
         self.service_lookup[actual_servicereference] = value
         return value
 
-    def list_movies(self, root_path):
+    @main_thread
+    def list_movies(self, root_path, fields=None):
+        """
+        Generate recording items located in *root_path* (and its subfolders).
+        Items of unchanged recordings are served from the recordings index.
+        If *root_path* is being watched for changes and has been indexed
+        completely, items are served from the index' snapshot without
+        rescanning the folder.
+
+        Items containing service information *fields* other than
+        :py:attr:`meta_fields` are not indexed and thus always created.
+
+        Args:
+            root_path (basestring): folder to be listed
+            fields: service information fields (see
+                :py:func:`parse_meta_fields`) or *None* for
+                :py:attr:`meta_fields`
+        Returns:
+            generator: recording items
+        """
+        seen_paths = set()
+        if fields == self.meta_fields:
+            fields = None
+        indexed = self.index is not None and fields is None
+
+        if indexed:
+            u_root_path = root_path.decode(self.encoding)
+            if self.index.has_snapshot(u_root_path):
+                self.refresh_pending()
+                for item in self.index.snapshot(u_root_path):
+                    yield dict(item)
+                return
+
+        for item in self._list_movies(root_path, seen_paths, fields):
+            yield item
+
+        if indexed:
+            self.index.prune(u_root_path, seen_paths)
+            self.index.mark_complete(u_root_path)
+            self.index.save()
+
+    @worker_thread
+    def scan_movies(self, root_path):
+        """
+        Determine the recordings located in *root_path* (and its
+        subfolders) and retrieve the items of unchanged recordings from the
+        recordings index. Items of other recordings are created from their
+        meta data files if possible (see :py:meth:`mangle_recording_files`).
+        Does not access *enigma2* objects.
+
+        Args:
+            root_path (basestring): folder to be listed
+        Returns:
+            list: (path, signature, item or *None*) tuples ordered by path
+        """
+        scanned = []
+
+        for path, signature in sorted(scan_recordings(root_path).items()):
+            u_path = path.decode(self.encoding)
+            item = None
+            if self.index is not None:
+                item = self.index.get(u_path, signature)
+            if item is None and self.from_files:
+                item = self.mangle_recording_files(path)
+            scanned.append((u_path, signature, item))
+
+        return scanned
+
+    @main_thread
+    def complete_movies(self, root_path, scanned):
+        """
+        Generate recording items for the result of :py:meth:`scan_movies`,
+        creating the items missing in the recordings index and adding the
+        service names to items created from meta data files.
+
+        Args:
+            root_path (basestring): folder which has been scanned
+            scanned (list): result of :py:meth:`scan_movies`
+        Returns:
+            generator: recording items
+        """
+        seen_paths = set()
+
+        for u_path, signature, item in scanned:
+            seen_paths.add(u_path)
+            if item is None:
+                item = self.mangle_recording_path(u_path.encode(self.encoding))
+            elif item['recording_servicename'] is None:
+                item['recording_servicename'] = self.lookup_servicename(
+                    item['meta'].get('Serviceref'),
+                    item[KEY_SERVICE_REFERENCE])
+            else:
+                yield item
+                continue
+
+            if self.index is not None:
+                self.index.put(u_path, signature, item)
+            yield item
+
+        if self.index is not None:
+            u_root_path = root_path.decode(self.encoding)
+            self.index.prune(u_root_path, seen_paths)
+            self.index.mark_complete(u_root_path)
+            self.index.save()
+
+    def mangle_recording_path(self, path):
+        """
+        Create recording item for the recording located at *path*.
+
+        Args:
+            path (basestring): recording's path
+        Returns:
+            dict: recording item
+        """
+        if path.lower().endswith('.ts'):
+            serviceref = eServiceReference(SREF_PREFIX_DVB_RECORDING + path)
+        else:
+            serviceref = eServiceReference(SREF_PREFIX_MEDIA_FILE + path)
+
+        cs_info = self.service_center_instance.info(serviceref)
+        shortinfo = os.path.basename(path)
+        if cs_info is not None:
+            shortinfo = cs_info.getName(serviceref) or shortinfo
+
+        return self.mangle_recording(shortinfo, serviceref)
+
+    @main_thread
+    def refresh_pending(self):
+        """
+        (Re)read recordings the index has been notified about being
+        added or altered.
+        """
+        for u_path in self.index.pop_pending():
+            path = u_path.encode(self.encoding)
+
+            if not os.path.isfile(path):
+                self.index.discard(u_path)
+                continue
+
+            signature = recording_signature(path)
+            self.index.put(u_path, signature,
+                           self.mangle_recording_path(path))
+
+        self.index.save()
+
+    def _list_movies(self, root_path, seen_paths, fields=None):
         self.log.debug('%s', "Trying to list files in {!r}".format(root_path))
         root_servicereference = eServiceReference(
             eServiceReference.idFile, 0, root_path)
 
+        index = self.index if fields is None else None
         list_result = self.service_center_instance.list(root_servicereference)
         items = list_result.getContent("NR", True)
         for (shortinfo, serviceref) in items:
-            item = mangle_servicereference(serviceref, encoding=self.encoding)
-            item['label'] = shortinfo.decode(self.encoding)
-            if item['flags'] & eServiceReference.isDirectory:
-                for sub_item in self.list_movies(serviceref.getPath()):
+            if serviceref.flags & eServiceReference.isDirectory:
+                for sub_item in self._list_movies(serviceref.getPath(),
+                                                  seen_paths, fields):
                     yield sub_item
-            else:
-                item.update(
-                    self.mangle_servicereference_information(serviceref))
-
-                try:
-                    fsize = item['meta']['FileSize']
-                except KeyError:
-                    item['meta']['FileSize'] = 0
-
-                    try:
-                        item['meta']['FileSize'] = os.path.getsize(
-                            item['path'].encode('utf-8'))
-                    except Exception as exc:
-                        item['meta']['FileSize'] = 0
-                        # item['meta']['_exc'] = repr(exc)
-
-                cutfile = (item['path'] + '.cuts').encode('utf-8')
-                if os.path.isfile(cutfile):
-                    try:
-                        item['meta']['marks'] = parse_cuts(cutfile)
-                    except Exception as exc:
-                        self.log.error(exc)
+                continue
 
-                yield item
+            path = serviceref.getPath()
+            signature = None
+            seen_paths.add(path.decode(self.encoding))
+
+            if index is not None:
+                signature = recording_signature(path)
+                item = index.get(path.decode(self.encoding), signature)
+                if item is not None:
+                    yield item
+                    continue
+
+            item = self.mangle_recording(shortinfo, serviceref, fields)
+
+            if index is not None:
+                index.put(item['path'], signature, item)
+
+            yield item
+
+    def mangle_recording(self, shortinfo, serviceref, fields=None):
+        """
+        Create recording item for *serviceref*.
+
+        Args:
+            shortinfo (basestring): recording's label
+            serviceref (eServiceReference): recording's service reference
+            fields: service information fields or *None* for
+                :py:attr:`meta_fields`
+        Returns:
+            dict: recording item
+        """
+        item = mangle_servicereference(serviceref, encoding=self.encoding)
+        item['label'] = shortinfo.decode(self.encoding)
+        item.update(
+            self.mangle_servicereference_information(serviceref, fields))
+        self._add_file_information(item)
+
+        return item
+
+    @worker_thread
+    def mangle_recording_files(self, path):
+        """
+        Create recording item for the DVB recording located at *path*
+        using its *.meta* and *.eit* files only. Does not access *enigma2*
+        objects, thus ``recording_servicename`` is *None*.
+
+        Args:
+            path (basestring): recording's path
+        Returns:
+            dict: recording item or *None* if *path* is not a DVB
+            recording having a *.meta* file
+        """
+        if not path.lower().endswith('.ts'):
+            return None
+
+        (meta_data, event) = read_recording(
+            path, with_component_data=self.events_with_component_data)
+        if meta_data is None:
+            return None
+
+        meta = dict()
+        for key in self.meta_fields:
+            value = meta_data[FILE_META_FIELDS[key]]
+            if isinstance(value, str):
+                value = value.decode(self.encoding, 'ignore')
+            meta[key] = value
+        if 'FileSize' in meta:
+            meta['FileSize'] &= 0xffffffff
+
+        item = {
+            'kind': SERVICE_REFERENCE_ID[eServiceReference.idDVB],
+            'path': path.decode(self.encoding),
+            KEY_SERVICE_REFERENCE: SREF_PREFIX_DVB_RECORDING + path,
+            'flags': 0,
+            'label': meta_data['name'].decode(self.encoding, 'ignore') or
+            os.path.basename(path).decode(self.encoding),
+            'meta': meta,
+            'recording_servicename': None,
+        }
+        if event is not None:
+            item['event'] = event
+        self._add_file_information(item)
+
+        return item
+
+    def _add_file_information(self, item):
+        try:
+            fsize = item['meta']['FileSize']
+        except KeyError:
+            item['meta']['FileSize'] = 0
+
+            try:
+                item['meta']['FileSize'] = os.path.getsize(
+                    item['path'].encode('utf-8'))
+            except Exception as exc:
+                item['meta']['FileSize'] = 0
+                # item['meta']['_exc'] = repr(exc)
+
+        cutfile = (item['path'] + '.cuts').encode('utf-8')
+        if os.path.isfile(cutfile):
+            try:
+                item['meta']['marks'] = get_cuts_cache().marks(cutfile)
+            except Exception as exc:
+                self.log.error(exc)
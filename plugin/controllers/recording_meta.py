@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Recording Meta Data
+-------------------
+
+Parse the meta data files *enigma2* writes next to a recording without
+using ``eServiceCenter``:
+
+* ``<recording>.meta``: text file, one value per line (service reference,
+  name, description, creation time, tags, length, file size, ...)
+* ``<recording trunk>.eit``: binary DVB event information (event ID, start
+  time, duration and descriptors, see ETSI EN 300 468)
+
+As no *enigma2* objects are involved, the functions of this module may be
+called in worker threads.
+"""
+import os
+import struct
+import unicodedata
+
+#: *.meta* lines in order of appearance
+META_LINES = (
+    'service_reference', 'name', 'description', 'time_create', 'tags',
+    'length', 'file_size', 'service_data', 'packet_size', 'scrambled',
+)
+
+#: *.meta* lines containing integer values
+META_INTEGER_LINES = (
+    'time_create', 'length', 'file_size', 'packet_size', 'scrambled')
+
+#: EIT event header: event ID, start (MJD, BCD hours, minutes, seconds),
+#: duration (BCD hours, minutes, seconds), status and descriptors length
+EIT_HEADER = struct.Struct('>HHBBBBBBH')
+
+#: descriptor tag: short event descriptor
+SHORT_EVENT_DESCRIPTOR = 0x4d
+
+#: descriptor tag: extended event descriptor
+EXTENDED_EVENT_DESCRIPTOR = 0x4e
+
+#: descriptor tag: component descriptor
+COMPONENT_DESCRIPTOR = 0x50
+
+#: modified julian date of 1970-01-01
+MJD_UNIX_EPOCH = 40587
+
+#: DVB character table selector => codec (ETSI EN 300 468, annex A)
+DVB_CHARACTER_TABLES = {
+    0x01: 'iso-8859-5',
+    0x02: 'iso-8859-6',
+    0x03: 'iso-8859-7',
+    0x04: 'iso-8859-8',
+    0x05: 'iso-8859-9',
+    0x06: 'iso-8859-10',
+    0x07: 'iso-8859-11',
+    0x09: 'iso-8859-13',
+    0x0a: 'iso-8859-14',
+    0x0b: 'iso-8859-15',
+    0x11: 'utf-16-be',
+    0x12: 'euc-kr',
+    0x13: 'gb2312',
+    0x14: 'big5',
+    0x15: 'utf-8',
+}
+
+#: ISO 6937 non-spacing diacritical marks => combining characters
+ISO6937_DIACRITICS = {
+    '\xc1': u'\u0300',
+    '\xc2': u'\u0301',
+    '\xc3': u'\u0302',
+    '\xc4': u'\u0303',
+    '\xc5': u'\u0304',
+    '\xc6': u'\u0306',
+    '\xc7': u'\u0307',
+    '\xc8': u'\u0308',
+    '\xca': u'\u030a',
+    '\xcb': u'\u0327',
+    '\xcd': u'\u030b',
+    '\xce': u'\u0328',
+    '\xcf': u'\u030c',
+}
+
+
+def decode_iso6937(data):
+    """
+    Decode *data* using the default DVB character table (ISO 6937).
+    Characters other than letters with diacritical marks are decoded as
+    ISO 8859-1.
+
+    Args:
+        data (str): encoded text
+    Returns:
+        unicode: decoded text
+
+    >>> decode_iso6937('M\\xc8unchen')
+    u'M\\xfcnchen'
+    """
+    if not any(mark in data for mark in ISO6937_DIACRITICS):
+        return data.decode('iso-8859-1')
+
+    portions = []
+    offset = 0
+    while offset < len(data):
+        current = data[offset]
+        mark = ISO6937_DIACRITICS.get(current)
+        if mark is not None and offset + 1 < len(data):
+            portions.append(data[offset + 1].decode('iso-8859-1') + mark)
+            offset += 2
+            continue
+        portions.append(current.decode('iso-8859-1'))
+        offset += 1
+
+    return unicodedata.normalize('NFC', u''.join(portions))
+
+
+def decode_dvb_text(data):
+    """
+    Decode DVB text *data*, selecting the character table as indicated by
+    its first byte(s).
+
+    Args:
+        data (str): encoded text
+    Returns:
+        unicode: decoded text
+
+    >>> decode_dvb_text('\\x15S\\xc3\\xbcndenbock')
+    u'S\\xfcndenbock'
+    >>> decode_dvb_text('\\x05D\\xe4mmerung')
+    u'D\\xe4mmerung'
+    >>> decode_dvb_text('\\x10\\x00\\x02\\xb3')
+    u'\\u0142'
+    >>> decode_dvb_text('')
+    u''
+    """
+    if not data:
+        return u''
+
+    selector = ord(data[0])
+    if selector >= 0x20:
+        return decode_iso6937(data)
+
+    if selector == 0x10 and len(data) >= 3:
+        codec = 'iso-8859-{:d}'.format(struct.unpack('>H', data[1:3])[0])
+        data = data[3:]
+    elif selector == 0x1f:
+        codec = None
+        data = data[2:]
+    else:
+        codec = DVB_CHARACTER_TABLES.get(selector)
+        data = data[1:]
+
+    if codec is None:
+        return decode_iso6937(data)
+
+    try:
+        return data.decode(codec, 'replace')
+    except LookupError:
+        return data.decode('iso-8859-1')
+
+
+def _bcd(value):
+    return (value >> 4) * 10 + (value & 0x0f)
+
+
+def parse_meta(data):
+    """
+    Parse the content of a *.meta* file.
+
+    Args:
+        data (str): file content
+    Returns:
+        dict: values keyed by :py:data:`META_LINES`; texts are byte
+        strings, integers default to 0
+
+    >>> meta = parse_meta('1:0:19:7B:6:85:FFFF0000:0:0:0:\\nTitle\\n'
+    ...                   'Desc\\n1504104600\\nfoo bar\\n323884800\\n')
+    >>> meta['name'], meta['time_create'], meta['tags'], meta['file_size']
+    ('Title', 1504104600, 'foo bar', 0)
+    """
+    lines = data.split('\n')
+    meta = dict()
+
+    for offset, key in enumerate(META_LINES):
+        value = lines[offset].rstrip('\r') if offset < len(lines) else ''
+        if key in META_INTEGER_LINES:
+            try:
+                value = int(value)
+            except ValueError:
+                value = 0
+        meta[key] = value
+
+    return meta
+
+
+def parse_eit(data, languages=None, with_component_data=False):
+    """
+    Parse the content of an *.eit* file.
+
+    Texts of the first of *languages* (ISO 639-2 codes) contained in the
+    event information are used, texts of the first language found
+    otherwise. Texts of several descriptors of the same language are
+    concatenated.
+
+    Args:
+        data (str): file content
+        languages (tuple): preferred languages
+        with_component_data (bool): add component descriptors'
+            data as (tag, type, stream content, language, text) tuples
+    Returns:
+        dict: event data (same keys as
+        :py:func:`controllers.models.events.mangle_event`)
+    Raises:
+        ValueError: if *data* does not contain an event header
+    """
+    if len(data) < EIT_HEADER.size:
+        raise ValueError("Incomplete event header")
+
+    (event_id, mjd, hours, minutes, seconds,
+     d_hours, d_minutes, d_seconds, loop_length) = EIT_HEADER.unpack_from(
+        data)
+
+    #: language => [title portions, short text portions, extended text]
+    texts = dict()
+    found_languages = []
+    component_data = []
+
+    def language_texts(language):
+        if language not in texts:
+            texts[language] = ([], [], [])
+            found_languages.append(language)
+        return texts[language]
+
+    offset = EIT_HEADER.size
+    end = min(len(data), offset + (loop_length & 0x0fff))
+    while offset + 2 <= end:
+        tag = ord(data[offset])
+        body = data[offset + 2:offset + 2 + ord(data[offset + 1])]
+        offset += 2 + len(body)
+
+        try:
+            if tag == SHORT_EVENT_DESCRIPTOR:
+                name_length = ord(body[3])
+                text_length = ord(body[4 + name_length])
+                current = language_texts(body[:3].lower())
+                current[0].append(body[4:4 + name_length])
+                current[1].append(
+                    body[5 + name_length:5 + name_length + text_length])
+            elif tag == EXTENDED_EVENT_DESCRIPTOR:
+                items_length = ord(body[4])
+                text_offset = 6 + items_length
+                text_length = ord(body[text_offset - 1])
+                current = language_texts(body[1:4].lower())
+                current[2].append(
+                    (ord(body[0]) >> 4,
+                     body[text_offset:text_offset + text_length]))
+            elif tag == COMPONENT_DESCRIPTOR and with_component_data:
+                component_data.append((
+                    ord(body[2]), ord(body[1]), ord(body[0]) & 0x0f,
+                    body[3:6], decode_dvb_text(body[6:]).encode('utf-8')))
+        except IndexError:
+            continue
+
+    language = None
+    for candidate in (languages or ()):
+        if candidate.lower() in texts:
+            language = candidate.lower()
+            break
+    if language is None and found_languages:
+        language = found_languages[0]
+
+    (titles, short_texts, extended_texts) = texts.get(language, ([], [], []))
+    event = dict(
+        start_time=(mjd - MJD_UNIX_EPOCH) * 86400 + _bcd(hours) * 3600 +
+        _bcd(minutes) * 60 + _bcd(seconds),
+        duration=_bcd(d_hours) * 3600 + _bcd(d_minutes) * 60 + _bcd(
+            d_seconds),
+        title=u''.join(decode_dvb_text(value) for value in titles),
+        shortinfo=u''.join(decode_dvb_text(value) for value in short_texts),
+        longinfo=u''.join(decode_dvb_text(value) for _, value in sorted(
+            extended_texts, key=lambda portion: portion[0])),
+        id=event_id,
+    )
+
+    if with_component_data:
+        event['component_data'] = component_data
+
+    return event
+
+
+def eit_path(path):
+    """
+    Determine the *.eit* file path of recording *path*.
+
+    >>> eit_path('/media/hdd/movie/x.ts')
+    '/media/hdd/movie/x.eit'
+    """
+    return os.path.splitext(path)[0] + '.eit'
+
+
+def read_recording(path, languages=None, with_component_data=False):
+    """
+    Read the meta data and event information of recording *path*.
+
+    Args:
+        path (basestring): recording's path
+        languages (tuple): preferred event information languages
+        with_component_data (bool): add event's component data
+    Returns:
+        tuple: result of :py:func:`parse_meta` or *None* if there is no
+        *.meta* file and result of :py:func:`parse_eit` or *None* if
+        there is no (usable) *.eit* file
+
+    >>> from utilities import CONTRIB
+    >>> data_path = os.path.join(CONTRIB, '../testsuite/data')
+    >>> path = [os.path.join(data_path, name)
+    ...         for name in os.listdir(data_path) if name.endswith('.ts')][0]
+    >>> (meta, event) = read_recording(path)
+    >>> meta['service_reference'], meta['name'], meta['description']
+    ('1:0:19:7B:6:85:FFFF0000:0:0:0:', 'Animal Kingdom', 'S\\xc3\\xbcndenbock')
+    >>> meta['time_create'], meta['file_size'], meta['length']
+    (1504104600, 1778810880, 323884800)
+    >>> event['id'], event['start_time'], event['duration']
+    (35850, 1504104900, 3000)
+    >>> event['title']
+    u'Animal Kingdom'
+    >>> event['longinfo'][:33]
+    u'1. Staffel, Folge 5: XXXXX XXXXXX'
+    >>> event['longinfo'][-26:]
+    u'50 Min.\\n2016.\\nAb 12 Jahren'
+    >>> read_recording(path, with_component_data=True)[1]['component_data']
+    [(9, 11, 5, 'DEU', '16:9'), (7, 44, 4, 'DEU', 'Deutsch'), \
+(8, 44, 4, 'DEU', 'Englisch')]
+    >>> read_recording('/no/such/recording.ts')
+    (None, None)
+    """
+    meta = None
+    event = None
+
+    try:
+        with open(path + '.meta', 'rb') as source:
+            meta = parse_meta(source.read())
+    except IOError:
+        pass
+
+    try:
+        with open(eit_path(path), 'rb') as source:
+            event = parse_eit(source.read(), languages, with_component_data)
+    except (IOError, ValueError):
+        pass
+
+    return (meta, event)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Recordings Index
+----------------
+
+Persistent index of recording items as generated by
+:py:meth:`controllers.recording.RecordingsController.list_movies`.
+
+Items are keyed by the recording's path and invalidated by the
+modification time and size of the files a recording's meta data is
+derived from (``.ts``, ``.ts.meta``, ``.eit`` and ``.ts.cuts``).
+The index is stored as JSON file in the recordings root folder.
+
+While a :py:class:`controllers.recordings_watcher.RecordingsWatcher` is
+active the index acts as in-memory recordings model: changes are pushed
+as deltas and listings of completely indexed folders are served as
+snapshots without rescanning the folder.
+"""
+import os
+import copy
+import json
+import time
+import uuid
+import logging
+import threading
+
+#: filename of index file (relative to recordings root)
+INDEX_FILENAME = '.pert_belly_hack.recordings_index.json'
+
+#: index file format version
+INDEX_FORMAT_VERSION = 2
+
+#: shared index instances (recordings root => :py:class:`RecordingsIndex`)
+_INDEX_INSTANCES = dict()
+
+#: lock for :py:data:`_INDEX_INSTANCES`
+_INDEX_INSTANCES_LOCK = threading.Lock()
+
+
+def recording_files(path):
+    """
+    Determine the paths of the files a recording's meta data depends on.
+
+    Args:
+        path (basestring): recording's path
+    Returns:
+        tuple: file paths
+
+    >>> recording_files('/media/hdd/movie/x.ts')
+    ('/media/hdd/movie/x.ts', '/media/hdd/movie/x.ts.meta', \
+'/media/hdd/movie/x.eit', '/media/hdd/movie/x.ts.cuts')
+    """
+    (trunk, _) = os.path.splitext(path)
+    return (path, path + '.meta', trunk + '.eit', path + '.cuts')
+
+
+def recording_signature(path):
+    """
+    Create a signature for recording *path* consisting of modification time
+    and size of each file returned by :py:func:`recording_files`.
+    Missing files are represented by *None*.
+
+    Args:
+        path (basestring): recording's path
+    Returns:
+        list: signature
+
+    >>> recording_signature('/does/not/exist.ts')
+    [None, None, None, None]
+    """
+    signature = []
+
+    for current in recording_files(path):
+        try:
+            stat_result = os.stat(current)
+            signature.append([stat_result.st_mtime, stat_result.st_size])
+        except OSError:
+            signature.append(None)
+
+    return signature
+
+
+def folder_prefix(root_path):
+    """
+    Normalise folder *root_path* to end with a path separator so that it
+    matches paths located in the folder only.
+
+    >>> folder_prefix(u'/media/hdd/movie')
+    u'/media/hdd/movie/'
+    >>> folder_prefix('/media/hdd/movie/')
+    '/media/hdd/movie/'
+    """
+    if root_path.endswith(os.sep):
+        return root_path
+    return root_path + os.sep
+
+
+class RecordingsIndex(object):
+    """
+    Persistent recording items index.
+
+    >>> import tempfile, shutil
+    >>> root = tempfile.mkdtemp()
+    >>> idx = RecordingsIndex(root)
+    >>> idx.put(u'/x.ts', [None], {'path': u'/x.ts'})
+    >>> idx.save()
+    True
+    >>> idx2 = RecordingsIndex(root)
+    >>> idx2.get(u'/x.ts', [None])
+    {u'path': u'/x.ts'}
+    >>> idx2.get(u'/x.ts', [[1.0, 2]]) is None
+    True
+    >>> idx2.put(u'/movie2/y.ts', [None], {'path': u'/movie2/y.ts'})
+    >>> idx2.prune(u'/movie', set())
+    >>> idx2.paths(u'/movie')
+    []
+    >>> idx2.paths(u'/movie2')
+    [u'/movie2/y.ts']
+    >>> idx2.prune(u'/', set())
+    >>> idx2.get(u'/x.ts', [None]) is None
+    True
+    >>> shutil.rmtree(root)
+    """
+
+    def __init__(self, root_path, index_path=None):
+        """
+        Args:
+            root_path (basestring): recordings root folder
+            index_path (basestring): index file path or *None*
+        """
+        self.log = logging.getLogger(__name__)
+        self.root_path = root_path
+        if index_path is None:
+            index_path = os.path.join(root_path, INDEX_FILENAME)
+        self.index_path = index_path
+        self.lock = threading.RLock()
+        self.items = dict()
+        self.dirty = False
+        self.loaded = False
+        #: modification counter, increased on each alteration of items
+        self.version = 0
+        #: identifier distinguishing versions of different instances
+        self.instance_id = uuid.uuid4().hex[:12]
+        #: time of last alteration
+        self.modified = time.time()
+        #: paths of recordings which need to be (re)read
+        self.pending = set()
+        #: folders being watched for changes
+        self.watched_roots = set()
+        #: watched folders whose contents are completely indexed
+        self.complete_roots = set()
+        self._snapshots = dict()
+
+    def load(self):
+        """
+        Load index file contents. Invalid or missing index files result in
+        an empty index.
+        """
+        with self.lock:
+            self.loaded = True
+            self.items = dict()
+            self.dirty = False
+            self._changed()
+
+            try:
+                with open(self.index_path, "rb") as src:
+                    content = json.load(src)
+            except (IOError, ValueError) as exc:
+                self.log.debug("Index {!r} not loadable: {!r}".format(
+                    self.index_path, exc))
+                return
+
+            if content.get("version") != INDEX_FORMAT_VERSION:
+                self.log.info("Ignoring index {!r} (version {!r})".format(
+                    self.index_path, content.get("version")))
+                return
+
+            self.items = content.get("items", dict())
+
+    def _require_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def get(self, path, signature):
+        """
+        Retrieve a copy of indexed item for *path* if its signature matches
+        *signature*.
+
+        Args:
+            path (basestring): recording's path
+            signature (list): current signature
+        Returns:
+            dict: recording item or *None*
+        """
+        with self.lock:
+            self._require_loaded()
+            try:
+                entry = self.items[path]
+            except KeyError:
+                return None
+
+            if entry["signature"] != signature:
+                return None
+
+            return copy.deepcopy(entry["item"])
+
+    def put(self, path, signature, item):
+        """
+        Add or replace item for *path*.
+
+        Args:
+            path (basestring): recording's path
+            signature (list): current signature
+            item (dict): recording item
+        """
+        with self.lock:
+            self._require_loaded()
+            self.items[path] = dict(signature=signature,
+                                    item=copy.deepcopy(item))
+            self.pending.discard(path)
+            self._altered()
+
+    def prune(self, root_path, seen_paths):
+        """
+        Remove items located in *root_path* which are not contained in
+        *seen_paths*.
+
+        Args:
+            root_path (basestring): folder which has been listed completely
+            seen_paths (set): paths of the items encountered while listing
+        """
+        root_path = folder_prefix(root_path)
+        with self.lock:
+            self._require_loaded()
+            for path in self.items.keys():
+                if path.startswith(root_path) and path not in seen_paths:
+                    del self.items[path]
+                    self._altered()
+
+    def _altered(self):
+        self.dirty = True
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self.modified = time.time()
+        self._snapshots = dict()
+
+    def signature(self, path):
+        """
+        Retrieve indexed signature of *path*.
+
+        Args:
+            path (basestring): recording's path
+        Returns:
+            list: signature or *None*
+        """
+        with self.lock:
+            self._require_loaded()
+            try:
+                return self.items[path]["signature"]
+            except KeyError:
+                return None
+
+    def paths(self, root_path):
+        """
+        Retrieve indexed paths located in *root_path*.
+
+        Args:
+            root_path (basestring): folder
+        Returns:
+            list: paths
+        """
+        root_path = folder_prefix(root_path)
+        with self.lock:
+            self._require_loaded()
+            return [path for path in self.items if path.startswith(root_path)]
+
+    def invalidate(self, path):
+        """
+        Mark recording *path* as changed (or added).
+
+        Args:
+            path (basestring): recording's path
+        """
+        with self.lock:
+            self._require_loaded()
+            self.pending.add(path)
+            self._changed()
+
+    def discard(self, path):
+        """
+        Remove recording *path*.
+
+        Args:
+            path (basestring): recording's path
+        """
+        with self.lock:
+            self._require_loaded()
+            self.pending.discard(path)
+            if self.items.pop(path, None) is not None:
+                self._altered()
+
+    def pop_pending(self):
+        """
+        Retrieve and reset the paths of changed recordings.
+
+        Returns:
+            set: paths
+        """
+        with self.lock:
+            pending = self.pending
+            self.pending = set()
+            return pending
+
+    def set_watched(self, root_paths):
+        """
+        Define which folders are watched for changes. Passing an empty
+        sequence disables snapshot listings.
+
+        Args:
+            root_paths: watched folders
+        """
+        with self.lock:
+            self.watched_roots = set(folder_prefix(root_path)
+                                     for root_path in root_paths)
+            self.complete_roots = set()
+            self._snapshots = dict()
+
+    def _watched(self, root_path):
+        root_path = folder_prefix(root_path)
+        for watched in self.watched_roots:
+            if root_path.startswith(watched):
+                return True
+        return False
+
+    def mark_complete(self, root_path):
+        """
+        Note that all recordings located in *root_path* have been indexed.
+
+        Args:
+            root_path (basestring): folder which has been listed completely
+        """
+        with self.lock:
+            if self._watched(root_path):
+                self.complete_roots.add(folder_prefix(root_path))
+
+    def has_snapshot(self, root_path):
+        """
+        Check if listings of *root_path* may be served by
+        :py:meth:`snapshot`.
+
+        Args:
+            root_path (basestring): folder
+        Returns:
+            bool: True if a snapshot is available
+        """
+        root_path = folder_prefix(root_path)
+        with self.lock:
+            for complete in self.complete_roots:
+                if root_path.startswith(complete):
+                    return True
+            return False
+
+    def snapshot(self, root_path):
+        """
+        Retrieve indexed items located in *root_path*, ordered by path.
+        The returned items are shared and must not be altered.
+
+        Args:
+            root_path (basestring): folder
+        Returns:
+            tuple: recording items
+        """
+        root_path = folder_prefix(root_path)
+        with self.lock:
+            self._require_loaded()
+            try:
+                return self._snapshots[root_path]
+            except KeyError:
+                pass
+
+            current = tuple(
+                self.items[path]["item"] for path in sorted(self.items)
+                if path.startswith(root_path))
+            self._snapshots[root_path] = current
+            return current
+
+    def derived(self, root_path, key, factory):
+        """
+        Retrieve data derived from the snapshot of *root_path* by
+        *factory(snapshot)*. The result is kept until items are altered.
+
+        Args:
+            root_path (basestring): folder
+            key: identifier of the derived data
+            factory: callable creating the derived data
+        Returns:
+            derived data
+        """
+        root_path = folder_prefix(root_path)
+        with self.lock:
+            derived_key = (root_path, key)
+            try:
+                return self._snapshots[derived_key]
+            except KeyError:
+                pass
+
+            current = factory(self.snapshot(root_path))
+            self._snapshots[derived_key] = current
+            return current
+
+    def save(self):
+        """
+        Write index file if items were altered.
+
+        Returns:
+            bool: True if index file has been written
+        """
+        with self.lock:
+            if not self.dirty:
+                return False
+
+            content = dict(version=INDEX_FORMAT_VERSION, items=self.items)
+            temporary_path = self.index_path + '.tmp'
+
+            try:
+                with open(temporary_path, "wb") as tgt:
+                    json.dump(content, tgt)
+                os.rename(temporary_path, self.index_path)
+            except (IOError, OSError, TypeError, ValueError) as exc:
+                self.log.error("Index {!r} not writable: {!r}".format(
+                    self.index_path, exc))
+                return False
+
+            self.dirty = False
+            return True
+
+
+def get_recordings_index(root_path):
+    """
+    Retrieve the shared :py:class:`RecordingsIndex` instance for
+    *root_path*.
+
+    Args:
+        root_path (basestring): recordings root folder
+    Returns:
+        RecordingsIndex: index instance
+    """
+    with _INDEX_INSTANCES_LOCK:
+        try:
+            return _INDEX_INSTANCES[root_path]
+        except KeyError:
+            instance = RecordingsIndex(root_path)
+            _INDEX_INSTANCES[root_path] = instance
+            return instance
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Recordings Query
+----------------
+
+Sorting, filtering and cursor based pagination of recording items (as
+created by :py:class:`controllers.recording.RecordingsController`).
+
+Items are ordered once per sort key (:py:class:`SortedRecordings`), for
+recordings index snapshots the ordered items are memoised until the index
+is altered (see
+:py:meth:`controllers.recordings_index.RecordingsIndex.derived`).
+A page is located by bisecting the ordered items for the position encoded
+in the cursor, thus retrieving a page of unfiltered items does not depend
+on the number of recordings.
+
+Cursors denote the position (sort key value and path) of the last item
+of the previous page, so that pages do not shift if recordings are added
+or removed in the meantime.
+"""
+import json
+import base64
+import bisect
+
+#: default sort key
+DEFAULT_SORT = 'path'
+
+#: maximum number of items per page
+MAX_LIMIT = 1000
+
+#: request arguments evaluated by :py:meth:`RecordingsQuery.from_args`
+QUERY_ARGUMENTS = (
+    'sort', 'limit', 'cursor', 'service', 'since', 'until', 'title', 'tag')
+
+
+def item_path(item):
+    return item.get('path') or u''
+
+
+def item_time(item):
+    """
+    Determine the creation (or event start) time of recording *item*.
+
+    >>> item_time({'meta': {'TimeCreate': 10}, 'event': {'start_time': 5}})
+    10
+    >>> item_time({'meta': {}, 'event': {'start_time': 5}})
+    5
+    >>> item_time({})
+    0
+    """
+    value = item.get('meta', {}).get('TimeCreate')
+    if not value:
+        value = item.get('event', {}).get('start_time')
+    return value or 0
+
+
+def item_title(item):
+    """
+    Determine the (lower case) title of recording *item*.
+
+    >>> item_title({'label': u'Label', 'event': {'title': u'Event Title'}})
+    u'event title'
+    >>> item_title({'label': u'Label'})
+    u'label'
+    """
+    value = item.get('event', {}).get('title') or item.get('label') or u''
+    return value.lower()
+
+
+def item_service(item):
+    return (item.get('recording_servicename') or u'').lower()
+
+
+def item_size(item):
+    return item.get('meta', {}).get('FileSize') or 0
+
+
+#: sort key => function determining an item's sort key value
+SORT_KEYS = {
+    'path': item_path,
+    'time': item_time,
+    'title': item_title,
+    'service': item_service,
+    'size': item_size,
+}
+
+
+def encode_cursor(sort_key, position):
+    """
+    Encode *position* of an item ordered by *sort_key* as a cursor.
+
+    >>> cursor = encode_cursor('time', (10, u'/x.ts'))
+    >>> decode_cursor(cursor, 'time')
+    (10, u'/x.ts')
+    >>> decode_cursor(cursor, 'path')
+    Traceback (most recent call last):
+        ...
+    ValueError: cursor does not match sort key
+    """
+    data = json.dumps([sort_key, position[0], position[1]])
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def decode_cursor(cursor, sort_key):
+    """
+    Decode *cursor* created by :py:func:`encode_cursor`.
+
+    Args:
+        cursor (str): cursor
+        sort_key (basestring): expected sort key
+    Returns:
+        tuple: position (sort key value, path)
+    Raises:
+        ValueError: if *cursor* is invalid
+    """
+    try:
+        padded = str(cursor) + '=' * (-len(cursor) % 4)
+        (cursor_sort_key, value, path) = json.loads(
+            base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("invalid cursor")
+
+    if cursor_sort_key != sort_key:
+        raise ValueError("cursor does not match sort key")
+    return (value, path)
+
+
+class SortedRecordings(object):
+    """
+    Recording items ordered by a sort key (ties are ordered by path).
+
+    >>> items = [{'path': u'/b.ts', 'meta': {'FileSize': 2}},
+    ...          {'path': u'/a.ts', 'meta': {'FileSize': 3}},
+    ...          {'path': u'/c.ts', 'meta': {'FileSize': 2}}]
+    >>> view = SortedRecordings(items, 'size')
+    >>> [item['path'] for _, item in view.iterate()]
+    [u'/b.ts', u'/c.ts', u'/a.ts']
+    >>> [item['path'] for _, item in view.iterate((2, u'/b.ts'))]
+    [u'/c.ts', u'/a.ts']
+    >>> [item['path'] for _, item in view.iterate((2, u'/c.ts'), True)]
+    [u'/b.ts']
+    """
+    __slots__ = ('sort_key', 'positions', 'items')
+
+    def __init__(self, items, sort_key=DEFAULT_SORT):
+        """
+        Args:
+            items: recording items
+            sort_key (basestring): key of :py:data:`SORT_KEYS`
+        """
+        func = SORT_KEYS[sort_key]
+        ordered = sorted(
+            ((func(item), item_path(item)), item) for item in items)
+        self.sort_key = sort_key
+        #: (sort key value, path) of items
+        self.positions = [position for position, _ in ordered]
+        self.items = [item for _, item in ordered]
+
+    def __len__(self):
+        return len(self.items)
+
+    def iterate(self, cursor=None, descending=False):
+        """
+        Generate the items following position *cursor*.
+
+        Args:
+            cursor (tuple): position of previous item or *None*
+            descending (bool): iterate in descending order
+        Returns:
+            generator: (position, item) tuples
+        """
+        if descending:
+            if cursor is None:
+                offset = len(self.items)
+            else:
+                offset = bisect.bisect_left(self.positions, cursor)
+            for current in xrange(offset - 1, -1, -1):
+                yield (self.positions[current], self.items[current])
+        else:
+            if cursor is None:
+                offset = 0
+            else:
+                offset = bisect.bisect_right(self.positions, cursor)
+            for current in xrange(offset, len(self.items)):
+                yield (self.positions[current], self.items[current])
+
+
+def _integer_argument(args, key, minimum=None):
+    try:
+        value = int(args[key][0])
+    except KeyError:
+        return None
+    except (IndexError, ValueError):
+        raise ValueError("invalid {:s} value".format(key))
+
+    if minimum is not None and value < minimum:
+        raise ValueError("invalid {:s} value".format(key))
+    return value
+
+
+def _text_argument(args, key):
+    try:
+        value = args[key][0]
+    except (KeyError, IndexError):
+        return None
+
+    if isinstance(value, str):
+        value = value.decode('utf-8', 'ignore')
+    return value.lower() or None
+
+
+class RecordingsQuery(object):
+    """
+    Sorting, filter and pagination criteria of a recordings listing.
+
+    >>> items = [dict(path=u'/{:d}.ts'.format(number), label=u'Rec',
+    ...               recording_servicename=u'Das Erste' if number % 2
+    ...               else u'ZDF', meta=dict(TimeCreate=number * 100,
+    ...               Tags=u'news' if number > 6 else u''))
+    ...          for number in range(10)]
+    >>> view = SortedRecordings(items, 'time')
+    >>> query = RecordingsQuery.from_args({'sort': ['-time'], 'limit': ['3']})
+    >>> (page, cursor) = query.page(view)
+    >>> [item['path'] for item in page]
+    [u'/9.ts', u'/8.ts', u'/7.ts']
+    >>> query = RecordingsQuery.from_args({
+    ...     'sort': ['-time'], 'limit': ['3'], 'cursor': [cursor]})
+    >>> [item['path'] for item in query.page(view)[0]]
+    [u'/6.ts', u'/5.ts', u'/4.ts']
+    >>> query = RecordingsQuery.from_args({
+    ...     'sort': ['time'], 'service': ['das erste'], 'since': ['200']})
+    >>> [item['path'] for item in query.page(view)[0]]
+    [u'/3.ts', u'/5.ts', u'/7.ts', u'/9.ts']
+    >>> query = RecordingsQuery.from_args({'tag': ['news'], 'limit': ['2']})
+    >>> (page, cursor) = query.page(SortedRecordings(items))
+    >>> [item['path'] for item in page], cursor is None
+    ([u'/7.ts', u'/8.ts'], False)
+    >>> RecordingsQuery.from_args({'compact': ['1']}) is None
+    True
+    >>> RecordingsQuery.from_args({'sort': ['colour']})
+    Traceback (most recent call last):
+        ...
+    ValueError: invalid sort value
+    """
+
+    def __init__(self, sort=DEFAULT_SORT, descending=False, limit=None,
+                 cursor=None, service=None, since=None, until=None,
+                 title=None, tag=None):
+        """
+        Args:
+            sort (basestring): key of :py:data:`SORT_KEYS`
+            descending (bool): descending order
+            limit (int): maximum number of items per page or *None*
+            cursor (tuple): position of previous page's last item
+            service (unicode): (lower case) service name or reference
+            since (int): minimum creation time
+            until (int): creation time limit (exclusive)
+            title (unicode): (lower case) part of the title
+            tag (unicode): (lower case) tag
+        """
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+        self.cursor = cursor
+        self.service = service
+        self.since = since
+        self.until = until
+        self.title = title
+        self.tag = tag
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        Create a query from request arguments (see
+        :py:data:`QUERY_ARGUMENTS`).
+
+        Args:
+            args (dict): request arguments
+        Returns:
+            RecordingsQuery: query or *None* if no query arguments are
+            contained in *args*
+        Raises:
+            ValueError: if an argument value is invalid
+        """
+        if not any(key in args for key in QUERY_ARGUMENTS):
+            return None
+
+        sort = args.get('sort', [DEFAULT_SORT])[0] or DEFAULT_SORT
+        descending = sort.startswith('-')
+        sort = sort.lstrip('-')
+        if sort not in SORT_KEYS:
+            raise ValueError("invalid sort value")
+
+        limit = _integer_argument(args, 'limit', minimum=1)
+        if limit is not None:
+            limit = min(limit, MAX_LIMIT)
+
+        cursor = args.get('cursor', [None])[0]
+        if cursor:
+            cursor = decode_cursor(cursor, sort)
+        else:
+            cursor = None
+
+        return cls(sort=sort, descending=descending, limit=limit,
+                   cursor=cursor, service=_text_argument(args, 'service'),
+                   since=_integer_argument(args, 'since'),
+                   until=_integer_argument(args, 'until'),
+                   title=_text_argument(args, 'title'),
+                   tag=_text_argument(args, 'tag'))
+
+    def cache_key(self):
+        """
+        Returns:
+            tuple: values distinguishing the results of queries
+        """
+        return (self.sort, self.descending, self.limit, self.cursor,
+                self.service, self.since, self.until, self.title, self.tag)
+
+    def matches(self, item):
+        """
+        Check if recording *item* satisfies the filter criteria.
+
+        Args:
+            item (dict): recording item
+        Returns:
+            bool: True if *item* matches
+        """
+        if self.service is not None:
+            service_reference = item.get('meta', {}).get('Serviceref') or u''
+            if self.service not in (item_service(item),
+                                    service_reference.lower()):
+                return False
+
+        if self.since is not None or self.until is not None:
+            when = item_time(item)
+            if self.since is not None and when < self.since:
+                return False
+            if self.until is not None and when >= self.until:
+                return False
+
+        if self.title is not None and self.title not in item_title(item):
+            return False
+
+        if self.tag is not None:
+            tags = (item.get('meta', {}).get('Tags') or u'').lower().split()
+            if self.tag not in tags:
+                return False
+
+        return True
+
+    def page(self, view):
+        """
+        Retrieve the items of the requested page.
+
+        Args:
+            view (SortedRecordings): items ordered by :py:attr:`sort`
+        Returns:
+            tuple: list of items and cursor of next page (*None* if there
+            are no more items)
+        """
+        result = []
+        last = None
+
+        for position, item in view.iterate(self.cursor, self.descending):
+            if not self.matches(item):
+                continue
+            if self.limit is not None and len(result) == self.limit:
+                return (result, encode_cursor(self.sort, last))
+            result.append(item)
+            last = position
+
+        return (result, None)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
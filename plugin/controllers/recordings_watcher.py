@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Recordings Watcher
+------------------
+
+Watch folders containing recordings for added, removed or altered
+recordings and push the changes into a
+:py:class:`controllers.recordings_index.RecordingsIndex` instance.
+
+Changes are detected using inotify if available. Otherwise the folders are
+scanned periodically.
+"""
+import os
+import logging
+
+from twisted.internet import task, threads
+
+from recordings_index import recording_signature
+from location_scan import iter_location_scans
+
+try:
+    from twisted.internet import inotify
+    from twisted.python import filepath
+    HAVE_INOTIFY = True
+except ImportError:
+    HAVE_INOTIFY = False
+
+#: file extensions of recordings
+RECORDING_EXTENSIONS = (
+    '.ts', '.m2ts', '.mts', '.mkv', '.mp4', '.m4v', '.mpg', '.mpeg', '.avi',
+    '.divx', '.mov', '.wmv', '.flv', '.webm', '.iso',
+)
+
+#: suffixes of files containing recording's meta data (appended to the
+#: recording's path)
+META_SUFFIXES = ('.meta', '.cuts', '.ap', '.sc')
+
+#: scan interval in seconds if inotify is not available
+POLL_INTERVAL = 30
+
+#: scan interval in seconds for catching changes missed by inotify
+RECONCILIATION_INTERVAL = 15 * 60
+
+if HAVE_INOTIFY:
+    #: inotify events of interest
+    WATCH_MASK = (inotify.IN_CLOSE_WRITE | inotify.IN_CREATE |
+                  inotify.IN_DELETE | inotify.IN_MOVED_FROM |
+                  inotify.IN_MOVED_TO)
+
+#: active watcher instance
+_WATCHER = None
+
+
+def recording_path_for(path):
+    """
+    Determine the path of the recording file *path* is belonging to.
+
+    Args:
+        path (basestring): path of a recording or a meta data file
+    Returns:
+        basestring: path of recording or *None*
+
+    >>> recording_path_for('/x/a.ts.meta')
+    '/x/a.ts'
+    >>> recording_path_for('/x/a.ts')
+    '/x/a.ts'
+    >>> recording_path_for('/x/a.eit')
+    '/x/a.ts'
+    >>> recording_path_for('/x/a.mkv.cuts')
+    '/x/a.mkv'
+    >>> recording_path_for('/x/.pert_belly_hack.recordings_index.json')
+    """
+    (trunk, ext) = os.path.splitext(path)
+    ext = ext.lower()
+
+    if ext in RECORDING_EXTENSIONS:
+        return path
+
+    if ext in META_SUFFIXES:
+        if os.path.splitext(trunk)[1].lower() in RECORDING_EXTENSIONS:
+            return trunk
+        return None
+
+    if ext == '.eit':
+        for candidate in RECORDING_EXTENSIONS:
+            if os.path.isfile(trunk + candidate):
+                return trunk + candidate
+        return trunk + '.ts'
+
+    return None
+
+
+def scan_recordings(root_path):
+    """
+    Determine the signatures of all recordings located in *root_path*.
+
+    Args:
+        root_path (basestring): folder
+    Returns:
+        dict: path => signature
+    """
+    found = dict()
+
+    for (dirpath, _, filenames) in os.walk(root_path):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in RECORDING_EXTENSIONS:
+                path = os.path.join(dirpath, filename)
+                found[path] = recording_signature(path)
+
+    return found
+
+
+class RecordingsWatcher(object):
+    """
+    Watch *root_paths* and push changes to *index*.
+    """
+
+    def __init__(self, index, root_paths, encoding="utf-8"):
+        """
+        Args:
+            index (RecordingsIndex): recordings index
+            root_paths (list): folders to be watched
+            encoding: filesystem encoding
+        """
+        self.log = logging.getLogger(__name__)
+        self.index = index
+        self.encoding = encoding
+        self.root_paths = []
+        self.notifier = None
+        self.poller = None
+
+        for root_path in root_paths:
+            if not root_path.endswith('/'):
+                root_path += '/'
+            if root_path not in self.root_paths:
+                self.root_paths.append(root_path)
+
+    def _decode(self, path):
+        if isinstance(path, unicode):
+            return path
+        return path.decode(self.encoding, 'ignore')
+
+    def start(self):
+        """
+        Start watching.
+        """
+        roots = [root for root in self.root_paths if os.path.isdir(root)]
+        self.index.set_watched([self._decode(root) for root in roots])
+        interval = POLL_INTERVAL
+
+        if HAVE_INOTIFY:
+            try:
+                self.notifier = inotify.INotify()
+                self.notifier.startReading()
+                for root in roots:
+                    self.notifier.watch(
+                        filepath.FilePath(root), mask=WATCH_MASK,
+                        autoAdd=True, recursive=True,
+                        callbacks=[self._on_inotify_event])
+                interval = RECONCILIATION_INTERVAL
+            except Exception as exc:
+                self.log.warning("inotify not usable: {!r}".format(exc))
+                self._stop_notifier()
+
+        self.log.info("Watching {!r} (inotify={!r}, interval={:d}s)".format(
+            roots, self.notifier is not None, interval))
+        self.poller = task.LoopingCall(self.poll)
+        self.poller.start(interval, now=False)
+
+    def _stop_notifier(self):
+        if self.notifier is not None:
+            try:
+                self.notifier.loseConnection()
+            except Exception as exc:
+                self.log.error(exc)
+        self.notifier = None
+
+    def stop(self):
+        """
+        Stop watching.
+        """
+        self._stop_notifier()
+        if self.poller is not None and self.poller.running:
+            self.poller.stop()
+        self.poller = None
+        self.index.set_watched([])
+
+    def _on_inotify_event(self, ignored, changed, mask):
+        path = changed.path
+
+        if mask & inotify.IN_ISDIR:
+            if mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                deferred = threads.deferToThread(scan_recordings, path)
+                deferred.addCallback(self._apply_added_folder)
+                deferred.addErrback(lambda failure: self.log.error(failure))
+            elif mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                for known in self.index.paths(self._decode(path + '/')):
+                    self.index.discard(known)
+            return
+
+        recording_path = recording_path_for(path)
+        if recording_path is None:
+            return
+
+        removed = mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM)
+        if removed and recording_path == path:
+            self.index.discard(self._decode(recording_path))
+        else:
+            self.index.invalidate(self._decode(recording_path))
+
+    def _apply_added_folder(self, found):
+        for path in found:
+            self.index.invalidate(self._decode(path))
+
+    def _scan(self):
+        found = dict()
+        scanned_roots = []
+        for root, current in iter_location_scans(self.root_paths,
+                                                 scan_recordings):
+            scanned_roots.append(root)
+            for path, signature in current.iteritems():
+                found[self._decode(path)] = signature
+        return (found, scanned_roots)
+
+    def _apply_scan(self, result):
+        (found, scanned_roots) = result
+
+        # recordings of locations not scanned in time are kept
+        for root in scanned_roots:
+            for known in self.index.paths(self._decode(root)):
+                if known not in found:
+                    self.index.discard(known)
+
+        for path, signature in found.iteritems():
+            if self.index.signature(path) != signature:
+                self.index.invalidate(path)
+
+    def poll(self):
+        """
+        Scan watched folders (concurrently, in a worker thread) and push
+        changes.
+
+        Returns:
+            twisted.internet.defer.Deferred: scan result
+        """
+        deferred = threads.deferToThread(self._scan)
+        deferred.addCallback(self._apply_scan)
+        deferred.addErrback(lambda failure: self.log.error(failure))
+        return deferred
+
+
+def start_watching(index, root_paths):
+    """
+    Start the shared :py:class:`RecordingsWatcher` instance unless it is
+    already running.
+
+    Args:
+        index (RecordingsIndex): recordings index
+        root_paths (list): folders to be watched
+    Returns:
+        RecordingsWatcher: watcher instance
+    """
+    global _WATCHER
+
+    if _WATCHER is None:
+        _WATCHER = RecordingsWatcher(index, root_paths)
+        _WATCHER.start()
+
+    return _WATCHER
+
+
+def stop_watching():
+    """
+    Stop the shared :py:class:`RecordingsWatcher` instance.
+    """
+    global _WATCHER
+
+    if _WATCHER is not None:
+        _WATCHER.stop()
+        _WATCHER = None
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Response Cache
+--------------
+
+Cache for rendered responses of idempotent endpoints which are polled
+frequently by clients (e.g. ``/api/getcurrent`` or ``/api/epgnownext``).
+
+Request handlers opt in using :py:func:`cached` and declare the endpoints
+whose responses become stale when they are called using
+:py:func:`invalidates`. Entries are keyed by namespace (e.g. ``api`` or
+``web``), endpoint name and normalised request arguments. The cache is
+limited by the accumulated size of the cached responses, least recently
+used entries are evicted first.
+
+Besides the body, the response headers which are set by the request
+handlers and matter to clients (content type, expiration, CORS) are
+cached and replayed (see :py:func:`response_headers`).
+"""
+import time
+import threading
+import collections
+
+#: maximum accumulated size of cached responses in bytes
+RESPONSE_CACHE_MAX_BYTES = 4 * 1024 * 1024
+
+#: request arguments not being part of cache keys (cache busters)
+IGNORED_ARGUMENTS = ('_', )
+
+#: (lower case) response headers stored with cached responses
+CACHED_HEADERS = ('content-type', 'cache-control', 'expires', 'pragma')
+
+#: prefix of (lower case) CORS response headers stored with cached responses
+CORS_HEADER_PREFIX = 'access-control-'
+
+#: handler attribute holding the time to live of cached responses
+CACHE_TTL_ATTRIBUTE = '_cache_ttl'
+
+#: handler attribute holding the names of invalidated endpoints
+INVALIDATES_ATTRIBUTE = '_cache_invalidates'
+
+#: shared cache instance
+_RESPONSE_CACHE = None
+
+#: lock for :py:data:`_RESPONSE_CACHE`
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def cached(ttl):
+    """
+    Decorator marking a request handler's responses as cacheable for
+    *ttl* seconds.
+
+    >>> @cached(5)
+    ... def P_getcurrent(request):
+    ...     pass
+    >>> cache_ttl(P_getcurrent)
+    5
+    >>> cache_ttl(len)
+    0
+    """
+    def decorate(func):
+        setattr(func, CACHE_TTL_ATTRIBUTE, ttl)
+        return func
+
+    return decorate
+
+
+def invalidates(*endpoints):
+    """
+    Decorator marking a request handler as altering the responses of
+    *endpoints*.
+
+    >>> @invalidates('getcurrent', 'epgnownext')
+    ... def P_zap(request):
+    ...     pass
+    >>> invalidated_endpoints(P_zap)
+    ('getcurrent', 'epgnownext')
+    >>> invalidated_endpoints(len)
+    ()
+    """
+    def decorate(func):
+        setattr(func, INVALIDATES_ATTRIBUTE, endpoints)
+        return func
+
+    return decorate
+
+
+def cache_ttl(func):
+    """
+    Determine the time to live of *func*'s cached responses.
+
+    Args:
+        func: request handler
+    Returns:
+        int: time to live in seconds, 0 if responses are not cacheable
+    """
+    return getattr(func, CACHE_TTL_ATTRIBUTE, 0)
+
+
+def invalidated_endpoints(func):
+    """
+    Determine the endpoints whose responses are altered by calling *func*.
+
+    Args:
+        func: request handler
+    Returns:
+        tuple: endpoint names
+    """
+    return getattr(func, INVALIDATES_ATTRIBUTE, ())
+
+
+def cache_key(namespace, endpoint, args):
+    """
+    Create a cache key.
+
+    Args:
+        namespace (basestring): cache namespace, e.g. ``api``
+        endpoint (basestring): endpoint name
+        args (dict): request arguments
+    Returns:
+        tuple: cache key
+
+    >>> cache_key('api', 'epgnow', {'b': ['2'], 'a': ['1'], '_': ['123']})
+    ('api', 'epgnow', (('a', ('1',)), ('b', ('2',))))
+    >>> cache_key('api', 'epgnow', {'a': ['1'], 'b': ['2']}) == \
+cache_key('api', 'epgnow', {'b': ['2'], 'a': ['1'], '_': ['456']})
+    True
+    """
+    normalised = tuple(sorted(
+        (key, tuple(value)) for key, value in args.iteritems()
+        if key not in IGNORED_ARGUMENTS))
+    return (namespace, endpoint, normalised)
+
+
+def response_headers(request):
+    """
+    Collect the headers of *request*'s response to be stored with a cached
+    response (see :py:data:`CACHED_HEADERS` and
+    :py:data:`CORS_HEADER_PREFIX`).
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+    Returns:
+        tuple: (header name, values) tuples
+
+    >>> from twisted.web.test.requesthelper import DummyRequest
+    >>> request = DummyRequest([''])
+    >>> request.setHeader('Content-Type', 'text/xml')
+    >>> request.setHeader('Access-Control-Allow-Origin', '*')
+    >>> request.setHeader('X-Other', '1')
+    >>> sorted(response_headers(request))
+    [('Access-Control-Allow-Origin', ('*',)), ('Content-Type', ('text/xml',))]
+    """
+    return tuple(
+        (name, tuple(values))
+        for name, values in request.responseHeaders.getAllRawHeaders()
+        if name.lower() in CACHED_HEADERS or
+        name.lower().startswith(CORS_HEADER_PREFIX))
+
+
+def replay_headers(request, headers):
+    """
+    Set the headers of a cached response (see :py:func:`response_headers`).
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        headers (tuple): (header name, values) tuples
+    """
+    for name, values in headers:
+        request.responseHeaders.setRawHeaders(name, list(values))
+
+
+class ResponseCache(object):
+    """
+    Size limited LRU cache for rendered responses with per entry
+    expiration.
+
+    >>> now = [0]
+    >>> rc = ResponseCache(max_bytes=10, clock=lambda: now[0])
+    >>> headers = (('Content-Type', ('text/plain',)),)
+    >>> rc.put(('api', 'a', ()), headers, '12345', ttl=5)
+    >>> rc.put(('api', 'b', ()), headers, '12345', ttl=5)
+    >>> rc.get(('api', 'a', ()))
+    ((('Content-Type', ('text/plain',)),), '12345')
+    >>> rc.put(('api', 'c', ()), headers, '1', ttl=5)
+    >>> rc.get(('api', 'b', ())) is None
+    True
+    >>> now[0] = 6
+    >>> rc.get(('api', 'a', ())) is None
+    True
+    >>> rc.put(('web', 'c', ()), headers, '2', ttl=5)
+    >>> rc.invalidate('c')
+    >>> rc.get(('web', 'c', ())) is None
+    True
+    >>> sorted(rc.stats().items())
+    [('entries', 0), ('evictions', 1), ('expirations', 1), \
+('hits', 1), ('invalidations', 2), ('max_bytes', 10), ('misses', 3), \
+('size', 0)]
+    """
+
+    def __init__(self, max_bytes=None, clock=None):
+        """
+        Args:
+            max_bytes (int): maximum accumulated size of cached responses
+            clock: callable returning current time
+        """
+        if max_bytes is None:
+            max_bytes = RESPONSE_CACHE_MAX_BYTES
+        if clock is None:
+            clock = time.time
+
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.counters = dict(hits=0, misses=0, evictions=0, expirations=0,
+                             invalidations=0)
+
+    def _remove(self, key):
+        (_, _, body) = self.entries.pop(key)
+        self.size -= len(body)
+
+    def get(self, key):
+        """
+        Retrieve cached response for *key*.
+
+        Args:
+            key (tuple): cache key
+        Returns:
+            tuple: (headers, body) or *None*
+        """
+        with self.lock:
+            try:
+                (expires, headers, body) = self.entries.pop(key)
+            except KeyError:
+                self.counters['misses'] += 1
+                return None
+
+            if expires <= self.clock():
+                self.size -= len(body)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return None
+
+            # re-insert as most recently used entry
+            self.entries[key] = (expires, headers, body)
+            self.counters['hits'] += 1
+            return (headers, body)
+
+    def put(self, key, headers, body, ttl):
+        """
+        Add response for *key* evicting least recently used entries if
+        needed. Responses larger than the cache are not added.
+
+        Args:
+            key (tuple): cache key
+            headers (tuple): response's headers (see
+                :py:func:`response_headers`)
+            body (str): response's body
+            ttl (int): time to live in seconds
+        """
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            if len(body) > self.max_bytes:
+                return
+
+            while self.entries and self.size + len(body) > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.counters['evictions'] += 1
+
+            self.entries[key] = (self.clock() + ttl, headers, body)
+            self.size += len(body)
+
+    def invalidate(self, *endpoints):
+        """
+        Remove all cached responses of *endpoints* (in all namespaces).
+
+        Args:
+            *endpoints: endpoint names
+        """
+        if not endpoints:
+            return
+
+        with self.lock:
+            for key in self.entries.keys():
+                if key[1] in endpoints:
+                    self._remove(key)
+                    self.counters['invalidations'] += 1
+
+    def clear(self):
+        """
+        Remove all cached responses.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Retrieve cache statistics.
+
+        Returns:
+            dict: counters, number of entries and accumulated size
+        """
+        with self.lock:
+            data = dict(self.counters)
+            data['entries'] = len(self.entries)
+            data['size'] = self.size
+            data['max_bytes'] = self.max_bytes
+            return data
+
+
+def get_response_cache():
+    """
+    Retrieve the shared :py:class:`ResponseCache` instance.
+
+    Returns:
+        ResponseCache: cache instance
+    """
+    global _RESPONSE_CACHE
+
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            _RESPONSE_CACHE = ResponseCache()
+        return _RESPONSE_CACHE
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -2,11 +2,15 @@
 # -*- coding: utf-8 -*-
 import json
 import copy
+import math
+import hashlib
 import logging
 
-from twisted.web import resource, http
+from twisted.web import resource, http, server
 
 from utilities import get_servicereference_portions, add_expires_header
+from streaming import ChunkProducer, iter_json, iter_chunks, json_default
+from execution import runs_in_worker_thread, DeferredRendering
 
 #: CORS - HTTP headers the client may use
 CORS_ALLOWED_CLIENT_HEADERS = [
@@ -42,7 +46,126 @@ def json_response(request, data, indent=1):
         JSON representation of *data* with appropriate HTTP headers
     """
     request.setHeader("content-type", "application/json; charset=utf-8")
-    return json.dumps(data, indent=indent)
+    return json.dumps(data, indent=indent, default=json_default)
+
+
+def json_stream_response(request, data, indent=1):
+    """
+    Write a JSON representation for *data* in chunks and set HTTP headers
+    indicating that JSON encoded data is returned.
+    Generators contained in *data* are consumed while the response is
+    being written.
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        data: response content
+        indent: indentation level or None
+    Returns:
+        :py:data:`twisted.web.server.NOT_DONE_YET`
+    """
+    request.setHeader("content-type", "application/json; charset=utf-8")
+    producer = ChunkProducer(request, iter_chunks(iter_json(data, indent)))
+    return producer.start()
+
+
+def requested_indent(request, fallback=1):
+    """
+    Determine JSON indentation level based on request parameters:
+    ``compact=1`` disables indentation.
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        fallback: indentation level if not disabled
+    Returns:
+        indentation level or None
+    """
+    if request.args.get("compact", ["0"])[0] not in ("0", "", "false"):
+        return None
+    return fallback
+
+
+def make_etag(request, *portions):
+    """
+    Create a strong entity tag (ETag) from *portions* (e.g. response content
+    or a model's version counter) varying with the response's content
+    encoding.
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        *portions: values the entity tag is derived from
+    Returns:
+        str: entity tag
+
+    >>> class Request(object):
+    ...     pass
+    >>> make_etag(Request(), 'abc')
+    '"a9993e364706816aba3e25717850c26c9cd0d89d"'
+    >>> request = Request()
+    >>> make_etag(request, 'x', 1) == make_etag(request, 'x', 2)
+    False
+    """
+    hasher = hashlib.sha1()
+
+    for portion in portions:
+        if not isinstance(portion, str):
+            portion = repr(portion)
+        hasher.update(portion)
+
+    # set by twisted.web.resource.EncodingResourceWrapper
+    if getattr(request, '_encoder', None) is not None:
+        hasher.update('+gzip')
+
+    return '"{:s}"'.format(hasher.hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Set ETag (and Last-Modified) header and check if the client's cached
+    representation is up to date. In that case the response code is set
+    to *304 Not Modified* and no content should be written.
+    If-Modified-Since is only evaluated if If-None-Match is missing.
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        etag (str): entity tag
+        last_modified (float): time of last modification or *None*
+    Returns:
+        bool: True if client's cached representation is up to date
+    """
+    cached = request.setETag(etag) == http.CACHED
+
+    if last_modified is None:
+        return cached
+
+    if request.getHeader("if-none-match"):
+        request.lastModified = int(math.ceil(last_modified))
+        return cached
+
+    return request.setLastModified(last_modified) == http.CACHED
+
+
+def conditional_response(request, body):
+    """
+    Handle conditional GET requests for *body* using an entity tag derived
+    from its content. Other responses are returned as they are.
+
+    Args:
+        request (twisted.web.server.Request): HTTP request object
+        body: response content
+    Returns:
+        *body* or an empty string if client's cached representation is
+        up to date
+    """
+    if request.method not in ('GET', 'HEAD') or request.code != http.OK:
+        return body
+
+    if not isinstance(body, str):
+        return body
+
+    if not_modified(request, make_etag(request, body)):
+        return ''
+
+    return body
 
 
 class RESTControllerSkeleton(resource.Resource):
@@ -64,6 +187,29 @@ class RESTControllerSkeleton(resource.Resource):
         self._cors_header['Access-Control-Allow-Methods'] = ','.join(
             http_verbs)
 
+    def render(self, request):
+        """
+        Dispatch *request* to the ``render_<METHOD>`` handler. Handlers
+        marked using :py:func:`controllers.execution.worker_thread` are run
+        in a worker thread.
+        Conditional GET requests are answered with *304 Not Modified* if the
+        client's cached representation is up to date
+        (see :py:func:`conditional_response`).
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+        Returns:
+            HTTP response with headers
+        """
+        handler = getattr(self, 'render_{:s}'.format(request.method), None)
+
+        if handler is None or not runs_in_worker_thread(handler):
+            return conditional_response(
+                request, resource.Resource.render(self, request))
+
+        DeferredRendering(request).run(handler, conditional_response)
+        return server.NOT_DONE_YET
+
     def _cache(self, request, expires=False):
         add_expires_header(request, expires=expires)
 
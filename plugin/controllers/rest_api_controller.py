@@ -14,6 +14,10 @@ headers. Output will be compressed using gzip if requested by client.
 A swagger v2 (https://swagger.io/) compatible API specification will be
 returned when accessing the /api/ endpoint. The API specification is consumable
 e.g. by a Swagger UI (https://swagger.io/swagger-ui/) instance.
+
+Responses of frequently polled endpoints are cached (see
+:py:mod:`controllers.response_cache`), cache statistics are returned when
+accessing the /api/response_cache endpoint.
 """
 import urlparse
 import copy
@@ -22,10 +26,15 @@ import json
 
 from twisted.web import http, resource
 from twisted.web.resource import EncodingResourceWrapper
-from twisted.web.server import GzipEncoderFactory
+from twisted.web.server import GzipEncoderFactory, NOT_DONE_YET
 
 from rest import json_response, CORS_ALLOWED_METHODS_DEFAULT, CORS_DEFAULT
-from rest import CORS_DEFAULT_ALLOW_ORIGIN
+from rest import CORS_DEFAULT_ALLOW_ORIGIN, json_stream_response
+from rest import requested_indent
+from execution import DeferredRendering
+from response_cache import get_response_cache, cache_key, cache_ttl
+from response_cache import invalidated_endpoints, response_headers
+from response_cache import replay_headers
 from utilities import mangle_host_header_port, gen_reverse_proxy_configuration
 
 HAVE_E2_CONTROLLER = True
@@ -52,8 +61,31 @@ if HAVE_E2_CONTROLLER:
 SWAGGER_TEMPLATE = os.path.join(
     os.path.dirname(__file__), 'swagger.json')
 
-#: prefix for OpenWebif controller methods
-OWIF_PREFIX = 'P_'
+
+def mangle_api_result(data, source_controller):
+    """
+    Add the nickname of the controller instance which generated *data* and
+    a default ``result`` value.
+
+    Args:
+        data (dict): OpenWebif method's result
+        source_controller (basestring): nickname of controller instance
+    Returns:
+        dict: *data*
+
+    >>> sorted(mangle_api_result({'x': 1}, 'web').items())
+    [('_controller', 'web'), ('result', True), ('x', 1)]
+    """
+    data['_controller'] = source_controller
+
+    try:
+        if "result" not in data:
+            data["result"] = True
+    except Exception:
+        # ignoring exceptions is bad.
+        pass
+
+    return data
 
 
 class ApiController(resource.Resource):
@@ -78,6 +110,12 @@ class ApiController(resource.Resource):
                 self.ajax_instance = AjaxController(session, path)
 
         self.verbose = kwargs.get("verbose", 1)
+        self.response_cache = get_response_cache()
+        #: API method name => (controller nickname, dispatch entry)
+        self.dispatch_table = self._build_dispatch_table()
+        #: gzip encoding wrapper used for all API methods
+        self._gzip_wrapper = EncodingResourceWrapper(
+            self, [GzipEncoderFactory()])
         self._resource_prefix = kwargs.get("resource_prefix", '/api')
         self._cors_header = copy.copy(CORS_DEFAULT)
         http_verbs = []
@@ -92,7 +130,7 @@ class ApiController(resource.Resource):
     def getChild(self, path, request):
         if path in self.children:
             return self.children[path]
-        return EncodingResourceWrapper(self, [GzipEncoderFactory()])
+        return self._gzip_wrapper
 
     def render_OPTIONS(self, request):
         """
@@ -146,6 +184,47 @@ class ApiController(resource.Resource):
         request.setHeader("content-type", "text/plain")
         return gen_reverse_proxy_configuration(configuration)
 
+    def _build_dispatch_table(self):
+        """
+        Create the API method table from the controller instances' dispatch
+        tables. Controller instances are queried in order, first match
+        wins.
+
+        Returns:
+            dict: API method name => (controller nickname, dispatch entry)
+        """
+        table = dict()
+        # TODO: add methods of *self*
+        sources = [
+            ('web', self.web_instance),
+            ('ajax', self.ajax_instance),
+        ]
+
+        for nickname, controller in sources:
+            if controller is None:
+                continue
+            for name, entry in controller.dispatch_table.iteritems():
+                table.setdefault(name, (nickname, entry))
+
+        return table
+
+    def resolve_method(self, func_path):
+        """
+        Find the OpenWebif method implementing API method *func_path*.
+
+        Args:
+            func_path (basestring): API method name, e.g. ``getcurrent``
+        Returns:
+            tuple: nickname of controller instance and method or
+            ``(None, None)``
+        """
+        try:
+            (source_controller, entry) = self.dispatch_table[func_path]
+        except KeyError:
+            return (None, None)
+
+        return (source_controller, entry.func)
+
     def render_GET(self, request):
         """
         HTTP GET implementation.
@@ -172,30 +251,10 @@ class ApiController(resource.Resource):
         if func_path == 'reverse_proxy_conf':
             return self._reverse_proxy_configuration(request)
 
-        #: name of OpenWebif method to be called
-        owif_func = "{:s}{:s}".format(OWIF_PREFIX, func_path)
+        if func_path == 'response_cache':
+            return json_response(request, self.response_cache.stats())
 
-        #: callable methods
-        funcs = [
-            # TODO: add method of *self*
-            ('web', getattr(self.web_instance, owif_func, None)),
-        ]
-
-        if self.ajax_instance is not None:
-            funcs.append(
-                ('ajax', getattr(self.ajax_instance, owif_func, None)))
-
-        #: method to be called
-        func = None
-        #: nickname for controller instance
-        source_controller = None
-
-        # query controller instances for given method - first match wins
-        for candidate_controller, candidate in funcs:
-            if callable(candidate):
-                func = candidate
-                source_controller = candidate_controller
-                break
+        (source_controller, func) = self.resolve_method(func_path)
 
         if func is None:
             request.setResponseCode(http.NOT_FOUND)
@@ -215,27 +274,50 @@ class ApiController(resource.Resource):
 
             return json_response(request, data)
 
-        try:
-            request.setResponseCode(http.OK)
-            data = func(request)
-            data['_controller'] = source_controller
+        ttl = cache_ttl(func)
+        key = None
+
+        if ttl:
+            key = cache_key('api', func_path, request.args)
+            hit = self.response_cache.get(key)
+            if hit is not None:
+                replay_headers(request, hit[0])
+                return hit[1]
+
+        def render_result(request, data):
+            self.response_cache.invalidate(*invalidated_endpoints(func))
+
             try:
-                if "result" not in data:
-                    data["result"] = True
-            except Exception:
-                # ignoring exceptions is bad.
-                pass
-
-            return json_response(data=data, request=request)
-        except Exception as exc:
-            request.setResponseCode(http.INTERNAL_SERVER_ERROR)
-            data = {
-                "exception": repr(exc),
-                "result": False,
-                "path": request.path,
-            }
+                mangle_api_result(data, source_controller)
+            except Exception as exc:
+                return self._exception_response(request, exc)
+
+            indent = requested_indent(request)
+            if key is None:
+                return json_stream_response(request, data, indent=indent)
+
+            body = json_response(request, data, indent=indent)
+            if request.code == http.OK:
+                self.response_cache.put(key, response_headers(request), body,
+                                        ttl)
+            return body
+
+        def render_failure(request, failure):
+            return self._exception_response(request, failure.value)
+
+        request.setResponseCode(http.OK)
+        DeferredRendering(request).run(func, render_result, render_failure)
+        return NOT_DONE_YET
+
+    def _exception_response(self, request, exc):
+        request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+        data = {
+            "exception": repr(exc),
+            "result": False,
+            "path": request.path,
+        }
 
-            return json_response(request, data)
+        return json_response(request, data)
 
 
 if __name__ == '__main__':
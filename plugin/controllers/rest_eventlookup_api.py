@@ -1,9 +1,50 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import json
+
+from twisted.web import http
+
 from rest import json_response
 from rest import CORS_DEFAULT_ALLOW_ORIGIN, RESTControllerSkeleton
 from events import EventsController
 
+#: maximum number of queries per batched lookup request
+MAX_QUERIES = 1000
+
+#: integer parameters of a lookup query
+QUERY_INT_KEYS = ("querytype", "begin", "minutes")
+
+
+def mangle_query(value):
+    """
+    Validate and normalise a single query of a batched lookup request.
+
+    Args:
+        value (dict): query
+    Returns:
+        dict: normalised query
+    Raises:
+        ValueError: if query is invalid
+
+    >>> query = mangle_query({'service_reference': 'x', 'begin': '5'})
+    >>> [query[key] for key in sorted(query)]
+    [5, None, None, 'x']
+    >>> mangle_query({'begin': 5})
+    Traceback (most recent call last):
+        ...
+    ValueError: Missing service_reference in {'begin': 5}
+    """
+    if not isinstance(value, dict) or not value.get("service_reference"):
+        raise ValueError("Missing service_reference in {!r}".format(value))
+
+    query = dict(service_reference=str(value["service_reference"]))
+    for key in QUERY_INT_KEYS:
+        query[key] = None
+        if value.get(key) is not None:
+            query[key] = int(value[key])
+
+    return query
+
 
 class EventLookupApiController(RESTControllerSkeleton):
     """
@@ -74,3 +115,95 @@ class EventLookupApiController(RESTControllerSkeleton):
                 data['errors'].append(repr(exc))
 
         return json_response(request, data)
+
+    def render_POST(self, request):
+        """
+        HTTP POST implementation: batched lookup of the events of several
+        services in one round-trip.
+
+        The request's body is a JSON object containing a list of *queries*,
+        each one consisting of *service_reference* and optionally
+        *querytype*, *begin* and *minutes* (see HTTP GET implementation).
+        Alternatively *service_reference* may be passed multiple times as
+        form parameter using the same time window for all services.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+        Returns:
+            HTTP response with headers
+
+        .. http:post:: /api/eventlookup
+
+            :<json list queries: lookup queries
+            :<json basestring flags: (optional) fields to be returned
+            :<json int max_rows: (optional) maximum number of result rows
+                per service
+            :>json object events: service reference => list of events
+
+            :statuscode 200: no error
+            :statuscode 400: invalid request
+        """
+        request.setHeader(
+            'Access-Control-Allow-Origin', CORS_DEFAULT_ALLOW_ORIGIN)
+
+        data = {
+            "errors": [],
+            "result": False,
+            "len": 0
+        }
+
+        try:
+            (queries, flags, max_rows) = self._mangle_batch(request)
+        except (TypeError, ValueError) as exc:
+            request.setResponseCode(http.BAD_REQUEST)
+            data['errors'].append(repr(exc))
+            return json_response(request, data)
+
+        try:
+            data['events'] = self.ec_instance.lookup_many(
+                queries, flags=flags, max_rows=max_rows)
+            data['result'] = True
+            data['len'] = sum(len(x) for x in data['events'].itervalues())
+        except Exception as exc:
+            data['errors'].append(repr(exc))
+
+        return json_response(request, data)
+
+    def _mangle_batch(self, request):
+        content_type = request.getHeader('content-type') or ''
+
+        if content_type.startswith('application/json'):
+            body = json.loads(request.content.read())
+            if not isinstance(body, dict):
+                raise ValueError("JSON object expected")
+            raw_queries = body.get("queries")
+            flags = body.get("flags")
+            max_rows = body.get("max_rows")
+        else:
+            window = dict()
+            for key in QUERY_INT_KEYS:
+                if key in request.args:
+                    window[key] = request.args[key][0]
+            raw_queries = [
+                dict(window, service_reference=service_reference)
+                for service_reference in request.args.get(
+                    "service_reference", [])]
+            flags = request.args.get("flags", [None])[0]
+            max_rows = request.args.get("max_rows", [None])[0]
+
+        if not isinstance(raw_queries, list) or not raw_queries:
+            raise ValueError("No queries")
+
+        if len(raw_queries) > MAX_QUERIES:
+            raise ValueError("Too many queries: {:d} > {:d}".format(
+                len(raw_queries), MAX_QUERIES))
+
+        queries = [mangle_query(query) for query in raw_queries]
+
+        if flags is not None:
+            flags = str(flags)
+
+        if max_rows is not None:
+            max_rows = int(max_rows)
+
+        return queries, flags, max_rows
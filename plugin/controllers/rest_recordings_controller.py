@@ -10,12 +10,16 @@ Removing of recordings files including meta data.
 import os
 import logging
 
-from twisted.web import http
+from twisted.web import http, server
 
-from rest import json_response
+from rest import json_response, json_stream_response, requested_indent
 from rest import CORS_DEFAULT_ALLOW_ORIGIN, RESTControllerSkeleton
-from recording import RecordingsController
+from rest import make_etag, not_modified
+from recording import RecordingsController, parse_meta_fields
+from recordings_query import RecordingsQuery, SortedRecordings
 from recording import RECORDINGS_ROOT_PATH, RECORDING_ENDPOINT_URL
+from execution import main_thread, worker_thread, DeferredRendering
+from response_cache import get_response_cache
 from models.events import KEY_SERVICE_REFERENCE
 from utilities import add_expires_header
 
@@ -30,47 +34,150 @@ class RESTRecordingsController(RESTControllerSkeleton):
         self.movie_controller = RecordingsController()
         self.root = kwargs.get("root", RECORDINGS_ROOT_PATH)
 
-    def render_path_listing(self, request, root_path):
+    def render_path_listing(self, request, root_path, fields=None,
+                            query=None):
         """
         Generate a list of movie items available on current device.
+        The list is written while being generated.
+
+        Unless the listing may be served from the recordings index'
+        snapshot, *root_path* is scanned in a worker thread first.
+        Listings served from the snapshot carry an entity tag derived from
+        the index' version, conditional requests for unchanged listings
+        are answered with *304 Not Modified*.
+
+        Listings containing service information *fields* other than the
+        default ones are not indexed and thus always created.
+
+        If a *query* is given, a page of the sorted and filtered items is
+        written. Items of snapshot listings are sorted once per index
+        version.
 
         Args:
             request (twisted.web.server.Request): HTTP request object
             root_path (basestring): Movie item to remove
+            fields: service information fields (see
+                :py:func:`controllers.recording.parse_meta_fields`)
+            query (RecordingsQuery): sorting, filter and pagination
+                criteria or *None*
+        Returns:
+            HTTP response with headers
+        """
+        movies = self.movie_controller
+        index = movies.index
+        add_expires_header(request, expires=60*30)
+
+        if fields is not None and fields != movies.meta_fields:
+            return self.render_query(
+                request, query, movies.list_movies(root_path, fields))
+
+        if index is None:
+            return self.render_query(
+                request, query, movies.list_movies(root_path))
+
+        u_root_path = root_path.decode(movies.encoding)
+        if index.has_snapshot(u_root_path):
+            movies.refresh_pending()
+            portions = ['recordings', index.instance_id, index.version,
+                        request.path, requested_indent(request)]
+            if query is not None:
+                portions.extend(query.cache_key())
+            etag = make_etag(request, *portions)
+            if not_modified(request, etag, last_modified=index.modified):
+                return ''
+            if query is not None:
+                view = index.derived(
+                    u_root_path, ('sorted', query.sort),
+                    lambda snapshot: SortedRecordings(snapshot, query.sort))
+                return self.render_page(request, query, view)
+            return self.render_items(request, movies.list_movies(root_path))
+
+        def render_scanned(request, scanned):
+            return self.render_query(
+                request, query, movies.complete_movies(root_path, scanned))
+
+        DeferredRendering(request).run(movies.scan_movies, render_scanned,
+                                       args=(root_path,))
+        return server.NOT_DONE_YET
+
+    def render_items(self, request, items):
+        """
+        Write list of movie items.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            items: iterable of movie items
+        Returns:
+            HTTP response with headers
+        """
+        data = dict(result=True, items=self._generate_items(request, items))
+        return json_stream_response(request, data,
+                                    indent=requested_indent(request))
+
+    def render_query(self, request, query, items):
+        """
+        Write list of movie items or, if *query* is given, the requested
+        page of movie items.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            query (RecordingsQuery): sorting, filter and pagination
+                criteria or *None*
+            items: iterable of movie items
+        Returns:
+            HTTP response with headers
+        """
+        if query is None:
+            return self.render_items(request, items)
+        return self.render_page(
+            request, query, SortedRecordings(items, query.sort))
+
+    def render_page(self, request, query, view):
+        """
+        Write a page of movie items and the cursor of the next page.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            query (RecordingsQuery): sorting, filter and pagination criteria
+            view (SortedRecordings): movie items ordered as requested
         Returns:
             HTTP response with headers
         """
-        data = dict(result=True, items=[])
+        (page, cursor) = query.page(view)
+        items = (dict(item) for item in page)
+        data = dict(result=True, items=self._generate_items(request, items),
+                    next_cursor=cursor)
+        return json_stream_response(request, data,
+                                    indent=requested_indent(request))
+
+    def _generate_items(self, request, items):
         removed_keys = (KEY_SERVICE_REFERENCE, 'flags', 'kind',)
         r_path = request.path
 
         if r_path.endswith('/'):
             r_path = r_path[:-1]
 
-        for item in self.movie_controller.list_movies(root_path):
+        for item in items:
             for rkey in removed_keys:
                 try:
                     del item[rkey]
                 except KeyError:
                     pass
 
-            data["items"].append(item)
             if item["path"].startswith(self.root):
                 item["path"] = '/'.join(
                     (r_path, item["path"][len(self.root):]))
+            yield item
 
-        add_expires_header(request, expires=60*30)
-        return json_response(request, data)
-
-    def remove(self, request, target_path):
+    @worker_thread
+    def remove(self, target_path):
         """
         Remove movie file including meta data files.
 
         Args:
-            request (twisted.web.server.Request): HTTP request object
             target_path (basestring): Movie item to remove
         Returns:
-            HTTP response with headers
+            dict: removed files
         """
         data = dict(files=[])
         e_ext_level1 = ('ts', 'eit',)
@@ -96,8 +203,28 @@ class RESTRecordingsController(RESTControllerSkeleton):
             except Exception as exc:
                 self.log.error(exc)
 
+        return data
+
+    def render_removed(self, request, data, target_path):
+        """
+        Write the files removed by :py:meth:`remove`. The removed movie
+        item is dropped from the recordings index right away, thus
+        subsequent listings do not contain it.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            data (dict): removed files
+            target_path (basestring): removed movie item
+        Returns:
+            HTTP response with headers
+        """
+        index = self.movie_controller.index
+        if index is not None:
+            index.discard(target_path.decode(self.movie_controller.encoding))
+        get_response_cache().invalidate('movielist')
         return json_response(request, data)
 
+    @main_thread
     def render_GET(self, request):
         """
         HTTP GET request handler returning list of movies
@@ -109,8 +236,24 @@ class RESTRecordingsController(RESTControllerSkeleton):
 
         .. http:get:: /recordings/{basestring:path}
 
+            :query int compact: (optional) ``1`` disables indentation
+            :query string fields: (optional) comma separated service
+                information fields (e.g. ``Tags,FileSize``) or ``all``
+            :query string sort: (optional) ``path`` (default), ``time``,
+                ``title``, ``service`` or ``size``, prefixed by ``-`` for
+                descending order
+            :query int limit: (optional) maximum number of items
+            :query string cursor: (optional) ``next_cursor`` value of the
+                previous page
+            :query string service: (optional) service name or reference
+            :query int since: (optional) minimum recording time
+            :query int until: (optional) recording time limit (exclusive)
+            :query string title: (optional) part of the title
+            :query string tag: (optional) tag
+
             :statuscode 200: no error
             :statuscode 301: redirect
+            :statuscode 400: invalid query argument
             :statuscode 404: not found
 
         .. http:get:: /recording/{basestring:path}
@@ -128,7 +271,15 @@ class RESTRecordingsController(RESTControllerSkeleton):
                                        '/'.join(request.postpath))
 
         if os.path.isdir(target_path):
-            return self.render_path_listing(request, target_path)
+            fields = parse_meta_fields(request.args.get("fields", [None])[0])
+            try:
+                query = RecordingsQuery.from_args(request.args)
+            except ValueError as exc:
+                return self.error_response(
+                    request, response_code=http.BAD_REQUEST,
+                    message=str(exc))
+            return self.render_path_listing(request, target_path, fields,
+                                            query)
         elif os.path.isfile(target_path):
             url = RECORDING_ENDPOINT_URL + '/'.join(request.postpath)
             request.redirect(url)
@@ -137,9 +288,11 @@ class RESTRecordingsController(RESTControllerSkeleton):
         return self.error_response(
             request, response_code=http.NOT_FOUND, message="not found")
 
+    @main_thread
     def render_DELETE(self, request):
         """
-        HTTP DELETE request handler deleting a movie item
+        HTTP DELETE request handler deleting a movie item, the files are
+        removed in a worker thread
 
         Args:
             request (twisted.web.server.Request): HTTP request object
@@ -157,7 +310,12 @@ class RESTRecordingsController(RESTControllerSkeleton):
         target_path = os.path.join(self.root,
                                    '/'.join(request.postpath))
 
+        def render_removed(request, data):
+            return self.render_removed(request, data, target_path)
+
         if os.path.isfile(target_path):
-            return self.remove(request, target_path)
+            DeferredRendering(request).run(self.remove, render_removed,
+                                           args=(target_path,))
+            return server.NOT_DONE_YET
 
         return self.error_response(request, message="not supported")
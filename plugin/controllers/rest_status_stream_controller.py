@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Status Stream
+-------------
+
+Push current service, event, volume, standby and recording state changes
+to clients (see :py:mod:`controllers.status_push`).
+"""
+import logging
+
+from twisted.web import server
+
+from Components.config import config
+
+from rest import json_response
+from rest import RESTControllerSkeleton, CORS_DEFAULT_ALLOW_ORIGIN
+from execution import DeferredRendering
+from status_push import EventStreamClient, get_status_broadcaster
+from models.info import getStatusSnapshot
+
+#: maximum number of seconds a long-poll request waits for changes
+LONG_POLL_MAX_WAIT = 120
+
+
+class RESTStatusStreamController(RESTControllerSkeleton):
+    """
+    RESTful Controller for ``/status_stream`` endpoint.
+
+    .. http:get:: /status_stream
+
+        Server-sent events: a ``state`` event containing the complete
+        status followed by ``delta`` events containing changed values.
+
+        :statuscode 200: no error
+
+    .. http:get:: /status_stream?since={int:version}&wait={int:seconds}
+
+        Long-poll: wait up to *wait* seconds until the status version
+        differs from *since* and return the complete status.
+
+        :statuscode 200: no error
+    """
+
+    def __init__(self, *args, **kwargs):
+        RESTControllerSkeleton.__init__(self, *args, **kwargs)
+        self.log = logging.getLogger(__name__)
+        self.broadcaster = get_status_broadcaster(
+            lambda: getStatusSnapshot(self.session))
+        self._subscribe_notifications()
+
+    def _subscribe_notifications(self):
+        try:
+            self.session.nav.event.append(self.broadcaster.schedule_refresh)
+        except AttributeError as exc:
+            self.log.warning("No service events: {!r}".format(exc))
+
+        try:
+            config.misc.standbyCounter.addNotifier(
+                self.broadcaster.schedule_refresh, initial_call=False)
+        except AttributeError as exc:
+            self.log.warning("No standby notifications: {!r}".format(exc))
+
+    def render_GET(self, request):
+        """
+        HTTP GET implementation.
+
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+        Returns:
+            HTTP response with headers
+        """
+        request.setHeader(
+            'Access-Control-Allow-Origin', CORS_DEFAULT_ALLOW_ORIGIN)
+
+        try:
+            since = int(request.args["since"][0])
+        except (KeyError, TypeError, ValueError):
+            return EventStreamClient(self.broadcaster, request).start()
+
+        try:
+            wait = min(int(request.args.get("wait", ["0"])[0]),
+                       LONG_POLL_MAX_WAIT)
+        except (TypeError, ValueError):
+            wait = 0
+
+        if wait > 0:
+            DeferredRendering(request).run(
+                self.broadcaster.wait, self._render_state, args=(since, wait))
+            return server.NOT_DONE_YET
+
+        if not self.broadcaster.subscribers:
+            self.broadcaster.refresh()
+        return self._render_state(request, self.broadcaster.version)
+
+    def _render_state(self, request, version):
+        data = dict(result=True, version=version,
+                    state=self.broadcaster.state)
+        return json_response(request, data)
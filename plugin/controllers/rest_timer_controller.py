@@ -9,11 +9,16 @@ Listing of timer items on current device.
 """
 import logging
 
-from twisted.web import http
+from twisted.web import http, server
 
 from rest import json_response
 from rest import TwoFaceApiController, CORS_DEFAULT_ALLOW_ORIGIN
 from timer import TimersController
+from execution import DeferredRendering
+
+#: maximum number of seconds a ``/timers/?since=..&wait=..`` request waits
+#: for changes
+LONG_POLL_MAX_WAIT = 120
 
 
 class RESTTimerController(TwoFaceApiController):
@@ -22,6 +27,9 @@ class RESTTimerController(TwoFaceApiController):
 
     .. http:get:: /timers/
 
+        :query int since: only return changes made after this version
+        :query int wait: wait up to this many seconds for changes
+            (requires *since*)
         :statuscode 200: no error
         :statuscode 400: invalid
 
@@ -44,17 +52,64 @@ class RESTTimerController(TwoFaceApiController):
 
     def render_list_all(self, request):
         """
-        List all timers
+        List all timers or, if a *since* version is given, the timer
+        changes made after that version. The response contains the current
+        ``version``. Changes are listed as ``changes`` items having a
+        ``version``, an ``action`` (*added*, *changed* or *removed*) and
+        the timer's data (``item``). If the changes are not available
+        (anymore) the complete list is returned (``items``).
+
+        With *wait* the response is delayed until a change happened or
+        *wait* seconds have passed.
 
         Args:
             request (twisted.web.server.Request): HTTP request object
         Returns:
             HTTP response with headers
         """
-        data = dict(result=True, items=[])
+        try:
+            since = int(request.args["since"][0])
+        except KeyError:
+            since = None
+        except (TypeError, ValueError):
+            request.setResponseCode(http.BAD_REQUEST)
+            return json_response(request, dict(
+                result=False, errors=["invalid 'since' value"]))
 
-        for item in self.tc.list_items():
-            data['items'].append(item)
+        try:
+            wait = min(int(request.args.get("wait", ["0"])[0]),
+                       LONG_POLL_MAX_WAIT)
+        except (TypeError, ValueError):
+            wait = 0
+
+        if since is not None and wait > 0 and \
+                self.tc.changes.changes_since(since) == []:
+            rendering = DeferredRendering(request)
+            rendering.run(self.tc.changes.wait, self._render_changes,
+                          args=(since, wait))
+            return server.NOT_DONE_YET
+
+        return self._render_changes(request)
+
+    def _render_changes(self, request, version=None):
+        change_log = self.tc.changes
+        since = None
+        changes = None
+
+        if "since" in request.args:
+            since = int(request.args["since"][0])
+            changes = change_log.changes_since(since)
+        else:
+            change_log.update()
+
+        if changes is None:
+            data = dict(result=True, items=list(self.tc.list_items()),
+                        version=change_log.version)
+        else:
+            data = dict(result=True, since=since,
+                        version=change_log.version, changes=[
+                            dict(version=change[0], action=change[1],
+                                 item=change[2]) for change in changes])
 
         return json_response(request, data)
 
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+API access using WebSocket
+--------------------------
+
+The methods of the API (see :py:mod:`controllers.rest_api_controller`) are
+callable using a persistent WebSocket connection. Each text message
+contains one JSON encoded call::
+
+    {"id": 1, "method": "getcurrent", "args": {}}
+
+and is answered by a message containing the same ``id`` and either the
+method's result (``data``) or an ``error``::
+
+    {"id": 1, "data": {"result": true, ...}}
+    {"id": 2, "error": {"code": 404, "message": "'foo'"}}
+
+Status changes (see :py:mod:`controllers.status_push`) are pushed after
+calling the ``subscribe`` method (``{"topic": "status"}`` as *args*)::
+
+    {"topic": "status", "version": 4, "data": {"volume": 20}}
+
+The WebSocket endpoint is only available if :py:mod:`autobahn` is
+installed.
+"""
+import json
+import logging
+
+from twisted.internet import defer
+from twisted.web import http
+from twisted.web.http_headers import Headers
+
+from execution import call_in_context
+from response_cache import get_response_cache, cache_key, cache_ttl
+from response_cache import invalidated_endpoints
+from rest_api_controller import mangle_api_result
+from streaming import iter_json
+
+try:
+    from autobahn.twisted.websocket import WebSocketServerFactory, \
+        WebSocketServerProtocol
+    from autobahn.twisted.resource import WebSocketResource
+    HAVE_AUTOBAHN = True
+except ImportError:
+    HAVE_AUTOBAHN = False
+
+#: method name for subscribing to pushed data
+METHOD_SUBSCRIBE = 'subscribe'
+
+#: method name for cancelling a subscription
+METHOD_UNSUBSCRIBE = 'unsubscribe'
+
+#: topic: status changes
+TOPIC_STATUS = 'status'
+
+#: headers stored with cached call results
+JSON_RESPONSE_HEADERS = (
+    ('Content-Type', ('application/json; charset=utf-8',)),)
+
+
+def call_arguments(args):
+    """
+    Convert a call's *args* to the format of
+    :py:attr:`twisted.web.server.Request.args`.
+
+    Args:
+        args (dict): argument values
+    Returns:
+        dict: argument name => list of UTF-8 encoded strings
+
+    >>> args = call_arguments({'sRef': u'1:0:1', 'id': 3, 'x': [1, 2]})
+    >>> sorted(args.items())
+    [('id', ['3']), ('sRef', ['1:0:1']), ('x', ['1', '2'])]
+    """
+    result = dict()
+    for key, value in (args or dict()).iteritems():
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        result[key.encode('utf-8')] = [
+            item.encode('utf-8') if isinstance(item, unicode) else str(item)
+            for item in value]
+    return result
+
+
+def error_message(call_id, code, message):
+    """
+    Create a (JSON encoded) error message.
+
+    >>> error_message(1, 404, "'foo'")
+    '{"id":1,"error":{"code":404,"message":"\\'foo\\'"}}'
+    """
+    return '{{"id":{:s},"error":{:s}}}'.format(
+        json.dumps(call_id), json.dumps(
+            dict(code=code, message=message), separators=(',', ':'),
+            sort_keys=True))
+
+
+def result_message(call_id, body):
+    """
+    Create a message for the JSON encoded result *body* of call
+    *call_id* (without decoding and encoding *body* again).
+
+    >>> result_message(1, '{"result": true}')
+    '{"id":1,"data":{"result": true}}'
+    """
+    return '{{"id":{:s},"data":{:s}}}'.format(json.dumps(call_id), body)
+
+
+class ApiCallRequest(object):
+    """
+    Request object passed to API methods called using WebSocket.
+
+    >>> request = ApiCallRequest('getcurrent', {'x': ['1']})
+    >>> request.path, request.args, request.code
+    ('/api/getcurrent', {'x': ['1']}, 200)
+    """
+    method = 'GET'
+
+    def __init__(self, func_path, args, headers=None, client=None):
+        """
+        Args:
+            func_path (basestring): API method name
+            args (dict): request arguments
+            headers (dict): headers of the WebSocket opening handshake
+            client: client address
+        """
+        self.path = '/api/' + func_path
+        self.uri = self.path
+        self.postpath = [func_path]
+        self.args = args
+        self.code = http.OK
+        self.finished = False
+        self.client = client
+        self.requestHeaders = Headers()
+        self.responseHeaders = Headers()
+        for key, value in (headers or dict()).iteritems():
+            self.requestHeaders.setRawHeaders(key, [value])
+
+    def getHeader(self, key):
+        values = self.requestHeaders.getRawHeaders(key)
+        if values:
+            return values[-1]
+        return None
+
+    def getAllHeaders(self):
+        return dict(
+            (key.lower(), values[-1])
+            for key, values in self.requestHeaders.getAllRawHeaders())
+
+    def getClient(self):
+        return self.client
+
+    def setHeader(self, key, value):
+        self.responseHeaders.setRawHeaders(key, [value])
+
+    def setResponseCode(self, code, message=None):
+        self.code = code
+
+    def notifyFinish(self):
+        return defer.Deferred()
+
+
+class ApiCallDispatcher(object):
+    """
+    Call API methods for messages received using WebSocket and create
+    the response messages.
+    """
+
+    def __init__(self, api_controller, broadcaster=None):
+        """
+        Args:
+            api_controller (controllers.rest_api_controller.ApiController):
+                API controller
+            broadcaster (controllers.status_push.StatusBroadcaster):
+                status source for subscriptions
+        """
+        self.log = logging.getLogger(__name__)
+        self.api_controller = api_controller
+        self.broadcaster = broadcaster
+        self.response_cache = get_response_cache()
+
+    def call(self, payload, headers=None, client=None):
+        """
+        Call the API method requested by *payload*.
+
+        Args:
+            payload (str): JSON encoded call
+            headers (dict): headers of the WebSocket opening handshake
+            client: client address
+        Returns:
+            twisted.internet.defer.Deferred: response message
+        """
+        try:
+            frame = json.loads(payload)
+            call_id = frame.get("id")
+            func_path = frame["method"].encode('utf-8').replace(".", "")
+            args = call_arguments(frame.get("args"))
+        except Exception as exc:
+            return defer.succeed(error_message(
+                None, http.BAD_REQUEST, "invalid call: {!r}".format(exc)))
+
+        (source_controller, func) = self.api_controller.resolve_method(
+            func_path)
+        if func is None:
+            return defer.succeed(error_message(
+                call_id, http.NOT_FOUND, repr(func_path)))
+
+        ttl = cache_ttl(func)
+        key = None
+        if ttl:
+            key = cache_key('ws', func_path, args)
+            hit = self.response_cache.get(key)
+            if hit is not None:
+                return defer.succeed(result_message(call_id, hit[1]))
+
+        request = ApiCallRequest(func_path, args, headers, client)
+        deferred = call_in_context(func, request)
+        deferred.addCallback(self._result, call_id, func, source_controller,
+                             request, key, ttl)
+        deferred.addErrback(self._failure, call_id, func_path)
+        return deferred
+
+    def _result(self, data, call_id, func, source_controller, request, key,
+                ttl):
+        self.response_cache.invalidate(*invalidated_endpoints(func))
+        mangle_api_result(data, source_controller)
+        body = ''.join(iter_json(data))
+
+        if key is not None and request.code == http.OK:
+            self.response_cache.put(key, JSON_RESPONSE_HEADERS, body, ttl)
+        return result_message(call_id, body)
+
+    def _failure(self, failure, call_id, func_path):
+        self.log.error("{!r} failed: {!s}".format(
+            func_path, failure.getTraceback()))
+        return error_message(call_id, http.INTERNAL_SERVER_ERROR,
+                             repr(failure.value))
+
+
+class StatusSubscription(object):
+    """
+    Subscriber passing status changes to *send*.
+    """
+
+    def __init__(self, send):
+        self.send = send
+
+    def publish(self, version, delta):
+        self.send(json.dumps(
+            dict(topic=TOPIC_STATUS, version=version, data=delta),
+            separators=(',', ':')))
+
+    def keepalive(self):
+        pass
+
+
+if HAVE_AUTOBAHN:
+    class ApiWebSocketProtocol(WebSocketServerProtocol):
+        """
+        WebSocket protocol dispatching calls to the API methods.
+        """
+
+        def onConnect(self, request):
+            self.handshake_headers = request.headers
+            self.client = request.peer
+            self.subscription = None
+
+        def onMessage(self, payload, isBinary):
+            if isBinary:
+                self.sendMessage(error_message(
+                    None, http.BAD_REQUEST, "binary messages not supported"))
+                return
+
+            try:
+                frame = json.loads(payload)
+                method = frame.get("method")
+            except Exception:
+                method = None
+
+            if method in (METHOD_SUBSCRIBE, METHOD_UNSUBSCRIBE):
+                self.sendMessage(self._subscription(frame, method))
+                return
+
+            deferred = self.factory.dispatcher.call(
+                payload, self.handshake_headers, self.client)
+            deferred.addCallback(self._send)
+
+        def _send(self, message):
+            if self.state == WebSocketServerProtocol.STATE_OPEN:
+                self.sendMessage(message)
+
+        def _subscription(self, frame, method):
+            call_id = frame.get("id")
+            broadcaster = self.factory.dispatcher.broadcaster
+            topic = (frame.get("args") or dict()).get("topic")
+
+            if topic != TOPIC_STATUS or broadcaster is None:
+                return error_message(
+                    call_id, http.NOT_FOUND, "topic {!r}".format(topic))
+
+            if method == METHOD_UNSUBSCRIBE:
+                self._unsubscribe()
+                return result_message(call_id, '{"result":true}')
+
+            if self.subscription is None:
+                self.subscription = StatusSubscription(self._send)
+                (version, state) = broadcaster.subscribe(self.subscription)
+            else:
+                (version, state) = (broadcaster.version, broadcaster.state)
+
+            return result_message(call_id, json.dumps(
+                dict(result=True, version=version, state=state),
+                separators=(',', ':')))
+
+        def _unsubscribe(self):
+            if self.subscription is not None:
+                broadcaster = self.factory.dispatcher.broadcaster
+                broadcaster.unsubscribe(self.subscription)
+                self.subscription = None
+
+        def onClose(self, wasClean, code, reason):
+            if getattr(self, 'subscription', None) is not None:
+                self._unsubscribe()
+
+
+def websocket_resource(api_controller, broadcaster=None):
+    """
+    Create the WebSocket resource for calling API methods.
+
+    Args:
+        api_controller (controllers.rest_api_controller.ApiController):
+            API controller
+        broadcaster (controllers.status_push.StatusBroadcaster):
+            status source for subscriptions
+    Returns:
+        twisted.web.resource.IResource: WebSocket resource or *None* if
+        :py:mod:`autobahn` is not available
+    """
+    if not HAVE_AUTOBAHN:
+        return None
+
+    factory = WebSocketServerFactory()
+    factory.protocol = ApiWebSocketProtocol
+    factory.dispatcher = ApiCallDispatcher(api_controller, broadcaster)
+    return WebSocketResource(factory)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
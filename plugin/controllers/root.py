@@ -12,7 +12,9 @@ from twisted.web import static
 from twisted.web.resource import EncodingResourceWrapper
 from twisted.web.server import GzipEncoderFactory
 
-from defaults import PUBLIC_PATH, PICON_PATH, FAVICON_PATH
+from Components.config import config as comp_config
+
+from defaults import PUBLIC_PATH, FAVICON_PATH
 
 from models.grab import grabScreenshot
 from base import BaseController
@@ -24,8 +26,14 @@ import rest_recordings_controller
 import rest_timer_controller
 import rest_current_event_controller
 import rest_services_controller
+import rest_status_stream_controller
+import rest_websocket_api
 from recording import RECORDINGS_ROOT_PATH
 from recording import RECORDINGS_ENDPOINT_PATH, RECORDING_ENDPOINT_PATH
+from recordings_index import get_recordings_index
+from recordings_watcher import start_watching
+from picon_index import PiconFolderResource, get_picon_path
+from template_cache import get_template_cache, precompile_templates
 
 TOW_FRONTEND = False
 
@@ -45,10 +53,19 @@ class RootController(BaseController):
     def __init__(self, session, path=""):
         BaseController.__init__(self, path=path, session=session)
 
+        try:
+            get_template_cache().check_mtime = \
+                comp_config.OpenWebif.template_reload.value
+            if comp_config.OpenWebif.template_precompile.value:
+                precompile_templates()
+        except Exception as exc:
+            self.log.error(exc)
+
         self.putChild("web", WebController(session))
+        api_controller = rest_api_controller.ApiController(
+            session, resource_prefix='/api')
         api_controller_instance = EncodingResourceWrapper(
-            rest_api_controller.ApiController(session, resource_prefix='/api'),
-            [GzipEncoderFactory()])
+            api_controller, [GzipEncoderFactory()])
         self.putChild("api", api_controller_instance)
 
         recordings_controller_instance = EncodingResourceWrapper(
@@ -59,6 +76,14 @@ class RootController(BaseController):
         self.putChild(RECORDING_ENDPOINT_PATH,
                       static.File(RECORDINGS_ROOT_PATH))
 
+        watched_paths = [RECORDINGS_ROOT_PATH]
+        try:
+            watched_paths += comp_config.movielist.videodirs.value
+        except Exception as exc:
+            self.log.error(exc)
+        start_watching(get_recordings_index(RECORDINGS_ROOT_PATH),
+                       watched_paths)
+
         timer_controller_instance = EncodingResourceWrapper(
             rest_timer_controller.RESTTimerController(session=session),
             [GzipEncoderFactory()])
@@ -73,6 +98,16 @@ class RootController(BaseController):
             rest_current_event_controller.RESTCurrentEventController(
                 session=session), [GzipEncoderFactory()])
         self.putChild("current_event", event_controller_instance)
+        # not compressed: events have to be delivered immediately
+        status_controller = \
+            rest_status_stream_controller.RESTStatusStreamController(
+                session=session)
+        self.putChild("status_stream", status_controller)
+
+        websocket_instance = rest_websocket_api.websocket_resource(
+            api_controller, broadcaster=status_controller.broadcaster)
+        if websocket_instance is not None:
+            self.putChild("api_ws", websocket_instance)
 
         self.putChild("file", fs_access.RestrictedFilesystemAccessController())
         self.putChild("grab", grabScreenshot(session))
@@ -87,8 +122,8 @@ class RootController(BaseController):
                           static.File('/'.join((PUBLIC_PATH, shortcut))))
 
         self.putChild("transcoding", TranscodingController())
-        if PICON_PATH:
-            self.putChild("picon", static.File(PICON_PATH))
+        self.putChild("picon", PiconFolderResource(
+            lambda: get_picon_path(comp_config.OpenWebif.picon_path.value)))
 
     def P_index(self, request):
         """
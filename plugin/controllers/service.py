@@ -1,20 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import os
 import logging
 
 from enigma import eServiceCenter, eServiceReference
 from Screens.ChannelSelection import service_types_tv, service_types_radio
 
-from utilities import parse_servicereference, mangle_snp, SERVICE_KIND_COMMENT
-from utilities import parse_simple_index, mangle_service_type_arg
+from utilities import parse_servicereference, SERVICE_KIND_COMMENT
+from utilities import mangle_service_type_arg
+from snp_index import get_snp_index, SNP_INDEX
 
 ROOT_FMT = '{:s} FROM BOUQUET "{:s}" ORDER BY bouquet'
 LIST_FMT = "SN"
 BLACKLISTED_SERVICE_KIND = (SERVICE_KIND_COMMENT,)
 
-SNP_INDEX = "/etc/enigma2/snp.index"
-
 
 class ServiceController(object):
     """
@@ -25,24 +23,10 @@ class ServiceController(object):
         self.log = logging.getLogger(__name__)
         self.esc_instance = eServiceCenter.getInstance()
         self.raise_exceptions = kwargs.get("may_raise", False)
-        self.snp_index = None
-
-        if os.path.isfile(SNP_INDEX):
-            self.snp_index = parse_simple_index(SNP_INDEX)
+        self.snp_index = get_snp_index(SNP_INDEX)
 
     def _mangle_snp(self, service_name):
-        snp_name = mangle_snp(service_name)
-
-        if not snp_name:
-            return '--------'
-
-        if self.snp_index is not None:
-            try:
-                return self.snp_index[snp_name]
-            except KeyError:
-                pass
-
-        return snp_name
+        return self.snp_index.lookup(service_name)
 
     def get_services_set(self, service_types=None, **kwargs):
         """
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SNP Index
+---------
+
+Service names are converted to *Service Name Picons* (SNP) names using
+:py:func:`utilities.mangle_snp` and the aliases contained in the SNP index
+file (``snp.index``, see https://github.com/picons/picons-source).
+
+The index file is parsed once and parsed again only if its modification
+time changed (checked at most every :py:data:`CHECK_INTERVAL` seconds).
+Conversion results are memoised for the most recently used service names.
+"""
+import os
+import time
+import logging
+import threading
+import collections
+
+from utilities import mangle_snp, parse_simple_index
+
+#: SNP index file
+SNP_INDEX = "/etc/enigma2/snp.index"
+
+#: SNP name of services without (usable) name
+SNP_UNNAMED = '--------'
+
+#: minimum number of seconds between checks for a changed index file
+CHECK_INTERVAL = 30
+
+#: maximum number of memoised conversion results
+MEMO_SIZE = 2048
+
+#: shared index instances (index file => instance)
+_INDEX_INSTANCES = dict()
+
+#: lock for :py:data:`_INDEX_INSTANCES`
+_INDEX_INSTANCES_LOCK = threading.Lock()
+
+
+class SnpIndex(object):
+    """
+    Conversion of service names to SNP names.
+
+    >>> from utilities import CONTRIB
+    >>> idx = SnpIndex(os.path.join(CONTRIB, 'picon-source/snp.index'))
+    >>> idx.lookup('WDR Duesseldorf')
+    'wdr'
+    >>> idx.lookup(u'Das Erste HD')
+    'daserstehd'
+    >>> idx.lookup('')
+    '--------'
+    >>> len(idx.memo)
+    3
+    >>> SnpIndex('/no/such/snp.index').lookup('WDR Duesseldorf')
+    'wdrduesseldorf'
+    """
+
+    def __init__(self, path=SNP_INDEX, memo_size=MEMO_SIZE, clock=None):
+        """
+        Args:
+            path (basestring): SNP index file
+            memo_size (int): maximum number of memoised results
+            clock: callable returning current time
+        """
+        if clock is None:
+            clock = time.time
+
+        self.log = logging.getLogger(__name__)
+        self.path = path
+        self.memo_size = memo_size
+        self.clock = clock
+        self.lock = threading.Lock()
+        #: mangled service name => SNP name
+        self.aliases = dict()
+        #: memoised conversion results (service name => SNP name)
+        self.memo = collections.OrderedDict()
+        #: modification time of index file when it has been parsed
+        self.mtime = None
+        #: time of last modification check
+        self.checked = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def refresh(self, force=False):
+        """
+        Parse the index file again if its modification time changed
+        (checked at most every :py:data:`CHECK_INTERVAL` seconds unless
+        *force* is set).
+
+        Args:
+            force (bool): check modification time now
+        Returns:
+            bool: True if the aliases changed
+        """
+        now = self.clock()
+        with self.lock:
+            if not force and self.checked is not None and \
+                    now - self.checked < CHECK_INTERVAL:
+                return False
+            self.checked = now
+
+            mtime = self._file_mtime()
+            if mtime == self.mtime:
+                return False
+
+            aliases = dict()
+            if mtime is not None:
+                try:
+                    parsed = parse_simple_index(self.path)
+                except (IOError, OSError) as exc:
+                    self.log.warning("Cannot read {!r}: {!s}".format(
+                        self.path, exc))
+                    parsed = dict()
+                # many names share the same alias: store each value once
+                for key, value in parsed.iteritems():
+                    aliases[key] = intern(value)
+
+            self.log.debug("{:d} SNP aliases in {!r}".format(
+                len(aliases), self.path))
+            self.aliases = aliases
+            self.memo = collections.OrderedDict()
+            self.mtime = mtime
+            return True
+
+    def lookup(self, service_name):
+        """
+        Convert *service_name* to its SNP name.
+
+        Args:
+            service_name (basestring): service name
+        Returns:
+            str: SNP name
+        """
+        self.refresh()
+
+        with self.lock:
+            memo = self.memo
+            try:
+                result = memo.pop(service_name)
+            except KeyError:
+                result = None
+
+            if result is None:
+                snp_name = mangle_snp(service_name)
+                if not snp_name:
+                    result = SNP_UNNAMED
+                else:
+                    result = self.aliases.get(snp_name, snp_name)
+                if len(memo) >= self.memo_size:
+                    memo.popitem(last=False)
+
+            memo[service_name] = result
+            return result
+
+
+def get_snp_index(path=SNP_INDEX):
+    """
+    Retrieve the shared :py:class:`SnpIndex` instance for *path*.
+
+    Args:
+        path (basestring): SNP index file
+    Returns:
+        SnpIndex: index instance
+    """
+    with _INDEX_INSTANCES_LOCK:
+        try:
+            return _INDEX_INSTANCES[path]
+        except KeyError:
+            instance = SnpIndex(path)
+            _INDEX_INSTANCES[path] = instance
+            return instance
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
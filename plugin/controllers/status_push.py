@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Status Push
+-----------
+
+Push the device's status (current service and event, volume, standby and
+recording state) to clients instead of letting them poll.
+
+A single :py:class:`StatusBroadcaster` collects the status whenever it may
+have changed (service change events, rollover of the current event,
+periodically while clients are connected) and publishes the changed
+values as *delta* to all subscribers, e.g. :py:class:`EventStreamClient`
+instances serving
+`server-sent events <https://html.spec.whatwg.org/#server-sent-events>`_.
+"""
+import json
+import logging
+import threading
+
+from twisted.internet import defer, reactor, task
+from twisted.web import server
+
+#: number of seconds between status checks while clients are connected
+STATUS_POLL_INTERVAL = 2
+
+#: number of seconds between keep alive messages
+KEEPALIVE_INTERVAL = 20
+
+#: reconnection delay (milliseconds) suggested to event stream clients
+EVENT_STREAM_RETRY = 3000
+
+#: key of the current event's end time in status data
+KEY_EVENT_END = 'event_end'
+
+#: shared broadcaster instance
+_BROADCASTER = None
+
+#: lock for :py:data:`_BROADCASTER`
+_BROADCASTER_LOCK = threading.Lock()
+
+
+def state_delta(previous, current):
+    """
+    Determine the values of *current* differing from *previous*. Removed
+    keys are contained with value *None*.
+
+    Args:
+        previous (dict): previous status or *None*
+        current (dict): current status
+    Returns:
+        dict: changed values
+
+    >>> state_delta(None, {'volume': 10})
+    {'volume': 10}
+    >>> sorted(state_delta({'volume': 10, 'muted': False, 'x': 1},
+    ...                    {'volume': 12, 'muted': False}).items())
+    [('volume', 12), ('x', None)]
+    """
+    if previous is None:
+        return dict(current)
+
+    delta = dict()
+    for key, value in current.iteritems():
+        if key not in previous or previous[key] != value:
+            delta[key] = value
+    for key in previous:
+        if key not in current:
+            delta[key] = None
+    return delta
+
+
+def event_stream_message(data, event=None, message_id=None):
+    """
+    Encode *data* as event stream message.
+
+    Args:
+        data: JSON serialisable data
+        event (basestring): event type
+        message_id: message ID
+    Returns:
+        str: event stream message
+
+    >>> event_stream_message({'volume': 10}, 'delta', 3)
+    'id: 3\\nevent: delta\\ndata: {"volume":10}\\n\\n'
+    """
+    lines = []
+    if message_id is not None:
+        lines.append('id: {!s}\n'.format(message_id))
+    if event is not None:
+        lines.append('event: {:s}\n'.format(event))
+    lines.append('data: {:s}\n\n'.format(
+        json.dumps(data, separators=(',', ':'))))
+    return ''.join(lines)
+
+
+class StatusBroadcaster(object):
+    """
+    Collect the status using *collect* and publish changes to subscribers.
+
+    Subscribers implement ``publish(version, delta)`` and ``keepalive()``.
+
+    >>> status = {'volume': 10}
+    >>> class Subscriber(object):
+    ...     def publish(self, version, delta):
+    ...         print(version, delta)
+    ...     def keepalive(self):
+    ...         pass
+    >>> broadcaster = StatusBroadcaster(lambda: dict(status))
+    >>> broadcaster.refresh()
+    True
+    >>> subscriber = Subscriber()
+    >>> broadcaster.subscribe(subscriber)
+    (1, {'volume': 10})
+    >>> status['volume'] = 11
+    >>> broadcaster.refresh()
+    (2, {'volume': 11})
+    True
+    >>> broadcaster.refresh()
+    False
+    >>> broadcaster.unsubscribe(subscriber)
+    """
+
+    def __init__(self, collect, poll_interval=STATUS_POLL_INTERVAL,
+                 keepalive_interval=KEEPALIVE_INTERVAL):
+        """
+        Args:
+            collect: callable returning the current status (dict)
+            poll_interval (int): seconds between status checks while
+                clients are connected
+            keepalive_interval (int): seconds between keep alive messages
+        """
+        self.log = logging.getLogger(__name__)
+        self.collect = collect
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        #: current status
+        self.state = None
+        #: incremented on each status change
+        self.version = 0
+        self.subscribers = []
+        self.waiters = []
+        self._poll = None
+        self._keepalive = None
+        self._pending_refresh = None
+        self._rollover = None
+        self._rollover_at = None
+
+    def refresh(self, *args):
+        """
+        Collect the status and publish changes.
+
+        Returns:
+            bool: True if the status changed
+        """
+        self._pending_refresh = None
+        try:
+            current = self.collect()
+        except Exception as exc:
+            self.log.error("Status not available: {!r}".format(exc))
+            return False
+
+        delta = state_delta(self.state, current)
+        self._schedule_rollover(current.get(KEY_EVENT_END))
+        if not delta:
+            return False
+
+        self.state = current
+        self.version += 1
+
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.publish(self.version, delta)
+            except Exception as exc:
+                self.log.error("Publishing failed: {!r}".format(exc))
+                self.unsubscribe(subscriber)
+
+        (waiters, self.waiters) = (self.waiters, [])
+        for deferred, expiry in waiters:
+            if expiry.active():
+                expiry.cancel()
+            deferred.callback(self.version)
+        return True
+
+    def schedule_refresh(self, *args):
+        """
+        Refresh the status soon (coalescing multiple notifications), e.g.
+        as callback for service events.
+        """
+        if self._pending_refresh is None:
+            self._pending_refresh = reactor.callLater(0, self.refresh)
+
+    def _schedule_rollover(self, event_end):
+        if not self._active():
+            event_end = None
+
+        if self._rollover is not None and self._rollover.active():
+            if self._rollover_at == event_end:
+                return
+            self._rollover.cancel()
+        self._rollover = None
+        self._rollover_at = event_end
+
+        if event_end:
+            delay = max(event_end - reactor.seconds(), 0) + 1
+            self._rollover = reactor.callLater(delay, self.refresh)
+
+    def _active(self):
+        return bool(self.subscribers or self.waiters)
+
+    def _start(self):
+        if self._poll is None:
+            self._poll = task.LoopingCall(self.refresh)
+            self._poll.start(self.poll_interval, now=False)
+            self._keepalive = task.LoopingCall(self._send_keepalive)
+            self._keepalive.start(self.keepalive_interval, now=False)
+
+    def _stop(self):
+        if self._active() or self._poll is None:
+            return
+
+        for call in (self._poll, self._keepalive):
+            if call.running:
+                call.stop()
+        self._poll = self._keepalive = None
+        self._schedule_rollover(None)
+
+    def _send_keepalive(self):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.keepalive()
+            except Exception as exc:
+                self.log.debug("Keep alive failed: {!r}".format(exc))
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, subscriber):
+        """
+        Add *subscriber*.
+
+        Returns:
+            tuple: current version and status
+        """
+        if not self.subscribers and not self.waiters:
+            self.refresh()
+        self.subscribers.append(subscriber)
+        if reactor.running:
+            self._start()
+        return (self.version, self.state)
+
+    def unsubscribe(self, subscriber):
+        """
+        Remove *subscriber*.
+        """
+        try:
+            self.subscribers.remove(subscriber)
+        except ValueError:
+            pass
+        self._stop()
+
+    def wait(self, version, timeout):
+        """
+        Wait until the status version differs from *version* or *timeout*
+        seconds have passed.
+
+        Args:
+            version (int): version known to the client
+            timeout (int): maximum number of seconds to wait
+        Returns:
+            twisted.internet.defer.Deferred: current version
+        """
+        if not self._active():
+            self.refresh()
+        if version != self.version:
+            return defer.succeed(self.version)
+
+        deferred = defer.Deferred()
+        expiry = reactor.callLater(timeout, self._expire, deferred)
+        self.waiters.append((deferred, expiry))
+        self._start()
+        return deferred
+
+    def _expire(self, deferred):
+        self.waiters = [
+            waiter for waiter in self.waiters if waiter[0] is not deferred]
+        self._stop()
+        deferred.callback(self.version)
+
+
+class EventStreamClient(object):
+    """
+    Subscriber writing status changes to *request* as server-sent events:
+    the complete status as ``state`` event followed by ``delta`` events.
+    """
+
+    def __init__(self, broadcaster, request):
+        """
+        Args:
+            broadcaster (StatusBroadcaster): status source
+            request (twisted.web.server.Request): HTTP request object
+        """
+        self.log = logging.getLogger(__name__)
+        self.broadcaster = broadcaster
+        self.request = request
+
+    def start(self):
+        """
+        Write event stream headers and the current status and subscribe
+        to changes.
+
+        Returns:
+            :py:data:`twisted.web.server.NOT_DONE_YET`
+        """
+        request = self.request
+        request.setHeader("content-type", "text/event-stream")
+        request.setHeader("cache-control", "no-cache")
+        request.notifyFinish().addBoth(self._connection_lost)
+
+        (version, state) = self.broadcaster.subscribe(self)
+        request.write('retry: {:d}\n\n'.format(EVENT_STREAM_RETRY))
+        request.write(event_stream_message(state, 'state', version))
+        return server.NOT_DONE_YET
+
+    def _connection_lost(self, reason):
+        self.log.debug("event stream closed: {!r}".format(reason))
+        self.broadcaster.unsubscribe(self)
+
+    def publish(self, version, delta):
+        self.request.write(event_stream_message(delta, 'delta', version))
+
+    def keepalive(self):
+        self.request.write(': keepalive\n\n')
+
+
+def get_status_broadcaster(collect):
+    """
+    Retrieve the shared :py:class:`StatusBroadcaster` instance, creating
+    it using *collect* if needed.
+
+    Args:
+        collect: callable returning the current status (dict)
+    Returns:
+        StatusBroadcaster: broadcaster instance
+    """
+    global _BROADCASTER
+
+    with _BROADCASTER_LOCK:
+        if _BROADCASTER is None:
+            _BROADCASTER = StatusBroadcaster(collect)
+        return _BROADCASTER
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
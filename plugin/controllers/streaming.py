@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming Responses
+-------------------
+
+Write (large) responses in chunks as their content is generated instead of
+building the complete response in memory first.
+
+Chunks are written by a pull producer (see
+:py:class:`twisted.internet.interfaces.IPullProducer`), thus each chunk is
+only generated when the transport asks for more data.
+"""
+import json
+import logging
+import collections
+from json.encoder import encode_basestring_ascii
+
+from zope.interface import implementer
+from twisted.internet import interfaces
+from twisted.web import server
+
+from models.events import CompactRecord
+
+#: approximate size of chunks written to request
+CHUNK_SIZE = 64 * 1024
+
+#: container nesting depth up to which JSON output is generated per item
+STREAM_DEPTH = 2
+
+#: types of values encoded as JSON strings by :py:func:`_encode_record`
+_STRING_TYPES = (str, unicode)
+
+#: types of values encoded as JSON numbers by :py:func:`_encode_record`
+_INTEGER_TYPES = (int, long)
+
+#: (keys, newline, colon) => format string of event records
+_RECORD_FORMATS = {}
+
+
+def _is_iterator(value):
+    return isinstance(value, collections.Iterator)
+
+
+def json_default(value):
+    """
+    Fallback JSON encoding for values not supported by :py:mod:`json`:
+    iterators are encoded as lists, event records
+    (:py:class:`models.events.CompactRecord`) as objects. Unlike
+    :py:func:`iter_json`, :py:mod:`json` needs a copy of each record.
+
+    Args:
+        value: value to be encoded
+    Returns:
+        JSON serialisable representation of *value*
+    Raises:
+        TypeError: if *value* is not serialisable
+
+    >>> from models.events import NoneEventDict
+    >>> json.dumps([NoneEventDict('x')], default=json_default)[:22]
+    '[{"service_reference":'
+    """
+    if isinstance(value, CompactRecord):
+        return value.copy()
+    if _is_iterator(value):
+        return list(value)
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+def _encode_record(record, encoder, newline, colon):
+    """
+    Encode the event record *record* directly from its slots.
+    Strings and integers are encoded inline, other values by *encoder*.
+
+    >>> from models.events import EventDict
+    >>> encoder = json.JSONEncoder()
+    >>> _encode_record(EventDict((1, 'A\\xc2\\x8aB'), 'IT'), encoder, '', ':')
+    '{"id":1,"title":"A\\\\nB"}'
+    """
+    (keys, values) = record.fields()
+    try:
+        template = _RECORD_FORMATS[keys, newline, colon]
+    except KeyError:
+        template = '{' + newline + (',' + newline).join(
+            encode_basestring_ascii(key).replace('%', '%%') + colon + '%s'
+            for key in keys) + newline + '}'
+        _RECORD_FORMATS[keys, newline, colon] = template
+
+    return template % tuple([
+        encode_basestring_ascii(value)
+        if value.__class__ in _STRING_TYPES else
+        str(value) if value.__class__ in _INTEGER_TYPES else
+        encoder.encode(value) for value in values])
+
+
+def _iter_json(data, encoder, depth, newline, colon):
+    if isinstance(data, CompactRecord):
+        yield _encode_record(data, encoder, newline, colon)
+    elif isinstance(data, dict) and depth < STREAM_DEPTH:
+        yield '{'
+        separator = newline
+        for key, value in data.iteritems():
+            if not isinstance(key, basestring):
+                key = str(key)
+            yield separator
+            yield encoder.encode(key)
+            yield colon
+            for portion in _iter_json(value, encoder, depth + 1, newline,
+                                      colon):
+                yield portion
+            separator = ',' + newline
+        yield newline + '}'
+    elif (isinstance(data, (list, tuple)) and depth < STREAM_DEPTH) or \
+            _is_iterator(data):
+        yield '['
+        separator = newline
+        for value in data:
+            yield separator
+            for portion in _iter_json(value, encoder, depth + 1, newline,
+                                      colon):
+                yield portion
+            separator = ',' + newline
+        yield newline + ']'
+    else:
+        yield encoder.encode(data)
+
+
+def iter_json(data, indent=None):
+    """
+    Generate the JSON representation of *data* in portions.
+    Iterators (e.g. generators) contained in *data* are encoded as lists
+    while being consumed.
+
+    Args:
+        data: data to be encoded
+        indent: indentation level or None for compact output
+    Returns:
+        generator: JSON portions
+
+    >>> ''.join(iter_json({'items': (x for x in range(3))}))
+    '{"items":[0,1,2]}'
+    >>> ''.join(iter_json([{'a': [1, 2]}, None]))
+    '[{"a":[1,2]},null]'
+    >>> json.loads(''.join(iter_json({'a': iter([{'b': iter('xy')}])}, 1)))
+    {u'a': [{u'b': [u'x', u'y']}]}
+    """
+    if indent is None:
+        encoder = json.JSONEncoder(separators=(',', ':'),
+                                   default=json_default)
+        newline = ''
+        colon = ':'
+    else:
+        encoder = json.JSONEncoder(indent=indent, default=json_default)
+        newline = '\n'
+        colon = ': '
+
+    return _iter_json(data, encoder, 0, newline, colon)
+
+
+def iter_chunks(portions, chunk_size=None):
+    """
+    Join *portions* to chunks of (at least) *chunk_size* bytes.
+
+    Args:
+        portions: iterable of strings
+        chunk_size (int): minimum chunk size (except for last chunk)
+    Returns:
+        generator: chunks
+
+    >>> list(iter_chunks(['ab', 'c', 'de', 'f'], chunk_size=3))
+    ['abc', 'def']
+    >>> list(iter_chunks(['ab', 'c', 'd'], chunk_size=5))
+    ['abcd']
+    >>> list(iter_chunks([]))
+    []
+    """
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+
+    buffered = []
+    buffered_size = 0
+
+    for portion in portions:
+        if isinstance(portion, unicode):
+            portion = portion.encode("utf-8")
+        buffered.append(portion)
+        buffered_size += len(portion)
+        if buffered_size >= chunk_size:
+            yield ''.join(buffered)
+            buffered = []
+            buffered_size = 0
+
+    if buffered:
+        yield ''.join(buffered)
+
+
+@implementer(interfaces.IPullProducer)
+class ChunkProducer(object):
+    """
+    Pull producer writing the chunks generated by *chunks* to *request*
+    and finishing the request afterwards. If generating chunks fails, the
+    connection is aborted.
+    """
+
+    def __init__(self, request, chunks):
+        """
+        Args:
+            request (twisted.web.server.Request): HTTP request object
+            chunks: iterable of strings
+        """
+        self.log = logging.getLogger(__name__)
+        self.request = request
+        self.chunks = iter(chunks)
+
+    def start(self):
+        """
+        Register producer with request.
+
+        Returns:
+            :py:data:`twisted.web.server.NOT_DONE_YET`
+        """
+        self.request.notifyFinish().addErrback(self._connection_lost)
+        self.request.registerProducer(self, False)
+        return server.NOT_DONE_YET
+
+    def _connection_lost(self, failure):
+        self.log.debug("connection lost: {!r}".format(failure))
+        self.stopProducing()
+
+    def resumeProducing(self):
+        if not self.request:
+            return
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            chunk = None
+        except Exception as exc:
+            self.log.error("Response truncated: {!r}".format(exc))
+            self._abort()
+            return
+
+        if chunk is None:
+            request = self.request
+            self.stopProducing()
+            request.unregisterProducer()
+            request.finish()
+        elif chunk:
+            self.request.write(chunk)
+
+    def _abort(self):
+        """
+        Abort the connection instead of finishing the request, thus
+        clients cannot mistake a truncated response for a complete one.
+        """
+        request = self.request
+        self.stopProducing()
+        request.unregisterProducer()
+        transport = request.transport
+        abort = getattr(transport, 'abortConnection', None)
+        if callable(abort):
+            abort()
+        else:
+            transport.loseConnection()
+
+    def stopProducing(self):
+        self.request = None
+        close = getattr(self.chunks, 'close', None)
+        if callable(close):
+            close()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Template Cache
+--------------
+
+Templates are loaded from optimised bytecode (``.pyo``), python source
+(``.py``) or Cheetah source (``.tmpl``) files (in that order). Loaded or
+compiled template classes are kept in memory keyed by the template file's
+path and modification time so that templates are not re-imported or
+re-compiled for each request.
+
+Unless modification times are checked (development mode), each template
+file is located and loaded only once. All templates of a folder may be
+loaded in advance (see :py:func:`precompile_templates`).
+"""
+import os
+import imp
+import glob
+import stat
+import logging
+import threading
+
+from twisted.internet import threads
+
+from defaults import VIEWS_PATH
+
+try:
+    from Cheetah.Template import Template
+    HAVE_CHEETAH = True
+except ImportError:
+    HAVE_CHEETAH = False
+
+#: template file extensions in order of preference
+TEMPLATE_EXTENSIONS = ('pyo', 'py', 'tmpl')
+
+#: shared template cache instance
+_TEMPLATE_CACHE = None
+
+#: lock for :py:data:`_TEMPLATE_CACHE`
+_TEMPLATE_CACHE_LOCK = threading.Lock()
+
+
+class TemplateCache(object):
+    """
+    Cache of template classes.
+
+    >>> import tempfile, shutil
+    >>> root = tempfile.mkdtemp()
+    >>> os.mkdir(os.path.join(root, 'web'))
+    >>> with open(os.path.join(root, 'web', 'hello.py'), 'w') as tgt:
+    ...     _ = tgt.write('''
+    ... class hello(object):
+    ...     def __init__(self, searchList):
+    ...         self.name = searchList['name']
+    ...     def __str__(self):
+    ...         return 'Hello ' + self.name
+    ... ''')
+    >>> cache = TemplateCache(root)
+    >>> cache.render('web/hello', 'hello', {'name': 'World'})
+    'Hello World'
+    >>> cache.render('web/missing', 'missing', {}) is None
+    True
+    >>> cache.precompile('web')
+    1
+    >>> shutil.rmtree(root)
+    >>> cache.render('web/hello', 'hello', {'name': 'again'})
+    'Hello again'
+    >>> cache.check_mtime = True
+    >>> cache.render('web/hello', 'hello', {'name': 'again'}) is None
+    True
+    """
+
+    def __init__(self, root_path=VIEWS_PATH, check_mtime=False):
+        """
+        Args:
+            root_path (basestring): templates root folder
+            check_mtime (bool): check the template files' modification
+                times on each use and reload changed templates
+        """
+        self.log = logging.getLogger(__name__)
+        self.root_path = root_path
+        self.check_mtime = check_mtime
+        #: (template trunk, module) => (path, mtime, template class,
+        #: search list wrapping flag)
+        self._templates = dict()
+        self._lock = threading.Lock()
+
+    def locate(self, trunk):
+        """
+        Find the template file for *trunk*.
+
+        Args:
+            trunk (basestring): template filename trunk relative to
+                :py:attr:`root_path`
+        Returns:
+            tuple: path and modification time or ``(None, None)``
+        """
+        base = '/'.join((self.root_path, trunk))
+
+        for ext in TEMPLATE_EXTENSIONS:
+            candy = '.'.join((base, ext))
+            try:
+                candy_stat = os.stat(candy)
+            except OSError:
+                continue
+            if stat.S_ISREG(candy_stat.st_mode):
+                return (candy, candy_stat.st_mtime)
+
+        return (None, None)
+
+    def _load(self, path, module):
+        if path.endswith('.tmpl'):
+            if not HAVE_CHEETAH:
+                self.log.error("Cannot compile {!r}".format(path))
+                return (None, False)
+            return (Template.compile(file=path), True)
+
+        if path.endswith('o'):
+            template = imp.load_compiled(module, path)
+        else:
+            template = imp.load_source(module, path)
+
+        template_class = getattr(template, module, None)
+        if not callable(template_class):
+            return (None, False)
+        return (template_class, False)
+
+    def lookup(self, trunk, module):
+        """
+        Retrieve the template class for *trunk*, loading it if needed.
+
+        Args:
+            trunk (basestring): template filename trunk relative to
+                :py:attr:`root_path`
+            module (basestring): module name
+        Returns:
+            tuple: template class (or *None*) and flag indicating that the
+            search list has to be wrapped in a list
+        """
+        key = (trunk, module)
+        entry = self._templates.get(key)
+
+        if entry is not None and not self.check_mtime:
+            return entry[2:]
+
+        (path, mtime) = self.locate(trunk)
+        if path is None:
+            with self._lock:
+                self._templates.pop(key, None)
+            return (None, False)
+
+        if entry is not None and entry[:2] == (path, mtime):
+            return entry[2:]
+
+        (template_class, wrap) = self._load(path, module)
+        with self._lock:
+            self._templates[key] = (path, mtime, template_class, wrap)
+        return (template_class, wrap)
+
+    def render(self, trunk, module, args):
+        """
+        Generate template content.
+
+        Args:
+            trunk (basestring): template filename trunk relative to
+                :py:attr:`root_path`
+            module (basestring): module name
+            args (dict): template parameters
+        Returns:
+            str: template content or *None* if template is not available
+        """
+        (template_class, wrap) = self.lookup(trunk, module)
+        if template_class is None:
+            return None
+
+        if wrap:
+            return str(template_class(searchList=[args]))
+        return str(template_class(searchList=args))
+
+    def precompile(self, subdirectory):
+        """
+        Load all templates in *subdirectory*.
+
+        Args:
+            subdirectory (basestring): folder relative to
+                :py:attr:`root_path`
+        Returns:
+            int: number of templates loaded
+        """
+        trunks = set()
+        for path in glob.glob(os.path.join(
+                self.root_path, subdirectory, '*.*')):
+            (trunk, ext) = os.path.splitext(path)
+            if os.path.basename(trunk).startswith('_'):
+                continue
+            if ext[1:] in TEMPLATE_EXTENSIONS:
+                trunks.add(os.path.relpath(trunk, self.root_path))
+
+        count = 0
+        for trunk in sorted(trunks):
+            try:
+                (template_class, _) = self.lookup(
+                    trunk, os.path.basename(trunk))
+            except Exception as exc:
+                self.log.error("Loading {!r} failed: {!r}".format(trunk, exc))
+                continue
+            if template_class is not None:
+                count += 1
+
+        return count
+
+
+def get_template_cache():
+    """
+    Retrieve the shared :py:class:`TemplateCache` instance.
+
+    Returns:
+        TemplateCache: template cache instance
+    """
+    global _TEMPLATE_CACHE
+
+    with _TEMPLATE_CACHE_LOCK:
+        if _TEMPLATE_CACHE is None:
+            _TEMPLATE_CACHE = TemplateCache()
+        return _TEMPLATE_CACHE
+
+
+def precompile_templates(subdirectories=('web',)):
+    """
+    Load all templates of *subdirectories* in a worker thread.
+
+    Args:
+        subdirectories (tuple): folders relative to the templates root
+    Returns:
+        twisted.internet.defer.Deferred: number of templates loaded
+    """
+    log = logging.getLogger(__name__)
+    cache = get_template_cache()
+
+    def precompile():
+        return sum(cache.precompile(folder) for folder in subdirectories)
+
+    def done(count):
+        log.debug("{:d} templates loaded".format(count))
+        return count
+
+    def failed(failure):
+        log.error("Loading templates failed: {!s}".format(failure.value))
+
+    deferred = threads.deferToThread(precompile)
+    deferred.addCallbacks(done, failed)
+    return deferred
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
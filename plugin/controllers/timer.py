@@ -7,6 +7,7 @@ from enigma import eServiceReference
 
 from events import EventsController
 from models.timers import TimerDict
+from timer_changes import TimerChangeLog
 
 
 class TimersController(object):
@@ -22,6 +23,13 @@ class TimersController(object):
         # OR MAYBE: ["timer_list", "processed_timers"] ?
         self.sources = kwargs.get("sources", ["timer_list"])
         self.egon = EventsController()
+        #: versioned log of timer changes
+        self.changes = TimerChangeLog(self.current_timers, self.timer_item)
+
+        try:
+            self.rt.on_state_change.append(self.changes.mark_changed)
+        except AttributeError:
+            self.log.warning("No timer state change notifications")
 
     def _valid_service_reference_or_bust(self, service_reference):
         if not service_reference:
@@ -37,6 +45,37 @@ class TimersController(object):
         # sr_obj = self._valid_service_reference_or_bust(service_reference)
         raise NotImplementedError
 
+    def current_timers(self):
+        """
+        Retrieve the timer entries of the configured sources.
+
+        Returns:
+            list: timer entries
+        """
+        current_sources = []
+        for source in self.sources:
+            current_sources += getattr(self.rt, source)
+        return current_sources
+
+    def timer_item(self, timer_item):
+        """
+        Create the data for *timer_item* including its event's data.
+
+        Args:
+            timer_item: timer entry
+        Returns:
+            TimerDict: timer data
+        """
+        timer_sref, timer_id = str(timer_item.service_ref), timer_item.eit
+        data = TimerDict(timer_item)
+
+        if timer_sref and timer_id:
+            e_data = self.egon.lookup_event(timer_sref, timer_id)
+            if e_data:
+                data['event'] = e_data
+
+        return data
+
     def list_items(self, service_reference=None, item_id=None):
         """
         Generate a list of timers, either **all**,
@@ -55,10 +94,6 @@ class TimersController(object):
             sr_obj = self._valid_service_reference_or_bust(service_reference)
             service_reference = sr_obj.toCompareString()
 
-        current_sources = []
-        for source in self.sources:
-            current_sources += getattr(self.rt, source)
-
         do_all = service_reference is None and item_id is None
         do_single = service_reference is not None and item_id is not None
 
@@ -66,16 +101,9 @@ class TimersController(object):
             service_reference, item_id))
         self.log.debug("do all={!r} do_single={!r}".format(do_all, do_single))
 
-        for timer_item in current_sources:
+        for timer_item in self.current_timers():
             timer_sref, timer_id = str(timer_item.service_ref), timer_item.eit
-            e_data = None
-            data = TimerDict(timer_item)
-
-            if timer_sref and timer_id:
-                e_data = self.egon.lookup_event(timer_sref, timer_id)
-
-            if e_data:
-                data['event'] = e_data
+            data = self.timer_item(timer_item)
 
             if do_all:
                 yield data
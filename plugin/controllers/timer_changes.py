@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Timer Changes
+-------------
+
+Versioned log of timer changes.
+
+The current timers are compared with the previously seen state whenever
+the *RecordTimer* reports a state change, the number of timers differs or
+:py:data:`TIMER_CHANGE_CHECK_INTERVAL` seconds have passed since the last
+comparison. Each added, changed or removed timer increments the log's
+version so that clients knowing a version only need to fetch the changes
+made since then.
+"""
+import logging
+import collections
+
+from twisted.internet import defer, reactor
+
+#: maximum number of changes kept in the log
+TIMER_CHANGE_LOG_SIZE = 500
+
+#: maximum number of seconds between comparisons of the timers' state
+TIMER_CHANGE_CHECK_INTERVAL = 5
+
+#: timer attributes compared to detect changes
+TIMER_SIGNATURE_ATTRIBUTES = (
+    'service_ref', 'eit', 'name', 'description', 'begin', 'end',
+    'disabled', 'justplay', 'afterEvent', 'dirname', 'tags', 'state',
+    'repeated', 'cancelled', 'dontSave', 'log_entries',
+)
+
+#: change log action: timer has been added
+ACTION_ADDED = 'added'
+
+#: change log action: timer has been changed
+ACTION_CHANGED = 'changed'
+
+#: change log action: timer has been removed
+ACTION_REMOVED = 'removed'
+
+
+def timer_signature(timer):
+    """
+    Create a signature of *timer*'s state.
+
+    Args:
+        timer: timer entry
+    Returns:
+        list: attribute values
+
+    >>> class Timer(object):
+    ...     name = 'X'
+    ...     tags = ['a']
+    >>> timer_signature(Timer())[2:4]
+    ['X', None]
+    """
+    signature = []
+    for attribute in TIMER_SIGNATURE_ATTRIBUTES:
+        value = getattr(timer, attribute, None)
+        if isinstance(value, list):
+            value = tuple(value)
+        elif attribute == 'service_ref' and value is not None:
+            value = str(value)
+        signature.append(value)
+    return signature
+
+
+class TimerChangeLog(object):
+    """
+    Versioned log of changes of the timers returned by *sources*.
+
+    >>> class Timer(object):
+    ...     def __init__(self, name):
+    ...         self.name = name
+    >>> timers = [Timer('a'), Timer('b')]
+    >>> log = TimerChangeLog(lambda: timers, lambda timer: timer.name,
+    ...                      clock=lambda: 0)
+    >>> log.update()
+    False
+    >>> log.version, log.changes_since(0)
+    (0, [])
+    >>> timers[0].name = 'A'
+    >>> timers.append(Timer('c'))
+    >>> log.update()
+    True
+    >>> log.version
+    2
+    >>> log.changes_since(0)
+    [(1, 'changed', 'A'), (2, 'added', 'c')]
+    >>> del timers[1]
+    >>> log.mark_changed()
+    >>> log.changes_since(2)
+    [(3, 'removed', 'b')]
+    >>> log.changes_since(5) is None
+    True
+    """
+
+    def __init__(self, sources, item_factory, size=TIMER_CHANGE_LOG_SIZE,
+                 check_interval=TIMER_CHANGE_CHECK_INTERVAL, clock=None):
+        """
+        Args:
+            sources: callable returning the current timer entries
+            item_factory: callable creating the item representing a timer
+            size (int): maximum number of changes kept
+            check_interval (int): maximum number of seconds between
+                comparisons
+            clock: callable returning current time
+        """
+        if clock is None:
+            clock = reactor.seconds
+
+        self.log = logging.getLogger(__name__)
+        self.sources = sources
+        self.item_factory = item_factory
+        self.check_interval = check_interval
+        self.clock = clock
+        #: current version
+        self.version = 0
+        #: (version, action, item) tuples
+        self.entries = collections.deque(maxlen=size)
+        #: id of timer entry => (timer entry, signature, item)
+        self.known = None
+        self.checked = None
+        self.dirty = False
+        self.waiters = []
+        self._poll_call = None
+
+    def mark_changed(self, *args):
+        """
+        Note that timers may have changed, e.g. as *RecordTimer*
+        ``on_state_change`` callback. Waiting clients are notified
+        immediately.
+        """
+        self.dirty = True
+        if self.waiters:
+            self.update()
+
+    def _needs_update(self, timers):
+        if self.known is None or self.dirty:
+            return True
+        if len(timers) != len(self.known):
+            return True
+        return self.clock() - self.checked >= self.check_interval
+
+    def update(self, force=False):
+        """
+        Compare the current timers with the previously seen state and log
+        the differences.
+
+        Args:
+            force (bool): compare even if no change is expected
+        Returns:
+            bool: True if changes have been logged
+        """
+        timers = self.sources()
+        if not force and not self._needs_update(timers):
+            return False
+
+        self.checked = self.clock()
+        self.dirty = False
+        previous = self.known
+        current = dict()
+        changes = []
+
+        for timer in timers:
+            key = id(timer)
+            signature = timer_signature(timer)
+            action = ACTION_ADDED
+            if previous is not None and key in previous:
+                if previous[key][1] == signature:
+                    current[key] = previous[key]
+                    continue
+                action = ACTION_CHANGED
+            item = self.item_factory(timer)
+            current[key] = (timer, signature, item)
+            changes.append((action, item))
+
+        self.known = current
+        if previous is None:
+            return False
+
+        for key, (_, _, item) in previous.iteritems():
+            if key not in current:
+                changes.append((ACTION_REMOVED, item))
+
+        for action, item in changes:
+            self.version += 1
+            self.entries.append((self.version, action, item))
+
+        if changes:
+            self.log.debug("{:d} timer changes, version {:d}".format(
+                len(changes), self.version))
+            self._notify()
+        return bool(changes)
+
+    def changes_since(self, version):
+        """
+        Retrieve the changes made after *version*.
+
+        Args:
+            version (int): version known to the client
+        Returns:
+            list: (version, action, item) tuples or *None* if the changes
+            are not available (anymore), i.e. the client has to fetch the
+            complete list
+        """
+        self.update()
+        if version > self.version:
+            return None
+        if version < self.version and (
+                not self.entries or self.entries[0][0] > version + 1):
+            return None
+        return [entry for entry in self.entries if entry[0] > version]
+
+    def wait(self, version, timeout):
+        """
+        Wait until the log's version is newer than *version* or *timeout*
+        seconds have passed.
+
+        Args:
+            version (int): version known to the client
+            timeout (int): maximum number of seconds to wait
+        Returns:
+            twisted.internet.defer.Deferred: current version
+        """
+        self.update()
+        if self.version != version:
+            return defer.succeed(self.version)
+
+        deferred = defer.Deferred()
+        expiry = reactor.callLater(timeout, self._expire, deferred)
+        self.waiters.append((deferred, expiry))
+        self._schedule_poll()
+        return deferred
+
+    def _schedule_poll(self):
+        if self._poll_call is None or not self._poll_call.active():
+            self._poll_call = reactor.callLater(
+                self.check_interval, self._poll)
+
+    def _poll(self):
+        self._poll_call = None
+        self.update(force=True)
+        if self.waiters:
+            self._schedule_poll()
+
+    def _expire(self, deferred):
+        self.waiters = [
+            waiter for waiter in self.waiters if waiter[0] is not deferred]
+        deferred.callback(self.version)
+
+    def _notify(self):
+        (waiters, self.waiters) = (self.waiters, [])
+        for deferred, expiry in waiters:
+            if expiry.active():
+                expiry.cancel()
+            deferred.callback(self.version)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
@@ -88,6 +88,9 @@ CUTS_OUT = 1
 CUTS_MARK = 2
 CUTS_WATCHMARK = 3
 
+#: size of a cut list entry (PTS value, cue kind)
+CUTS_ENTRY_SIZE = 12
+
 
 def lenient_decode(value, encoding=None):
     """
@@ -554,30 +557,75 @@ def mangle_host_header_port(value=None,
     return result
 
 
-def parse_cuts(cutfile):
+def decode_cuts(data):
+    """
+    Decode the entries of cut list *data* (content of a ``.cuts`` file)
+    at once.
+
+    Args:
+        data (str): cut list data
+    Returns:
+        list: (PTS value, cue kind) tuples
+    Raises:
+        struct.error: if *data* contains an incomplete entry
+
+    >>> decode_cuts(struct.pack('>QIQI', 90000, CUTS_MARK, 180000, 3))
+    [(90000, 2), (180000, 3)]
+    >>> decode_cuts('')
+    []
+    """
+    (count, rest) = divmod(len(data), CUTS_ENTRY_SIZE)
+    if rest:
+        raise struct.error("incomplete cut list entry")
+
+    values = struct.unpack('>' + 'QI' * count, data)
+    return zip(values[0::2], values[1::2])
+
+
+def cuts_marks(entries):
+    """
+    Convert cut list *entries* to marks.
+
+    Args:
+        entries: (PTS value, cue kind) tuples
+    Returns:
+        dict: watched position, maximum mark position (seconds) and marks
+
+    >>> sorted(cuts_marks([(90000, 2), (180000, 3)]).items())
+    [('marks', [[1, 2]]), ('maximum', 1), ('watched', 2)]
+    """
     marks = {
         "watched": 0,
         "maximum": 0,
         "marks": []
     }
 
-    with open(cutfile, "rb") as source:
-        chunk = source.read(12)
+    for (pts_value, cue_kind) in entries:
+        seconds = pts_value / 90000
+        if cue_kind == CUTS_WATCHMARK:
+            marks['watched'] = seconds
+        else:
+            marks['marks'].append([seconds, cue_kind])
 
-        while chunk:
-            (pts_value, cue_kind) = struct.unpack('>QI', chunk)
-            seconds = pts_value / 90000
-            if cue_kind == CUTS_WATCHMARK:
-                marks['watched'] = seconds
-            else:
-                marks['marks'].append([seconds, cue_kind])
+    if marks['marks']:
+        marks['maximum'] = marks['marks'][-1][0]
 
-            chunk = source.read(12)
+    return marks
 
-        if marks['marks']:
-            marks['maximum'] = marks['marks'][-1][0]
 
-    return marks
+def parse_cuts(cutfile):
+    """
+    Read the marks contained in *cutfile*.
+
+    Args:
+        cutfile (basestring): ``.cuts`` file path
+    Returns:
+        dict: see :py:func:`cuts_marks`
+    """
+    with open(cutfile, "rb") as source:
+        data = source.read()
+
+    return cuts_marks(decode_cuts(data))
 
 
 def add_expires_header(request, expires=False):
@@ -20,7 +20,7 @@ from models.services import getCurrentService, getBouquets, getServices, \
     getSubServices, getSatellites, getBouquetEpg, getBouquetNowNextEpg, \
     getServicesNowNextEpg, getSearchEpg, getChannelEpg, getNowNextEpg, \
     getSearchSimilarEpg, getAllServices, getPlayableServices, \
-    getPlayableService, getParentalControlList, getEvent
+    getPlayableService, getParentalControlList, getEvent, getBouquetEpgGrid
 from models.volume import getVolumeStatus, setVolumeUp, setVolumeDown, \
     setVolumeMute, setVolume
 from models.audiotrack import getAudioTracks, setAudioTrack
@@ -48,6 +48,9 @@ from stream import StreamController
 from servicelists import ServiceListsManager
 from utilities import mangle_host_header_port, add_expires_header, build_url
 from recording import RecordingsController, RECORDINGS_ROOT_PATH
+from execution import main_thread, worker_thread
+from response_cache import cached, invalidates
+from dispatch import produces
 
 
 def get_recordings(encoding=None):
@@ -153,6 +156,19 @@ class WebController(BaseController):
         self.putChild("stream", StreamController(session))
         self.content_type = "text/xml"
 
+        try:
+            session.nav.RecordTimer.on_state_change.append(
+                self._timers_changed)
+        except AttributeError:
+            self.log.warning("No timer state change notifications")
+
+    def _timers_changed(self, *args):
+        """
+        *RecordTimer* ``on_state_change`` callback dropping cached timer
+        lists, timers may also be altered by other plugins or the GUI.
+        """
+        self.response_cache.invalidate('timerlist')
+
     def testMandatoryArguments(self, request, keys):
         for key in keys:
             if key not in request.args.keys():
@@ -357,6 +373,7 @@ class WebController(BaseController):
 
         return setAudioTrack(self.session, track_id)
 
+    @invalidates('getcurrent', 'epgnownext')
     def P_zap(self, request):
         """
         Request handler for the `/zap` endpoint.
@@ -388,6 +405,7 @@ class WebController(BaseController):
 
         return zapService(self.session, request.args["sRef"][0])
 
+    @invalidates('getcurrent')
     def P_remotecontrol(self, request):
         """
         Request handler for the `remotecontrol` endpoint.
@@ -424,6 +442,7 @@ class WebController(BaseController):
 
         return remoteControl(key_id, pressed_type, rcu)
 
+    @invalidates('getcurrent')
     def P_powerstate(self, request):
         """
         Request handler for the `powerstate` endpoint.
@@ -539,6 +558,7 @@ class WebController(BaseController):
         """
         return getCurrentLocation()
 
+    @cached(300)
     def P_getallservices(self, request):
         """
         Request handler for the `getallservices` endpoint.
@@ -570,6 +590,7 @@ class WebController(BaseController):
 
         return bouquets
 
+    @cached(300)
     def P_getservices(self, request):
         """
         Request handler for the `getservices` endpoint.
@@ -596,6 +617,7 @@ class WebController(BaseController):
 
         return getServices(sRef, True, hidden)
 
+    @produces(CONTENT_TYPE_X_MPEGURL)
     def P_servicesm3u(self, request):
         """
         Request handler for the `servicesm3u` endpoint.
@@ -623,7 +645,6 @@ class WebController(BaseController):
         mangled = mangle_host_header_port(request.getHeader('host'))
         services["host"] = '{hostname}:8001'.format(**mangled)
         services["auth"] = ''
-        self.content_type = CONTENT_TYPE_X_MPEGURL
         return services
 
     def P_subservices(self, request):
@@ -807,6 +828,8 @@ class WebController(BaseController):
         """
         return getMessageAnswer()
 
+    @cached(30)
+    @main_thread
     def P_movielist(self, request):
         """
         Request handler for the `movielist` endpoint.
@@ -824,6 +847,7 @@ class WebController(BaseController):
         add_expires_header(request, expires=60 * 30)
         return {'movies': get_recordings()}
 
+    @produces(CONTENT_TYPE_HTML)
     def P_movielisthtml(self, request):
         """
         Request handler for the `movielisthtml` endpoint.
@@ -841,10 +865,11 @@ class WebController(BaseController):
         value_dict = {
             'movies': get_recordings(),
         }
-        self.content_type = CONTENT_TYPE_HTML
         add_expires_header(request, expires=60 * 30)
         return value_dict
 
+    @produces(CONTENT_TYPE_X_MPEGURL)
+    @main_thread
     def P_movielistm3u(self, request):
         """
         Request handler for the `movielistm3u` endpoint.
@@ -859,7 +884,6 @@ class WebController(BaseController):
         Returns:
             HTTP response with headers
         """
-        self.content_type = CONTENT_TYPE_X_MPEGURL
         add_expires_header(request, expires=60 * 30)
         return get_recordings_m3u(request)
 
@@ -886,6 +910,7 @@ class WebController(BaseController):
         add_expires_header(request, expires=60 * 30)
         return value_dict
 
+    @invalidates('movielist')
     def P_moviedelete(self, request):
         """
         Request handler for the `moviedelete` endpoint.
@@ -908,6 +933,7 @@ class WebController(BaseController):
             force = True
         return removeMovie(self.session, request.args["sRef"][0], force)
 
+    @invalidates('movielist')
     def P_moviemove(self, request):
         """
         Request handler for the `moviemove` endpoint.
@@ -934,6 +960,7 @@ class WebController(BaseController):
             request.args["sRef"][0],
             request.args["dirname"][0])
 
+    @invalidates('movielist')
     def P_movierename(self, request):
         """
         Request handler for the `movierename` endpoint.
@@ -1059,10 +1086,14 @@ class WebController(BaseController):
         """
         return getVPSChannels(self.session)
 
+    @cached(30)
     def P_timerlist(self, request):
         """
         Request handler for the `timerlist` endpoint.
         Retrieve list of timers.
+        Formatted begin and end times are omitted from lists rendered
+        using the XML template (``/web/timerlist``) as it does not use
+        them.
 
         .. seealso::
 
@@ -1073,10 +1104,12 @@ class WebController(BaseController):
         Returns:
             HTTP response with headers
         """
-        ret = getTimers(self.session)
+        xml_template = request.path.startswith('/web/')
+        ret = getTimers(self.session, formatted_dates=not xml_template)
         ret["locations"] = comp_config.movielist.videodirs.value
         return ret
 
+    @invalidates('timerlist')
     def P_timeradd(self, request):
         """
         Request handler for the `timeradd` endpoint.
@@ -1162,6 +1195,7 @@ class WebController(BaseController):
             always_zap
         )
 
+    @invalidates('timerlist')
     def P_timeraddbyeventid(self, request):
         """
         Request handler for the `timeraddbyeventid` endpoint.
@@ -1225,6 +1259,7 @@ class WebController(BaseController):
             always_zap
         )
 
+    @invalidates('timerlist')
     def P_timerchange(self, request):
         """
         Request handler for the `timerchange` endpoint.
@@ -1332,6 +1367,7 @@ class WebController(BaseController):
             always_zap
         )
 
+    @invalidates('timerlist')
     def P_timertogglestatus(self, request):
         """
         Request handler for the `timertogglestatus` endpoint.
@@ -1367,6 +1403,7 @@ class WebController(BaseController):
         return toggleTimerStatus(
             self.session, request.args["sRef"][0], begin, end)
 
+    @invalidates('timerlist')
     def P_timerdelete(self, request):
         """
         Request handler for the `timerdelete` endpoint.
@@ -1403,6 +1440,7 @@ class WebController(BaseController):
 
         return removeTimer(self.session, request.args["sRef"][0], begin, end)
 
+    @invalidates('timerlist')
     def P_timercleanup(self, request):
         """
         Request handler for the `timercleanup` endpoint.
@@ -1433,6 +1471,7 @@ class WebController(BaseController):
         """
         return writeTimerList(self.session)
 
+    @invalidates('timerlist', 'getcurrent')
     def P_recordnow(self, request):
         """
         Request handler for the `recordnow` endpoint.
@@ -1466,6 +1505,7 @@ class WebController(BaseController):
         """
         return getCurrentTime()
 
+    @cached(60)
     def P_deviceinfo(self, request):
         """
         Request handler for the `deviceinfo` endpoint.
@@ -1481,6 +1521,7 @@ class WebController(BaseController):
         """
         return getInfo(session=self.session, need_fullinfo=True)
 
+    @produces(CONTENT_TYPE_HTML)
     def P_getipv6(self, request):
         firstpublic = ''
         info = getInfo()['ifaces']
@@ -1489,11 +1530,11 @@ class WebController(BaseController):
             if public is not None:
                 firstpublic = public
                 break
-        self.content_type = CONTENT_TYPE_HTML
         return {
             "firstpublic": firstpublic
         }
 
+    @main_thread
     def P_epgbouquet(self, request):
         res = self.testMandatoryArguments(request, ["bRef"])
         if res:
@@ -1507,6 +1548,7 @@ class WebController(BaseController):
                 pass
         return getBouquetEpg(request.args["bRef"][0], begintime)
 
+    @main_thread
     def P_epgmulti(self, request):
         """
         Request handler for the `epgmulti` endpoint.
@@ -1515,6 +1557,9 @@ class WebController(BaseController):
 
             Not available in *Enigma2 WebInterface API*.
 
+        Events are served from the bouquet's precomputed EPG grid once it
+        has been built (see :py:mod:`controllers.epg_grid`).
+
         Args:
             request (twisted.web.server.Request): HTTP request object
         Returns:
@@ -1537,7 +1582,7 @@ class WebController(BaseController):
                 endtime = int(request.args["endTime"][0])
             except ValueError:
                 pass
-        return getBouquetEpg(request.args["bRef"][0], begintime, endtime)
+        return getBouquetEpgGrid(request.args["bRef"][0], begintime, endtime)
 
     def P_epgmultigz(self, request):
         """
@@ -1554,18 +1599,21 @@ class WebController(BaseController):
         """
         return self.P_epgmulti(request)
 
+    @cached(30)
     def P_epgnow(self, request):
         res = self.testMandatoryArguments(request, ["bRef"])
         if res:
             return res
         return getBouquetNowNextEpg(request.args["bRef"][0], 0)
 
+    @cached(30)
     def P_epgnext(self, request):
         res = self.testMandatoryArguments(request, ["bRef"])
         if res:
             return res
         return getBouquetNowNextEpg(request.args["bRef"][0], 1)
 
+    @cached(30)
     def P_epgnownext(self, request):
         res = self.testMandatoryArguments(request, ["bRef"])
         if res:
@@ -1582,6 +1630,7 @@ class WebController(BaseController):
         ret = getServicesNowNextEpg(request.args["sList"][0])
         return ret
 
+    @main_thread
     def P_epgsearch(self, request):
         """
         EPG event search and lookup handler.
@@ -1700,6 +1749,7 @@ class WebController(BaseController):
         event['event']['recording_margin_after'] = margin_after
         return event
 
+    @cached(5)
     def P_getcurrent(self, request):
         """
         Request handler for the `getcurrent` endpoint.
@@ -1793,6 +1843,7 @@ class WebController(BaseController):
             "next": next
         }
 
+    @produces(CONTENT_TYPE_HTML)
     def P_getpid(self, request):
         """
         Request handler for the `getpid` endpoint.
@@ -1808,7 +1859,6 @@ class WebController(BaseController):
         """
         info = getCurrentService(self.session)
         mangled = mangle_host_header_port(request.getHeader('host'))
-        self.content_type = CONTENT_TYPE_HTML
         return {
             "ppid": "%x" % info["pmtpid"],
             "vpid": "%x" % info["vpid"],
@@ -1816,6 +1866,7 @@ class WebController(BaseController):
             "host": mangled['hostname']
         }
 
+    @invalidates('getcurrent', 'epgnownext')
     def P_zapstream(self, request):
         """
         Request handler for the `zapstream` endpoint.
@@ -1856,6 +1907,7 @@ class WebController(BaseController):
             return res
         return setShowChPicon(request.args["checked"][0] == "true")
 
+    @produces(CONTENT_TYPE_X_MPEGURL)
     def P_streamm3u(self, request):
         """
         Request handler for the `streamm3u` endpoint.
@@ -1885,9 +1937,9 @@ class WebController(BaseController):
                     request.args["ref"][0],
                     request.args["name"][0],
                     stream=True)
-        self.content_type = CONTENT_TYPE_X_MPEGURL
         return create_stream_m3u(self.session, request, "stream.m3u")
 
+    @produces(CONTENT_TYPE_X_MPEGURL)
     def P_streamcurrentm3u(self, request):
         """
         Request handler for the `streamcurrentm3u` endpoint.
@@ -1903,9 +1955,9 @@ class WebController(BaseController):
 
         .. http:get:: /web/streamcurrent.m3u
         """
-        self.content_type = CONTENT_TYPE_X_MPEGURL
         return create_stream_m3u(self.session, request, "streamcurrent.m3u")
 
+    @produces(CONTENT_TYPE_X_MPEGURL)
     def P_tsm3u(self, request):
         """
         Request handler for the `tsm3u` endpoint.
@@ -1921,7 +1973,6 @@ class WebController(BaseController):
 
         .. http:get:: /web/ts.m3u
         """
-        self.content_type = CONTENT_TYPE_X_MPEGURL
         return create_file_m3u(request)
 
     def P_streamsubservices(self, request):
@@ -1943,6 +1994,7 @@ class WebController(BaseController):
         """
         return getStreamSubservices(self.session, request)
 
+    @invalidates('getallservices', 'getservices')
     def P_servicelistreload(self, request):
         """
         Reload service lists, transponders, parental control black-/white lists
@@ -2008,6 +2060,7 @@ class WebController(BaseController):
             return res
         return mediaPlayerAdd(self.session, request.args["file"][0])
 
+    @invalidates('getcurrent')
     def P_mediaplayerplay(self, request):
         res = self.testMandatoryArguments(request, ["file"])
         if res:
@@ -2026,6 +2079,7 @@ class WebController(BaseController):
     def P_mediaplayercurrent(self, request):
         return mediaPlayerCurrent(self.session)
 
+    @worker_thread
     def P_mediaplayerfindfile(self, request):
         path = "/media/"
         if "path" in request.args.keys():
@@ -2253,6 +2307,7 @@ class WebController(BaseController):
             "message": ""
         }
 
+    @invalidates('epgnow', 'epgnext', 'epgnownext', 'getcurrent')
     def P_loadepg(self, request):
         """
         Request handler for the `loadepg` endpoint.
@@ -71,6 +71,13 @@ config.OpenWebif.webcache.moviesort = ConfigSelection(
 config.OpenWebif.webcache.showchannelpicon = ConfigYesNo(default=True)
 config.OpenWebif.webcache.mepgmode = ConfigInteger(default=1, limits=(1, 2))
 
+# picon folder (detected if empty)
+config.OpenWebif.picon_path = ConfigText(default="", fixed_size=False)
+
+# load all templates on start, reload changed templates (development)
+config.OpenWebif.template_precompile = ConfigYesNo(default=True)
+config.OpenWebif.template_reload = ConfigYesNo(default=False)
+
 # Use service name for stream
 config.OpenWebif.service_name_for_stream = ConfigYesNo(default=True)
 
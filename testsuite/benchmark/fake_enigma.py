@@ -0,0 +1,615 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Stand-in *enigma2* Runtime
+--------------------------
+
+Minimal implementations of the *enigma2* objects used by the hot paths of
+the controllers (service center, EPG cache, service references, ...).
+Their data is provided by a :py:class:`synthetic.SyntheticWorld` instance.
+
+Any other module or attribute of the *enigma2* runtime (``Components.*``,
+``Screens.*``, ``Tools.*``, ...) is replaced by permissive
+:py:class:`Anything` objects so that the controllers can be imported
+off-device.
+
+.. note::
+
+    Call :py:func:`install` **before** importing any controller module.
+"""
+import os
+import sys
+import bisect
+import time
+import types
+
+#: top level names of modules provided by the *enigma2* runtime
+STAND_IN_PACKAGES = (
+    'enigma', 'Components', 'Screens', 'Tools', 'Plugins',
+    'ServiceReference', 'RecordTimer', 'timer', 'NavigationInstance',
+    'skin', 'keyids', 'mytest', 'Navigation',
+)
+
+#: service type selectors as defined in ``Screens.ChannelSelection``
+SERVICE_TYPES_TV = '1:7:1:0:0:0:0:0:0:0:(type == 1) || (type == 17) || ' \
+                   '(type == 22) || (type == 25) || (type == 134) || ' \
+                   '(type == 195)'
+SERVICE_TYPES_RADIO = '1:7:2:0:0:0:0:0:0:0:(type == 2) || (type == 10)'
+
+#: query types of :py:meth:`eEPGCache.search`
+SEARCH_FIELDS = {
+    1: ('title', ),
+    2: ('title', ),
+    3: ('shortinfo', ),
+    4: ('title', 'shortinfo'),
+    5: ('longinfo', ),
+    6: ('title', 'shortinfo', 'longinfo'),
+}
+
+#: the world currently served by the stand-in objects
+WORLD = None
+
+
+class Anything(object):
+    """
+    Permissive stand-in for objects not relevant to benchmarking:
+    every attribute, item and call result is another :py:class:`Anything`.
+
+    >>> x = Anything()
+    >>> x.foo.bar(1, 2)['x'] is not None
+    True
+    >>> bool(x), list(x)
+    (False, [])
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Anything()
+
+    def __call__(self, *args, **kwargs):
+        return Anything()
+
+    def __getitem__(self, key):
+        return Anything()
+
+    def __iter__(self):
+        return iter(())
+
+    def __nonzero__(self):
+        return False
+
+    def __len__(self):
+        return 0
+
+    def __str__(self):
+        return ''
+
+
+class ConfigNode(object):
+    """
+    Stand-in for ``Components.config.config``: nodes are created on
+    access, their ``value`` defaults to *None*.
+
+    >>> cfg = ConfigNode()
+    >>> cfg.OpenWebif.epg_encoding.value = 'utf-8'
+    >>> cfg.OpenWebif.epg_encoding.value, cfg.foo.value
+    ('utf-8', None)
+    """
+
+    def __init__(self):
+        self.value = None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        node = ConfigNode()
+        setattr(self, name, node)
+        return node
+
+    def save(self):
+        pass
+
+    def addNotifier(self, notifier, initial_call=True, **kwargs):
+        if initial_call:
+            notifier(self)
+
+
+class StandInModule(types.ModuleType):
+    """
+    Module returning :py:class:`Anything` for unknown attributes.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Anything()
+
+
+class _Constants(object):
+    """
+    Namespace handing out stable integer values for any attribute name,
+    used for ``iServiceInformation``.
+    """
+
+    def __init__(self):
+        self._values = dict()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self._values.setdefault(name, len(self._values) + 1)
+
+
+iServiceInformation = _Constants()
+
+
+class eServiceReference(object):
+    """
+    Stand-in for ``enigma.eServiceReference``.
+
+    >>> ref = eServiceReference('1:0:19:7C:6:85:FFFF0000:0:0:0:')
+    >>> ref.type, ref.flags, ref.toString()
+    (1, 0, '1:0:19:7C:6:85:FFFF0000:0:0:0:')
+    >>> eServiceReference('1:0:0:0:0:0:0:0:0:0:/m/a.ts').getPath()
+    '/m/a.ts'
+    >>> eServiceReference(eServiceReference.idFile, 0, '/m/').toString()
+    '2:0:0:0:0:0:0:0:0:0:/m/'
+    """
+    idInvalid = -1
+    idStructure = 0
+    idDVB = 1
+    idFile = 2
+    idUser = 0x1000
+    idServiceMP3 = 0x1001
+
+    isDirectory = 1
+    mustDescent = 2
+    canDescent = 4
+    flagDirectory = isDirectory | mustDescent | canDescent
+    shouldSort = 8
+    hasSortKey = 16
+    sort1 = 32
+    isMarker = 64
+    isGroup = 128
+    isNumberedMarker = 256
+
+    def __init__(self, *args):
+        if len(args) == 3:
+            (self.type, self.flags, self.path) = args
+            self._ref = '{:d}:{:d}:0:0:0:0:0:0:0:0:{:s}'.format(
+                self.type, self.flags, self.path)
+            return
+
+        ref = args[0] if args else ''
+        if isinstance(ref, eServiceReference):
+            ref = ref.toString()
+        self._ref = ref
+        portions = ref.split(':', 10)
+        try:
+            self.type = int(portions[0])
+            self.flags = int(portions[1])
+        except (IndexError, ValueError):
+            self.type = self.idInvalid
+            self.flags = 0
+        self.path = portions[10] if len(portions) > 10 else ''
+
+    def toString(self):
+        return self._ref
+
+    def toCompareString(self):
+        return self._ref
+
+    def getPath(self):
+        return self.path
+
+    def valid(self):
+        return int(self.type != self.idInvalid)
+
+    def __eq__(self, other):
+        return self.toString() == str(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._ref)
+
+    def __str__(self):
+        return self._ref
+
+    def __repr__(self):
+        return 'eServiceReference({!r})'.format(self._ref)
+
+
+class ServiceReference(object):
+    """
+    Stand-in for ``ServiceReference.ServiceReference``.
+    """
+
+    def __init__(self, ref, reftype=None, flags=None, path=None):
+        if not isinstance(ref, eServiceReference):
+            ref = eServiceReference(str(ref))
+        self.ref = ref
+
+    def getServiceName(self):
+        return WORLD.service_name(self.ref.toString())
+
+    def isRecordable(self):
+        return True
+
+    def __str__(self):
+        return self.ref.toString()
+
+
+class ListResult(object):
+    """
+    Stand-in for the result of ``eServiceCenter.list()``.
+    """
+
+    def __init__(self, items):
+        #: (service reference, name) tuples
+        self.items = items
+
+    def getContent(self, fmt, sort=False):
+        """
+        Args:
+            fmt (basestring): ``S`` (service reference string),
+                ``N`` (name) and ``R`` (service reference)
+            sort (bool): ignored
+        Returns:
+            list: values or tuples of values for multiple field formats
+        """
+        def field(letter, ref, name):
+            if letter == 'S':
+                return ref.toString()
+            if letter == 'N':
+                return name
+            if letter == 'R':
+                return ref
+            return None
+
+        if len(fmt) == 1:
+            return [field(fmt, ref, name) for ref, name in self.items]
+        return [tuple(field(letter, ref, name) for letter in fmt)
+                for ref, name in self.items]
+
+    def getNext(self):
+        return eServiceReference()
+
+
+class RecordingEvent(object):
+    """
+    Stand-in for the ``eServiceEvent`` of a recording.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def getBeginTime(self):
+        return self.event['start_time']
+
+    def getDuration(self):
+        return self.event['duration']
+
+    def getEventName(self):
+        return self.event['title']
+
+    def getShortDescription(self):
+        return self.event['shortinfo']
+
+    def getExtendedDescription(self):
+        return self.event['longinfo']
+
+    def getEventId(self):
+        return self.event['id']
+
+    def getComponentData(self):
+        return []
+
+
+class ServiceInformation(object):
+    """
+    Stand-in for ``iStaticServiceInformation`` of services and recordings.
+    """
+
+    def __init__(self, world, ref):
+        self.world = world
+        self.ref = ref.toString()
+        self.recording = world.recordings.get(ref.getPath())
+
+    def getName(self, ref=None):
+        if self.recording is not None:
+            return self.recording['title']
+        return self.world.service_name(self.ref)
+
+    def _strings(self):
+        if self.recording is None:
+            return {iServiceInformation.sServiceref: self.ref}
+        return {
+            iServiceInformation.sServiceref: self.recording['service'],
+            iServiceInformation.sDescription: self.recording['shortinfo'],
+            iServiceInformation.sTags: '',
+        }
+
+    def getInfo(self, ref, what=None):
+        if what is None:
+            what = ref
+        if what in self._strings():
+            return -2
+        if self.recording is not None:
+            if what == iServiceInformation.sTimeCreate:
+                return self.recording['time_create']
+            if what == iServiceInformation.sFileSize:
+                return self.recording['file_size']
+        return -1
+
+    def getInfoString(self, ref, what=None):
+        if what is None:
+            what = ref
+        return self._strings().get(what, '')
+
+    def getInfoObject(self, ref, what=None):
+        return None
+
+    def getEvent(self, ref=None):
+        if self.recording is None:
+            return None
+        return RecordingEvent(self.recording['event'])
+
+
+class eServiceCenter(object):
+    """
+    Stand-in for ``enigma.eServiceCenter``.
+    """
+
+    @staticmethod
+    def getInstance():
+        return eServiceCenter()
+
+    def list(self, ref):
+        """
+        List bouquets, services of a bouquet or recordings of a folder.
+        """
+        if not isinstance(ref, eServiceReference):
+            ref = eServiceReference(ref)
+
+        if ref.type == eServiceReference.idFile:
+            return ListResult(WORLD.folder_listing(ref.getPath()))
+
+        path = ref.getPath()
+        for bouquets_file, bouquets in WORLD.bouquet_files.iteritems():
+            if '"{:s}"'.format(bouquets_file) in path:
+                return ListResult([
+                    (eServiceReference(bouquet_ref), name)
+                    for bouquet_ref, name in bouquets])
+
+        return ListResult([
+            (eServiceReference(service_ref), WORLD.service_name(service_ref))
+            for service_ref in WORLD.bouquets.get(ref.toString(), [])])
+
+    def info(self, ref):
+        if not isinstance(ref, eServiceReference):
+            ref = eServiceReference(ref)
+        if ref.type == eServiceReference.idInvalid:
+            return None
+        return ServiceInformation(WORLD, ref)
+
+
+class eEPGCache(object):
+    """
+    Stand-in for ``enigma.eEPGCache`` serving :py:attr:`WORLD`'s events.
+    Events are (id, begin, duration, title, shortinfo, longinfo) tuples
+    ordered by begin per service reference.
+    """
+    SIMILAR_BROADCASTINGS_SEARCH = 0
+    EXAKT_TITLE_SEARCH = 1
+    PARTIAL_TITLE_SEARCH = 2
+    PARTIAL_DESCRIPTION_SEARCH = 3
+    FULL_DESCRIPTION_SEARCH = 6
+
+    @staticmethod
+    def getInstance():
+        return eEPGCache()
+
+    @staticmethod
+    def _row(flags, service_reference, event, now):
+        values = {
+            'I': event[0], 'B': event[1], 'D': event[2], 'T': event[3],
+            'S': event[4], 'E': event[5], 'C': now, 'R': service_reference,
+            'N': WORLD.service_name(service_reference),
+            'n': WORLD.service_name(service_reference),
+        }
+        return tuple(values.get(flag) for flag in flags if flag != 'X')
+
+    @staticmethod
+    def _lookup(service_reference, querytype, begin, minutes, now):
+        events = WORLD.epg.get(service_reference.upper().rstrip(':'), [])
+        if querytype == 2:
+            return [event for event in events if event[0] == begin]
+
+        if begin is None or begin == -1:
+            begin = now
+        begins = WORLD.epg_begins.get(
+            service_reference.upper().rstrip(':'), [])
+        index = max(bisect.bisect_right(begins, begin) - 1, 0)
+
+        if querytype == 0 and minutes is not None:
+            # minutes -1: all events from *begin* on
+            end = None if minutes == -1 else begin + minutes * 60
+            result = []
+            for event in events[index:]:
+                if end is not None and event[1] >= end:
+                    break
+                if event[1] + event[2] > begin:
+                    result.append(event)
+            return result
+
+        index += querytype
+        if 0 <= index < len(events):
+            event = events[index]
+            if querytype != 0 or event[1] + event[2] > begin >= event[1]:
+                return [event]
+        return []
+
+    def lookupEvent(self, query):
+        """
+        Args:
+            query (list): flags followed by
+                (service reference, query type, begin[, minutes]) tuples
+        Returns:
+            list: result rows
+        """
+        flags = query[0]
+        now = int(time.time())
+        rows = []
+        for item in query[1:]:
+            (service_reference, querytype) = item[:2]
+            begin = item[2] if len(item) > 2 else -1
+            minutes = item[3] if len(item) > 3 else None
+            events = self._lookup(service_reference, querytype, begin,
+                                  minutes, now)
+            if not events and 'X' in flags:
+                # 'X': at least one (empty) row per query item
+                events = [(None, ) * 6]
+            for event in events:
+                rows.append(self._row(flags, service_reference, event, now))
+        return rows
+
+    def search(self, query):
+        """
+        Args:
+            query (tuple): (flags, maximum number of rows, query type,
+                search term, case sensitivity) or
+                (flags, maximum number of rows, 0, service reference,
+                event ID)
+        Returns:
+            list: result rows
+        """
+        (flags, max_rows, querytype, what, case) = query[:5]
+        now = int(time.time())
+        rows = []
+
+        if querytype == self.SIMILAR_BROADCASTINGS_SEARCH:
+            found = self._lookup(what, 2, case, None, now)
+            if not found:
+                return rows
+
+            def matches(event):
+                return event[3] == found[0][3]
+        else:
+            if case == 1:
+                what = what.lower()
+            indices = [
+                ('title', 'shortinfo', 'longinfo').index(field) + 3
+                for field in SEARCH_FIELDS.get(querytype, ('title', ))]
+
+            def matches(event):
+                for index in indices:
+                    value = event[index]
+                    if case == 1:
+                        value = value.lower()
+                    if querytype == self.EXAKT_TITLE_SEARCH:
+                        if value == what:
+                            return True
+                    elif what in value:
+                        return True
+                return False
+
+        for service_reference in WORLD.service_references:
+            key = service_reference.upper().rstrip(':')
+            for event in WORLD.epg.get(key, []):
+                if matches(event):
+                    rows.append(
+                        self._row(flags, service_reference, event, now))
+                    if len(rows) >= max_rows:
+                        return rows
+        return rows
+
+
+class StandInImporter(object):
+    """
+    Import hook (:pep:`302`) providing :py:class:`StandInModule` instances
+    for the modules of the *enigma2* runtime.
+    """
+
+    def __init__(self, attributes):
+        #: module name => dict of attributes
+        self.attributes = attributes
+
+    def find_module(self, fullname, path=None):
+        if fullname.split('.')[0] in STAND_IN_PACKAGES:
+            return self
+        return None
+
+    def load_module(self, fullname):
+        try:
+            return sys.modules[fullname]
+        except KeyError:
+            pass
+
+        module = StandInModule(fullname)
+        module.__file__ = '<stand-in>'
+        module.__loader__ = self
+        module.__path__ = []
+        module.__dict__.update(self.attributes.get(fullname, {}))
+        sys.modules[fullname] = module
+
+        if '.' in fullname:
+            (parent, name) = fullname.rsplit('.', 1)
+            setattr(self.load_module(parent), name, module)
+
+        return module
+
+
+def install(world):
+    """
+    Make *world* the data source of the stand-in objects and register the
+    import hook providing the stand-in modules.
+
+    Args:
+        world (synthetic.SyntheticWorld): synthetic data
+    """
+    global WORLD
+
+    # enigma2 (mytest.py) runs with utf-8 as default encoding
+    reload(sys)
+    sys.setdefaultencoding('utf-8')
+
+    WORLD = world
+    config = ConfigNode()
+    config.OpenWebif.epg_encoding.value = 'utf-8'
+
+    attributes = {
+        'enigma': dict(
+            eServiceReference=eServiceReference,
+            eServiceCenter=eServiceCenter,
+            eEPGCache=eEPGCache,
+            iServiceInformation=iServiceInformation,
+        ),
+        'ServiceReference': dict(ServiceReference=ServiceReference),
+        'Screens.ChannelSelection': dict(
+            service_types_tv=SERVICE_TYPES_TV,
+            service_types_radio=SERVICE_TYPES_RADIO,
+            FLAG_SERVICE_NEW_FOUND=64,
+        ),
+        'Components.config': dict(config=config),
+        'Tools.Directories': dict(
+            resolveFilename=lambda scope, path='': os.path.join(
+                world.root, path),
+            SCOPE_PLUGINS='plugins',
+        ),
+    }
+
+    for hook in sys.meta_path:
+        if isinstance(hook, StandInImporter):
+            hook.attributes = attributes
+            return
+    sys.meta_path.insert(0, StandInImporter(attributes))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))
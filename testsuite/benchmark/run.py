@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Hot Path Benchmarks
+-------------------
+
+Measure latency and allocations of the controllers' hot paths off-device,
+using the stand-in *enigma2* runtime (:py:mod:`fake_enigma`) serving
+synthetic services, EPG events, recordings and timers
+(:py:mod:`synthetic`).
+
+.. highlight:: bash
+
+    $ python testsuite/benchmark/run.py --services 1000 --events 200 \\
+        --recordings 500 --repeat 5
+    $ python testsuite/benchmark/run.py --json --filter rest.
+
+Allocations are reported as peak traced memory if :py:mod:`tracemalloc`
+is available, as the memory held by the hot path's result otherwise.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+try:
+    import tracemalloc
+    HAVE_TRACEMALLOC = True
+except ImportError:
+    HAVE_TRACEMALLOC = False
+
+# hack: alter include path in such ways that controllers package is included
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../plugin'))
+
+import fake_enigma
+from synthetic import SyntheticWorld
+
+#: minutes of EPG data requested by range lookups
+EPG_RANGE_MINUTES = 360
+
+#: search term used by EPG searches
+SEARCH_TERM = 'Title 1'
+
+#: folder containing the sample recording's meta data files
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), '../data')
+
+
+def benchmark_request(path, args=None):
+    """
+    Create a dummy GET request for *path*.
+
+    Args:
+        path (basestring): request path, e.g. ``/recordings/``
+        args (dict): request arguments
+    Returns:
+        BenchmarkRequest: request
+    """
+    from twisted.web.test.requesthelper import DummyRequest
+
+    class BenchmarkRequest(DummyRequest):
+        code = 200
+
+        def setResponseCode(self, code, message=None):
+            DummyRequest.setResponseCode(self, code, message)
+            self.code = code
+
+    postpath = path.strip('/').split('/')[1:]
+    request = BenchmarkRequest(postpath or [''])
+    request.path = path
+    request.uri = path
+    request.args = dict((key, [value]) for key, value in
+                        (args or {}).iteritems())
+    return request
+
+
+def render(resource, path, args=None):
+    """
+    Render a GET request for *path* using *resource*.
+
+    Returns:
+        str: response body
+    """
+    from twisted.web.server import NOT_DONE_YET
+
+    request = benchmark_request(path, args)
+    result = resource.render(request)
+    if result is NOT_DONE_YET:
+        if not request.finished:
+            raise RuntimeError("{!r} has not been finished".format(path))
+        return ''.join(request.written)
+    return result
+
+
+#: event keys compared by :py:func:`compare_epg_grid`
+EPG_GRID_COMPARED_KEYS = (
+    'sref', 'id', 'begin_timestamp', 'duration_sec', 'title')
+
+
+def build_epg_grid(bouquet_ref):
+    """
+    Build the EPG grid of *bouquet_ref* synchronously.
+
+    Args:
+        bouquet_ref (basestring): bouquet reference
+    """
+    from controllers.models.services import getEpgGridManager
+
+    manager = getEpgGridManager()
+    manager.window(bouquet_ref)
+    grid = manager.grids[bouquet_ref]
+    while not grid.complete:
+        manager.step(grid)
+
+
+def compare_epg_grid(bouquet_ref):
+    """
+    Compare the events served from the EPG grid of *bouquet_ref* with the
+    ones looked up by :py:func:`getBouquetEpg`, starting now with an open
+    end and with a :py:data:`EPG_RANGE_MINUTES` range.
+
+    Args:
+        bouquet_ref (basestring): bouquet reference
+    Raises:
+        RuntimeError: if the events differ
+    """
+    from controllers.models.services import getBouquetEpg, \
+        getBouquetEpgGrid
+
+    def keys(result):
+        return [tuple(event[key] for key in EPG_GRID_COMPARED_KEYS)
+                for event in result['events']]
+
+    for label, minutes in (('open end', -1),
+                           ('range', EPG_RANGE_MINUTES)):
+        expected = keys(getBouquetEpg(bouquet_ref, endtime=minutes))
+        served = keys(getBouquetEpgGrid(bouquet_ref, endtime=minutes))
+        if served != expected:
+            raise RuntimeError(
+                "EPG grid ({:s}): {:d} events, getBouquetEpg: {:d}".format(
+                    label, len(served), len(expected)))
+
+
+def hot_paths(world):
+    """
+    Create the hot path callables.
+
+    Args:
+        world (synthetic.SyntheticWorld): synthetic data
+    Returns:
+        list: (name, callable) tuples
+    """
+    from controllers.recording import RecordingsController
+    from controllers.recording_meta import read_recording
+    from controllers.service import ServiceController
+    from controllers.models.services import getBouquetEpg, getSearchEpg, \
+        getBouquetEpgGrid
+    from controllers.models.timers import getTimers
+    from controllers.rest_recordings_controller import \
+        RESTRecordingsController
+    from controllers.rest_services_controller import RESTServicesController
+    from controllers.rest_eventlookup_api import EventLookupApiController
+    from controllers.rest_eventsearch_api import EventSearchApiController
+
+    movie_root = world.movie_root
+    bouquet_ref = world.bouquet_files['bouquets.tv'][0][0]
+    service_ref = world.service_references[0]
+    sample_recording = glob.glob(os.path.join(SAMPLE_DATA, '*.ts'))[0]
+
+    movies = RecordingsController(use_index=False)
+    movies_indexed = RecordingsController(index_root=movie_root + '/')
+    rest_recordings = RESTRecordingsController(root=movie_root + '/')
+    rest_recordings.movie_controller = RecordingsController(use_index=False)
+    rest_services = RESTServicesController()
+    rest_eventlookup = EventLookupApiController()
+    rest_eventsearch = EventSearchApiController()
+
+    build_epg_grid(bouquet_ref)
+    compare_epg_grid(bouquet_ref)
+
+    return [
+        ('recordings.list_movies',
+         lambda: list(movies.list_movies(movie_root))),
+        ('recordings.list_movies (indexed)',
+         lambda: list(movies_indexed.list_movies(movie_root))),
+        ('recordings.read_recording (sample)',
+         lambda: read_recording(sample_recording, with_component_data=True)),
+        ('services.get_services_set',
+         lambda: list(ServiceController().get_services_set())),
+        ('epg.getBouquetEpg (now)',
+         lambda: getBouquetEpg(bouquet_ref)),
+        ('epg.getBouquetEpg (range)',
+         lambda: getBouquetEpg(bouquet_ref, endtime=EPG_RANGE_MINUTES)),
+        ('epg.getBouquetEpg (open end)',
+         lambda: getBouquetEpg(bouquet_ref, endtime=-1)),
+        ('epg.getBouquetEpgGrid (open end)',
+         lambda: getBouquetEpgGrid(bouquet_ref)),
+        ('epg.getBouquetEpgGrid (range)',
+         lambda: getBouquetEpgGrid(bouquet_ref, endtime=EPG_RANGE_MINUTES)),
+        ('epg.getSearchEpg',
+         lambda: getSearchEpg(SEARCH_TERM)),
+        ('timers.getTimers',
+         lambda: getTimers(world.session)),
+        ('rest.recordings',
+         lambda: render(rest_recordings, '/recordings/')),
+        ('rest.services',
+         lambda: render(rest_services, '/services/')),
+        ('rest.eventlookup',
+         lambda: render(rest_eventlookup, '/eventlookup', dict(
+             service_reference=service_ref, querytype='0',
+             minutes=str(EPG_RANGE_MINUTES)))),
+        ('rest.eventsearch',
+         lambda: render(rest_eventsearch, '/eventsearch', dict(
+             what=SEARCH_TERM))),
+    ]
+
+
+def retained_size(data):
+    """
+    Determine the memory held by *data* including the objects it refers
+    to (containers, instance attributes and slots).
+
+    Args:
+        data: object
+    Returns:
+        int: size in bytes
+
+    >>> retained_size('') == sys.getsizeof('')
+    True
+    >>> retained_size(['ab', 'ab']) < retained_size(['ab', 'cd'])
+    True
+    """
+    seen = set()
+    pending = [data]
+    size = 0
+
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            pending.extend(current.iterkeys())
+            pending.extend(current.itervalues())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            pending.extend(current)
+        elif not isinstance(current, basestring):
+            for cls in type(current).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    try:
+                        pending.append(getattr(current, slot))
+                    except AttributeError:
+                        pass
+            instance_dict = getattr(current, '__dict__', None)
+            if isinstance(instance_dict, dict):
+                pending.append(instance_dict)
+
+    return size
+
+
+def _allocations(func):
+    if HAVE_TRACEMALLOC:
+        tracemalloc.start()
+        func()
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak // 1024
+
+    return retained_size(func()) // 1024
+
+
+def measure(name, func, repeat):
+    """
+    Call *func* *repeat* times (after a warm up call) and collect timings.
+
+    Args:
+        name (basestring): hot path name
+        func: hot path callable
+        repeat (int): number of measured calls
+    Returns:
+        dict: measurement results
+    """
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.time()
+        func()
+        timings.append((time.time() - started) * 1000.0)
+    timings.sort()
+
+    return dict(
+        name=name,
+        runs=repeat,
+        min_ms=timings[0],
+        median_ms=timings[len(timings) // 2],
+        max_ms=timings[-1],
+        alloc=_allocations(func),
+        alloc_unit='peak KiB' if HAVE_TRACEMALLOC else 'result KiB',
+    )
+
+
+def report(results, stream=None):
+    """
+    Print a table of measurement results.
+    """
+    if stream is None:
+        stream = sys.stdout
+
+    fmt = '{:<36s} {:>5s} {:>10s} {:>10s} {:>10s} {:>11s}\n'
+    stream.write(fmt.format(
+        'hot path', 'runs', 'min ms', 'median ms', 'max ms',
+        results[0]['alloc_unit'] if results else ''))
+    for item in results:
+        stream.write(fmt.format(
+            item['name'], str(item['runs']),
+            '{:.2f}'.format(item['min_ms']),
+            '{:.2f}'.format(item['median_ms']),
+            '{:.2f}'.format(item['max_ms']),
+            str(item['alloc'])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--services', type=int, default=500)
+    parser.add_argument('--events', type=int, default=100,
+                        help='EPG events per service')
+    parser.add_argument('--recordings', type=int, default=200)
+    parser.add_argument('--timers', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='',
+                        help='only run hot paths containing this string')
+    parser.add_argument('--json', action='store_true',
+                        help='write results as JSON')
+    args = parser.parse_args(argv)
+
+    world = SyntheticWorld(services=args.services, events=args.events,
+                           recordings=args.recordings, timers=args.timers)
+    fake_enigma.install(world)
+
+    try:
+        results = [
+            measure(name, func, args.repeat)
+            for name, func in hot_paths(world) if args.filter in name]
+    finally:
+        world.cleanup()
+
+    if args.json:
+        json.dump(dict(
+            parameters=vars(args), results=results), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Synthetic Device Data
+---------------------
+
+Deterministic services, bouquets, EPG events, recordings and timers served
+by the stand-in *enigma2* runtime (see :py:mod:`fake_enigma`).
+Recordings (``.ts`` and ``.ts.cuts`` files) are created in a temporary
+folder.
+"""
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import fake_enigma
+
+#: number of services per bouquet
+BOUQUET_SIZE = 100
+
+#: event durations in seconds, used round robin
+EVENT_DURATIONS = (900, 1800, 1800, 3600, 5400)
+
+#: number of recordings per folder
+RECORDINGS_PER_FOLDER = 50
+
+#: cut marks written to each recording's ``.cuts`` file
+CUT_MARKS = ((90000 * 60, 0), (90000 * 1800, 1), (90000 * 2700, 3))
+
+BOUQUET_FMT = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "{:s}" ORDER BY bouquet'
+SERVICE_FMT = '1:0:19:{:X}:{:X}:1:C00000:0:0:0:'
+
+
+class SyntheticWorld(object):
+    """
+    Synthetic data of a device having *services* services with *events*
+    EPG events each, *recordings* recordings and *timers* timers.
+
+    >>> world = SyntheticWorld(services=120, events=10, recordings=3)
+    >>> len(world.service_references), len(world.bouquets)
+    (120, 2)
+    >>> world.service_name(world.service_references[0])
+    'Service 0'
+    >>> sorted(os.listdir(world.movie_root))
+    ['folder_0']
+    >>> world.cleanup()
+    """
+
+    def __init__(self, services=500, events=100, recordings=200, timers=50,
+                 now=None):
+        if now is None:
+            now = int(time.time())
+
+        self.now = now - now % 1800
+        self.root = tempfile.mkdtemp(prefix='pbh_benchmark_')
+        self.movie_root = os.path.join(self.root, 'movie')
+        os.mkdir(self.movie_root)
+
+        #: service references in bouquet order
+        self.service_references = []
+        #: normalised service reference => service name
+        self.service_names = dict()
+        #: bouquets file => (bouquet reference, bouquet name) tuples
+        self.bouquet_files = {'bouquets.tv': [], 'bouquets.radio': []}
+        #: bouquet reference => service references
+        self.bouquets = dict()
+        #: normalised service reference => events ordered by begin
+        self.epg = dict()
+        #: normalised service reference => begin of events
+        self.epg_begins = dict()
+        #: recording path => recording data
+        self.recordings = dict()
+        #: timer stand-ins
+        self.timers = []
+
+        self._create_services(services)
+        self._create_events(events)
+        self._create_recordings(recordings)
+        self._create_timers(timers)
+
+    @staticmethod
+    def _key(service_reference):
+        return service_reference.upper().rstrip(':')
+
+    def service_name(self, service_reference):
+        return self.service_names.get(self._key(service_reference), '')
+
+    def _create_services(self, count):
+        bouquet_ref = None
+        for number in range(count):
+            if number % BOUQUET_SIZE == 0:
+                bouquet_number = number // BOUQUET_SIZE
+                bouquet_ref = BOUQUET_FMT.format(
+                    'userbouquet.synthetic{:d}.tv'.format(bouquet_number))
+                self.bouquet_files['bouquets.tv'].append(
+                    (bouquet_ref, 'Bouquet {:d}'.format(bouquet_number)))
+                self.bouquets[bouquet_ref] = []
+
+            service_ref = SERVICE_FMT.format(number + 1, number // 50 + 1)
+            self.service_references.append(service_ref)
+            self.service_names[self._key(service_ref)] = \
+                'Service {:d}'.format(number)
+            self.bouquets[bouquet_ref].append(service_ref)
+
+    def _create_events(self, count):
+        first_begin = self.now - 2 * 3600
+        for offset, service_ref in enumerate(self.service_references):
+            begin = first_begin
+            events = []
+            for number in range(count):
+                duration = EVENT_DURATIONS[
+                    (offset + number) % len(EVENT_DURATIONS)]
+                events.append((
+                    number + 1, begin, duration,
+                    '\xc2\x86Title {:d}\xc2\x87'.format(
+                        (offset + number) % 500),
+                    'Short description {:d}'.format(number),
+                    'Extended description of event {:d} on service {:d}.'
+                    '\xc2\x8aSecond paragraph.'.format(number, offset)))
+                begin += duration
+            key = self._key(service_ref)
+            self.epg[key] = events
+            self.epg_begins[key] = [event[1] for event in events]
+
+    def _create_recordings(self, count):
+        cuts = ''.join(struct.pack('>QI', pts, kind)
+                       for pts, kind in CUT_MARKS)
+
+        for number in range(count):
+            folder = os.path.join(
+                self.movie_root,
+                'folder_{:d}'.format(number // RECORDINGS_PER_FOLDER))
+            if not os.path.isdir(folder):
+                os.mkdir(folder)
+
+            service_ref = self.service_references[
+                number % len(self.service_references)]
+            begin = self.now - (number + 1) * 3600
+            title = 'Recording {:d}'.format(number)
+            path = os.path.join(folder, '{:s} - {:s} - {:s}.ts'.format(
+                time.strftime('%Y%m%d %H%M', time.gmtime(begin)),
+                self.service_name(service_ref), title))
+
+            with open(path, 'wb') as target:
+                target.write('\x47' * 188)
+            with open(path + '.cuts', 'wb') as target:
+                target.write(cuts)
+
+            self.recordings[path] = dict(
+                title=title,
+                service=service_ref,
+                shortinfo='Short description {:d}'.format(number),
+                time_create=begin,
+                file_size=188,
+                event=dict(
+                    id=number + 1, start_time=begin, duration=3600,
+                    title=title, shortinfo='Short description',
+                    longinfo='Extended description'),
+            )
+
+    def _create_timers(self, count):
+        for number in range(count):
+            service_ref = self.service_references[
+                number % len(self.service_references)]
+            events = self.epg[self._key(service_ref)]
+            event = events[min(len(events) - 1, 4 + number // 100)] \
+                if events else (0, self.now + 3600, 1800, 'Timer', '', '')
+            self.timers.append(Timer(service_ref, event, number))
+
+    def folder_listing(self, path):
+        """
+        List the (service reference, name) tuples of folders and
+        recordings contained in *path*.
+        """
+        items = []
+        for name in sorted(os.listdir(path)):
+            current = os.path.join(path, name)
+            if os.path.isdir(current):
+                items.append((fake_enigma.eServiceReference(
+                    fake_enigma.eServiceReference.idFile,
+                    fake_enigma.eServiceReference.flagDirectory,
+                    current + '/'), name))
+            elif name.endswith('.ts'):
+                items.append((fake_enigma.eServiceReference(
+                    '1:0:0:0:0:0:0:0:0:0:' + current),
+                    self.recordings[current]['title']))
+        return items
+
+    @property
+    def session(self):
+        """
+        Stand-in for the *enigma2* session object (timers only).
+        """
+        return Session(self.timers)
+
+    def cleanup(self):
+        """
+        Remove the temporary folder containing the recordings.
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class Timer(object):
+    """
+    Stand-in for ``RecordTimer.RecordTimerEntry``.
+    """
+
+    def __init__(self, service_ref, event, number):
+        self.service_ref = fake_enigma.ServiceReference(service_ref)
+        self.eit = event[0]
+        self.name = event[3]
+        self.description = event[4]
+        self.begin = event[1]
+        self.end = event[1] + event[2]
+        self.start_prepare = 20
+        self.disabled = number % 10 == 0
+        self.justplay = False
+        self.dirname = None
+        self.dontSave = False
+        self.afterEvent = 3
+        self.tags = []
+        self.log_entries = []
+        self.backoff = 0
+        self.first_try_prepare = True
+        self.state = 0
+        self.repeated = 0
+        self.cancelled = False
+        self.Filename = ''
+        self.next_activation = self.begin - self.start_prepare
+        self.dirnameHadToFallback = False
+        self.is_timeshift = False
+        self.is_transformed_timeshift = False
+        self.justremind = False
+        self.prepare_time = 20
+        self.pvrConvert = False
+        self.receiveRecordEvents = False
+        self.record_ecm = False
+        self.repeatedbegindate = self.begin
+        self.zapbeforerecord = False
+
+
+class RecordTimer(object):
+    def __init__(self, timers):
+        self.timer_list = timers
+        self.processed_timers = []
+        self.on_state_change = []
+
+
+class Navigation(object):
+    def __init__(self, timers):
+        self.RecordTimer = RecordTimer(timers)
+
+
+class Session(object):
+    def __init__(self, timers):
+        self.nav = Navigation(timers)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    (FAILED, SUCCEEDED) = doctest.testmod()
+    print("[doctest] SUCCEEDED/FAILED: {:d}/{:d}".format(SUCCEEDED, FAILED))